@@ -26,6 +26,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent.parent
 # SECURITY WARNING: don't run with debug turned on in production!
 
 CONTRIBUTION_DIRECTORY = "/srv/vran/contributions"
+CONTRIBUTION_MAX_UPLOAD_SIZE = 256 * 1024 * 1024
 
 
 ###################################################################
@@ -27,6 +27,7 @@ DEBUG = True
 
 
 CONTRIBUTION_DIRECTORY = "/srv/vran/contributions"
+CONTRIBUTION_MAX_UPLOAD_SIZE = 256 * 1024 * 1024
 
 ###################################################################
 # SECURITY WARNING: keep the secret key used in production secret!
@@ -4,6 +4,7 @@ from uuid import UUID
 
 import pytest
 from django.conf import settings
+from django.core.cache import caches
 from django.db import IntegrityError
 from pytest_redis import factories
 
@@ -261,6 +262,12 @@ def redis(redis_fixture):
     return redis_fixture
 
 
+@pytest.fixture(autouse=True)
+def clear_default_cache():
+    "Entries of the default cache refer to database objects of previous tests."
+    caches["default"].clear()
+
+
 @pytest.fixture
 def display_txt_order_0(tag_def):
     ConfigValue.append_to_list(DISPLAY_TXT_ORDER_CONFIG_KEY, tag_def.id_persistent)
@@ -142,6 +142,37 @@ def test_patch_all(auth_server):
     assert contribution["has_header"]
 
 
+def test_patch_match_engine(auth_server):
+    live_server, cookies = auth_server
+    rsp = req_contrib.post_contribution(
+        live_server.url, c.contribution_post0, cookies=cookies
+    )
+    assert rsp.status_code == 200
+    id_persistent = rsp.json()["id_persistent"]
+    rsp = req_contrib.patch_contribution(
+        live_server.url, id_persistent, {"match_engine": "TFIDF"}, cookies=cookies
+    )
+    assert rsp.status_code == 200
+    rsp = req_contrib.get_contribution(live_server.url, id_persistent, cookies=cookies)
+    assert rsp.status_code == 200
+    contribution = rsp.json()
+    assert contribution["match_engine"] == "TFIDF"
+    assert contribution["name"] == c.contribution_post0["name"]
+
+
+def test_patch_unknown_match_engine(auth_server):
+    live_server, cookies = auth_server
+    rsp = req_contrib.post_contribution(
+        live_server.url, c.contribution_post0, cookies=cookies
+    )
+    assert rsp.status_code == 200
+    id_persistent = rsp.json()["id_persistent"]
+    rsp = req_contrib.patch_contribution(
+        live_server.url, id_persistent, {"match_engine": "UNKNOWN"}, cookies=cookies
+    )
+    assert rsp.status_code == 422
+
+
 def test_unknown_field(auth_server):
     live_server, cookies = auth_server
     rsp = req_contrib.post_contribution(
@@ -6,6 +6,7 @@ from django.db import DatabaseError
 
 import tests.contribution.api.integration.common as c
 import tests.contribution.api.integration.requests as req_contrib
+from vran.contribution.models_django import ContributionCandidate
 
 # The following will only test for errors, as success is tested in other integration tests.
 
@@ -51,3 +52,67 @@ def test_wrong_content_type(auth_server):
     assert rsp.json() == {
         "msg": "Invalid content type. Only text/csv, text/plain, text/x-csv, application/vnd.ms-excel, application/csv, application/x-csv, text/csv, text/comma-separated-values, text/x-comma-separated-values, text/tab-separated-values allowed."  # pylint: disable=line-too-long
     }
+
+
+def test_too_large(auth_server, settings):
+    settings.CONTRIBUTION_MAX_UPLOAD_SIZE = 1024
+    live_server, cookies = auth_server
+    rsp = req_contrib.post_contribution(
+        live_server.url,
+        c.contribution_post0,
+        cookies=cookies,
+        file_path="tests/files/DBOeS_Parlamentarier50.csv",
+    )
+    assert rsp.status_code == 413
+    assert rsp.json() == {"msg": "The uploaded file is too large."}
+    rsp = req_contrib.get_chunk(live_server.url, 0, 100, cookies=cookies)
+    assert rsp.json() == {"contributions": []}
+
+
+def test_identical_upload(auth_server):
+    live_server, cookies = auth_server
+    rsp = req_contrib.post_contribution(
+        live_server.url,
+        c.contribution_post0,
+        cookies=cookies,
+        file_path="tests/files/DBOeS_Parlamentarier50.csv",
+    )
+    assert rsp.status_code == 200
+    id_persistent = rsp.json()["id_persistent"]
+    rsp = req_contrib.post_contribution(
+        live_server.url,
+        c.contribution_post0,
+        cookies=cookies,
+        file_path="tests/files/DBOeS_Parlamentarier50.csv",
+    )
+    assert rsp.status_code == 200
+    assert rsp.json() == {"id_persistent": id_persistent, "duplicate": True}
+    rsp = req_contrib.get_chunk(live_server.url, 0, 100, cookies=cookies)
+    assert len(rsp.json()["contributions"]) == 1
+
+
+def test_identical_upload_merged(auth_server):
+    live_server, cookies = auth_server
+    rsp = req_contrib.post_contribution(
+        live_server.url,
+        c.contribution_post0,
+        cookies=cookies,
+        file_path="tests/files/DBOeS_Parlamentarier50.csv",
+    )
+    assert rsp.status_code == 200
+    id_persistent = rsp.json()["id_persistent"]
+    assert rsp.json()["duplicate"] is False
+    ContributionCandidate.objects.filter(  # pylint: disable=no-member
+        id_persistent=id_persistent
+    ).update(state=ContributionCandidate.MERGED)
+    rsp = req_contrib.post_contribution(
+        live_server.url,
+        c.contribution_post0,
+        cookies=cookies,
+        file_path="tests/files/DBOeS_Parlamentarier50.csv",
+    )
+    assert rsp.status_code == 200
+    assert rsp.json()["id_persistent"] != id_persistent
+    assert rsp.json()["duplicate"] is False
+    rsp = req_contrib.get_chunk(live_server.url, 0, 100, cookies=cookies)
+    assert len(rsp.json()["contributions"]) == 2
@@ -2,13 +2,17 @@
 import requests
 
 
-def post_contribution(url, contribution, cookies=None, content_type="text/csv"):
+def post_contribution(
+    url,
+    contribution,
+    cookies=None,
+    content_type="text/csv",
+    file_path="tests/files/empty.csv",
+):
     return requests.post(
         url + "/vran/api/contributions",
         data=contribution,
-        files={
-            "file": ("empty.csv", open("tests/files/empty.csv", "rb"), content_type)
-        },
+        files={"file": ("empty.csv", open(file_path, "rb"), content_type)},
         cookies=cookies,
         timeout=900,
     )
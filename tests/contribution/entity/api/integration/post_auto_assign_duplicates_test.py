@@ -0,0 +1,47 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring,redefined-outer-name,invalid-name,unused-argument,too-many-arguments
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
+
+import tests.contribution.entity.api.requests as r
+from vran.contribution.entity.queue import auto_assign_duplicates
+from vran.contribution.models_django import ContributionCandidate
+
+
+def test_no_cookies(auth_server):
+    live_server, _ = auth_server
+    rsp = r.post_auto_assign_duplicates(live_server.url, "contribution_id", 0.9)
+    assert rsp.status_code == 401
+
+
+def test_no_candidate(auth_server):
+    live_server, cookies = auth_server
+    rsp = r.post_auto_assign_duplicates(live_server.url, str(uuid4()), 0.9, cookies)
+    assert rsp.status_code == 404
+
+
+def test_merged_candidate(auth_server, contribution_candidate):
+    live_server, cookies = auth_server
+    contribution_candidate.state = ContributionCandidate.MERGED
+    contribution_candidate.save()
+    mock = MagicMock()
+    with patch("django_rq.enqueue", mock):
+        rsp = r.post_auto_assign_duplicates(
+            live_server.url, contribution_candidate.id_persistent, 0.9, cookies
+        )
+    assert rsp.status_code == 400
+    mock.assert_not_called()
+
+
+def test_assigns_duplicates(auth_server, contribution_candidate):
+    live_server, cookies = auth_server
+    mock = MagicMock()
+    mock.return_value.id = "id_job_test"
+    with patch("django_rq.enqueue", mock):
+        rsp = r.post_auto_assign_duplicates(
+            live_server.url, contribution_candidate.id_persistent, 0.9, cookies
+        )
+    assert rsp.status_code == 200
+    assert rsp.json() == {"id_job": "id_job_test"}
+    mock.assert_called_once_with(
+        auto_assign_duplicates, contribution_candidate.id_persistent, 0.9
+    )
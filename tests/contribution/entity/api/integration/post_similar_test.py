@@ -1,10 +1,12 @@
 # pylint: disable=missing-module-docstring, missing-function-docstring,redefined-outer-name,invalid-name,unused-argument,too-many-arguments
+from unittest.mock import MagicMock, patch
 from uuid import uuid4
 
 import tests.contribution.entity.api.requests as r
 import tests.contribution.entity.common as c
 import tests.entity.common as ce
 from tests.utils import assert_versioned
+from vran.contribution.models_django import ContributionCandidate
 
 
 def test_no_cookies(auth_server):
@@ -198,3 +200,26 @@ def test_similar_entities_with_tag_match(
             }
         },
     )
+
+
+def test_similar_entities_tfidf_stale(auth_server, contribution_candidate, entities):
+    contribution_candidate.match_engine = ContributionCandidate.MATCH_ENGINE_TFIDF
+    contribution_candidate.save()
+    live_server, cookies = auth_server
+    mock = MagicMock()
+    with patch(
+        "vran.contribution.entity.match_entities.existing_entities_tfidf_index", mock
+    ):
+        rsp = r.post_similar(
+            live_server.url,
+            contribution_candidate.id_persistent,
+            [c.id_persistent_entity_duplicate_test],
+            cookies,
+        )
+    assert rsp.status_code == 200
+    mock.assert_not_called()
+    matches = rsp.json()["matches"][c.id_persistent_entity_duplicate_test]["matches"]
+    assert {match["entity"]["id_persistent"] for match in matches} == {
+        ce.id_persistent_test_0,
+        ce.id_persistent_test_1,
+    }
@@ -48,3 +48,18 @@ def put_duplicate(
         cookies=cookies,
         timeout=9,
     )
+
+
+def post_auto_assign_duplicates(
+    url, id_contribution_candidate_persistent, threshold, cookies=None
+):
+    return requests.post(
+        url
+        + (
+            f"/vran/api/contributions/{id_contribution_candidate_persistent}"
+            "/entities/duplicates/auto_assign"
+        ),
+        json={"threshold": threshold},
+        cookies=cookies,
+        timeout=9,
+    )
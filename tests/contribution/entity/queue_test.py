@@ -7,8 +7,13 @@ import tests.contribution.entity.common as c
 import tests.entity.common as ce
 import tests.tag.common as ct
 import vran.contribution.entity.queue as q
-from vran.contribution.entity.models_django import EntityDuplicate
+from vran.contribution.entity.match_entities import (
+    current_entity_matches,
+    stale_matches,
+)
+from vran.contribution.entity.models_django import EntityDuplicate, EntityMatch
 from vran.contribution.models_django import ContributionCandidate
+from vran.contribution.tag_definition.queue import dispatch_read_csv_head
 from vran.entity.models_django import Entity
 from vran.tag.models_django import (
     TagDefinition,
@@ -28,43 +33,17 @@ def entity_match(contribution_candidate):
 
 
 @pytest.mark.django_db
-def test_annotate_duplicates(entities, entity_match):
-    with_replacement_info = q.annotate_with_replacement_info(
-        Entity.objects.all(),  # pylint: disable=no-member
-        EntityDuplicate.objects.all(),  # pylint: disable=no-member
-        "id_persistent",
-    )
-    to_replace = with_replacement_info.filter(
-        replacement_id_entity_persistent__isnull=False
-    ).get()
-    assert to_replace.display_txt == c.display_txt_test_entity_duplicate
-    assert to_replace.replacement_id_entity_persistent == ce.id_persistent_test_1
-    no_replace_ids = with_replacement_info.filter(
-        replacement_id_entity_persistent__isnull=True
-    ).values_list("id_persistent", flat=True)
-    assert list(no_replace_ids) == [ce.id_persistent_test_0, ce.id_persistent_test_1]
-
-
-@pytest.mark.django_db
-def test_deletes_replaced(entity_duplicate, entity_match):
+def test_deletes_replaced(contribution_candidate, entity_duplicate, entity_match):
     assert len(Entity.objects.all()) == 1  # pylint: disable = no-member
-    with_replacement_info = q.annotate_with_replacement_info(
-        Entity.objects.all(),  # pylint: disable=no-member
-        EntityDuplicate.objects.all(),  # pylint: disable=no-member
-        "id_persistent",
-    )
-    q.update_entities(with_replacement_info)
+    q.update_entities(contribution_candidate)
     assert len(Entity.objects.all()) == 0  # pylint: disable = no-member
 
 
 @pytest.mark.django_db
-def test_removes_contribution_candidate_from_others(entity_duplicate):
-    with_replacement_info = q.annotate_with_replacement_info(
-        Entity.objects.all(),  # pylint: disable=no-member
-        EntityDuplicate.objects.all(),  # pylint: disable=no-member
-        "id_persistent",
-    )
-    q.update_entities(with_replacement_info)
+def test_removes_contribution_candidate_from_others(
+    contribution_candidate, entity_duplicate
+):
+    q.update_entities(contribution_candidate)
     entity = Entity.objects.all().get()  # pylint: disable = no-member
     assert entity.contribution_candidate is None
 
@@ -145,16 +124,13 @@ def tag_instance_existing(tag_def, tag_def1, entities):
 
 
 @pytest.mark.django_db
-def test_replaces_entity_of_tag_def(tag_instances_for_replace, user, entity_match):
-    q.update_tag_instances(
-        q.annotate_with_replacement_info(
-            TagInstance.objects,  # pylint: disable=no-member
-            EntityDuplicate.objects.all(),  # pylint: disable=no-member
-            "id_entity_persistent",
-        ),
-        user,
-        c.time_edit_deduplication,
+def test_replaces_entity_of_tag_def(
+    tag_instances_for_replace, contribution_candidate, entity_match
+):
+    id_entity_updated_list = q.update_tag_instances(
+        contribution_candidate, c.time_edit_deduplication
     )
+    assert id_entity_updated_list == [ce.id_persistent_test_1]
     instances = TagInstance.objects.all()  # pylint: disable=no-member
 
     assert len(instances) == 2
@@ -163,16 +139,8 @@ def test_replaces_entity_of_tag_def(tag_instances_for_replace, user, entity_matc
 
 
 @pytest.mark.django_db
-def test_keeps_entity_of_tag_def(user, tag_instances_for_replace):
-    q.update_tag_instances(
-        q.annotate_with_replacement_info(
-            TagInstance.objects,  # pylint: disable=no-member
-            EntityDuplicate.objects.all(),  # pylint: disable=no-member
-            "id_entity_persistent",
-        ),
-        user,
-        c.time_edit_deduplication,
-    )
+def test_keeps_entity_of_tag_def(contribution_candidate, tag_instances_for_replace):
+    assert not q.update_tag_instances(contribution_candidate, c.time_edit_deduplication)
     instances = TagInstance.objects.all()  # pylint: disable=no-member
 
     assert len(instances) == 2
@@ -317,3 +285,162 @@ def test_sets_error(contribution_candidate):
         contribution_candidate.error_msg == "Error during Entity Duplicate Elimination."
     )
     assert contribution_candidate.error_trace == "Exception: error"
+
+
+def test_compute_contribution_matches(contribution_candidate, entities):
+    q.compute_contribution_matches(contribution_candidate.id_persistent)
+    entity_match = EntityMatch.objects.get(  # pylint: disable=no-member
+        contribution_candidate=contribution_candidate,
+        id_entity_persistent=c.id_persistent_entity_duplicate_test,
+    )
+    assert entity_match.entity_version == entities[2].id
+    assert entity_match.tag_instance_version is None
+    assert len(entity_match.matches) == 2
+    assert {match["id_persistent"] for match in entity_match.matches} == {
+        ce.id_persistent_test_0,
+        ce.id_persistent_test_1,
+    }
+    assert (
+        stale_matches(
+            contribution_candidate.id_persistent,
+            [c.id_persistent_entity_duplicate_test],
+        )
+        == []
+    )
+
+
+def test_compute_contribution_matches_tfidf(contribution_candidate, entities):
+    contribution_candidate.match_engine = ContributionCandidate.MATCH_ENGINE_TFIDF
+    contribution_candidate.save()
+    q.compute_contribution_matches(contribution_candidate.id_persistent)
+    entity_match = EntityMatch.objects.get(  # pylint: disable=no-member
+        contribution_candidate=contribution_candidate,
+        id_entity_persistent=c.id_persistent_entity_duplicate_test,
+    )
+    assert len(entity_match.matches) == 2
+    assert {match["id_persistent"] for match in entity_match.matches} == {
+        ce.id_persistent_test_0,
+        ce.id_persistent_test_1,
+    }
+    for match in entity_match.matches:
+        assert match["levenshtein_similarity"] == pytest.approx(12 / 13)
+
+
+def test_stale_matches(contribution_candidate, entities):
+    q.compute_contribution_matches(contribution_candidate.id_persistent)
+    TagInstanceHistory.objects.create(  # pylint: disable=no-member
+        id_persistent="id_tag_instance_stale_test",
+        id_entity_persistent=c.id_persistent_entity_duplicate_test,
+        id_tag_definition_persistent="id_tag_definition_stale_test",
+        time_edit=c.time_edit_test_duplicate,
+        value="value",
+    )
+    assert stale_matches(
+        contribution_candidate.id_persistent,
+        [c.id_persistent_entity_duplicate_test],
+    ) == [c.id_persistent_entity_duplicate_test]
+
+
+def test_auto_assign_duplicates(
+    contribution_candidate, entities, tag_instances_match, tag_merge_request
+):
+    assigned_count, skipped_count = q.auto_assign_duplicates(
+        contribution_candidate.id_persistent, 0.9
+    )
+    assert assigned_count == 1
+    assert skipped_count == 0
+    duplicate = EntityDuplicate.objects.get()  # pylint: disable=no-member
+    assert duplicate.id_origin_persistent == c.id_persistent_entity_duplicate_test
+    assert duplicate.id_destination_persistent == ce.id_persistent_test_1
+
+
+def test_auto_assign_duplicates_job_meta(
+    contribution_candidate, entities, tag_instances_match, tag_merge_request
+):
+    job = MagicMock()
+    job.meta = {}
+    with patch("vran.contribution.entity.queue.get_current_job", lambda: job):
+        q.auto_assign_duplicates(contribution_candidate.id_persistent, 0.9)
+    assert job.meta == {"progress": 1.0, "result": {"assigned": 1, "skipped": 0}}
+    job.save_meta.assert_called_once()
+
+
+def test_auto_assign_duplicates_disabled_match(
+    contribution_candidate, entities, tag_instances_match, tag_merge_request
+):
+    q.compute_contribution_matches(contribution_candidate.id_persistent)
+    Entity.objects.filter(  # pylint: disable=no-member
+        id_persistent=ce.id_persistent_test_1
+    ).update(disabled=True)
+    assigned_count, skipped_count = q.auto_assign_duplicates(
+        contribution_candidate.id_persistent, 0.9
+    )
+    assert assigned_count == 0
+    assert skipped_count == 0
+    assert not EntityDuplicate.objects.exists()  # pylint: disable=no-member
+
+
+def test_current_entity_matches(contribution_candidate, entities):
+    q.compute_contribution_matches(contribution_candidate.id_persistent)
+    Entity.objects.filter(  # pylint: disable=no-member
+        id_persistent=ce.id_persistent_test_1
+    ).update(disabled=True)
+    (entity_match,) = current_entity_matches(
+        EntityMatch.objects.filter(  # pylint: disable=no-member
+            contribution_candidate=contribution_candidate,
+            id_entity_persistent=c.id_persistent_entity_duplicate_test,
+        )
+    )
+    assert [match["id_persistent"] for match in entity_match.matches] == [
+        ce.id_persistent_test_0
+    ]
+
+
+def test_auto_assign_duplicates_below_threshold(contribution_candidate, entities):
+    assigned_count, skipped_count = q.auto_assign_duplicates(
+        contribution_candidate.id_persistent, 0.9
+    )
+    assert assigned_count == 0
+    assert skipped_count == 0
+    assert not EntityDuplicate.objects.exists()  # pylint: disable=no-member
+
+
+def test_auto_assign_duplicates_merged(
+    contribution_candidate, entities, tag_instances_match, tag_merge_request
+):
+    ContributionCandidate.objects.filter(  # pylint: disable=no-member
+        id_persistent=contribution_candidate.id_persistent
+    ).update(state=ContributionCandidate.MERGED)
+    assert q.auto_assign_duplicates(contribution_candidate.id_persistent, 0.9) == (
+        0,
+        0,
+    )
+    assert not EntityDuplicate.objects.exists()  # pylint: disable=no-member
+
+
+def test_auto_assign_duplicates_skips_assigned(
+    contribution_candidate, entities, entity_match
+):
+    assigned_count, skipped_count = q.auto_assign_duplicates(
+        contribution_candidate.id_persistent, 0.1
+    )
+    assert assigned_count == 0
+    assert skipped_count == 1
+    assert EntityDuplicate.objects.count() == 1  # pylint: disable=no-member
+
+
+def test_match_engine_change_recomputes_matches(
+    contribution_candidate, entities, django_capture_on_commit_callbacks
+):
+    q.compute_contribution_matches(contribution_candidate.id_persistent)
+    contribution_candidate.match_engine = ContributionCandidate.MATCH_ENGINE_TFIDF
+    mock = MagicMock()
+    with patch("django_rq.enqueue", mock):
+        with django_capture_on_commit_callbacks(execute=True):
+            dispatch_read_csv_head(
+                ContributionCandidate, contribution_candidate, False, ["match_engine"]
+            )
+    assert not EntityMatch.objects.exists()  # pylint: disable=no-member
+    mock.assert_called_once_with(
+        q.compute_contribution_matches, contribution_candidate.id_persistent
+    )
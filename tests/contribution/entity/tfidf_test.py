@@ -0,0 +1,64 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring,redefined-outer-name,invalid-name
+import pytest
+
+from vran.contribution.entity.tfidf import (
+    TfidfIndex,
+    TfidfMatcher,
+    char_ngrams,
+    levenshtein_similarity,
+)
+
+id_persistent_list = ["id_jane", "id_john", "id_max", "id_empty"]
+display_txt_list = ["Jane Doe", "John Doe", "Max Mustermann", None]
+
+
+@pytest.fixture
+def tfidf_index():
+    return TfidfIndex(id_persistent_list, display_txt_list)
+
+
+def test_char_ngrams():
+    assert char_ngrams("Ab") == [" ab", "ab "]
+    assert char_ngrams(None) == []
+
+
+def test_levenshtein_similarity():
+    assert levenshtein_similarity("test entity 0", "test entity d") == pytest.approx(
+        12 / 13
+    )
+    assert levenshtein_similarity("Max Mustermann", "Jane Doe") == 0.0
+    assert levenshtein_similarity(None, "Jane Doe") == 0.0
+
+
+def test_top_k(tfidf_index):
+    top = tfidf_index.top_k("Jane Do", 2)
+    assert [row for row, _ in top] == [0, 1]
+    assert top[0][1] > top[1][1]
+    assert tfidf_index.top_k("xyz", 2) == []
+
+
+def test_nearest(tfidf_index):
+    nearest = tfidf_index.nearest("John Doe", 3)
+    assert nearest[0] == ("id_john", 1.0)
+    assert "id_max" not in [id_persistent for id_persistent, _ in nearest[:2]]
+
+
+def test_nearest_neighbours_process_pool(tfidf_index):
+    text_list = ["Jane Doe", "John Do", "Max Musterman", None]
+    expected = [tfidf_index.nearest(text, 2) for text in text_list]
+    with TfidfMatcher(tfidf_index, process_count=2, block_size=1) as matcher:
+        pool = matcher.pool
+        assert matcher.nearest_neighbours(text_list, 2) == expected
+        # The worker processes are reused for further searches.
+        assert matcher.nearest_neighbours(text_list[::-1], 2) == expected[::-1]
+        assert matcher.pool is pool
+    assert matcher.pool is None
+
+
+def test_nearest_neighbours_without_pool(tfidf_index):
+    matcher = TfidfMatcher(tfidf_index, process_count=1, block_size=1)
+    with matcher:
+        assert matcher.pool is None
+        assert matcher.nearest_neighbours(["Jane Doe"], 1) == [
+            tfidf_index.nearest("Jane Doe", 1)
+        ]
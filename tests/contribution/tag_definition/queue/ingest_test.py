@@ -21,12 +21,28 @@ csv_cols = {
 }
 
 
+def mk_csv_mock(data_frame):
+    def read_chunks(*args, chunksize=None, **kwargs):
+        return (
+            data_frame.iloc[offset : offset + chunksize]
+            for offset in range(0, len(data_frame), chunksize)
+        )
+
+    return MagicMock(side_effect=read_chunks)
+
+
+@pytest.fixture(autouse=True)
+def encoding_mock():
+    with patch(
+        "vran.contribution.tag_definition.queue.util.detect_encoding",
+        MagicMock(return_value="utf-8"),
+    ) as mock:
+        yield mock
+
+
 @pytest.fixture
 def csv_mock():
-    csv_mock = MagicMock()
-
-    csv_mock.return_value = pd.DataFrame(csv_cols)
-    return csv_mock
+    return mk_csv_mock(pd.DataFrame(csv_cols))
 
 
 @pytest.fixture
@@ -40,9 +56,7 @@ def csv_mock_with_empty_lines():
             new_vals.append("\t\n")
             new_vals.append(None)
         new_cols[name] = new_vals
-    csv_mock = MagicMock()
-    csv_mock.return_value = pd.DataFrame(new_cols)
-    return csv_mock
+    return mk_csv_mock(pd.DataFrame(new_cols))
 
 
 @pytest.fixture
@@ -257,3 +271,42 @@ def test_ingest_with_empty(
         .state
         == ContributionCandidate.VALUES_EXTRACTED
     )
+
+
+def test_ingest_in_batches(
+    party_tag_def,
+    party_contribution,
+    csv_mock,
+):
+    contribution_other = party_contribution.contribution_candidate
+    contribution_other.state = ContributionCandidate.COLUMNS_EXTRACTED
+    contribution_other.save()
+    with patch("vran.contribution.tag_definition.queue.util.read_csv", csv_mock), patch(
+        "vran.contribution.tag_definition.queue.ingest.INGEST_BATCH_SIZE", 1
+    ):
+        ingest_values_from_csv(contribution_other.id_persistent)
+    assert get_tag_value_by_mr("name_0", party_tag_def.id_persistent) == "party_0"
+    assert get_tag_value_by_mr("name_1", party_tag_def.id_persistent) == "party_1"
+    assert (
+        Entity.most_recent()
+        .filter(contribution_candidate=contribution_other, proxy_name="entity")
+        .count()
+        == 2
+    )
+
+
+def test_invalid_value_sets_error(verified_contribution):
+    csv_mock = mk_csv_mock(
+        pd.DataFrame({**csv_cols, "verified": ["true", "not a boolean"]})
+    )
+    contribution = verified_contribution.contribution_candidate
+    contribution.state = ContributionCandidate.COLUMNS_EXTRACTED
+    contribution.save()
+    with patch("vran.contribution.tag_definition.queue.util.read_csv", csv_mock):
+        ingest_values_from_csv(contribution.id_persistent)
+    contribution = ContributionCandidate.by_id_persistent(
+        contribution.id_persistent, contribution.created_by
+    ).get()
+    assert contribution.state == ContributionCandidate.COLUMNS_EXTRACTED
+    assert contribution.error_msg == "Error during ingestion of assigned tags."
+    assert not Entity.objects.exists()  # pylint: disable=no-member
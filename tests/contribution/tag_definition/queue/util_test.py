@@ -0,0 +1,71 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring,redefined-outer-name,invalid-name,disable=unused-argument
+from unittest.mock import MagicMock, patch
+
+from vran.contribution.tag_definition.queue.util import (
+    detect_encoding,
+    read_csv_of_candidate,
+)
+
+
+def test_detect_utf8(tmp_path):
+    pth = tmp_path / "utf8.csv"
+    pth.write_bytes("name\nKöln\n".encode("utf-8"))
+    assert detect_encoding(pth) == "utf-8"
+
+
+def test_detect_utf8_cut_in_character(tmp_path):
+    pth = tmp_path / "utf8.csv"
+    content = "name\nKöln\n".encode("utf-8")
+    pth.write_bytes(content)
+    # The first block ends within the two bytes of the umlaut.
+    assert detect_encoding(pth, block_size=7) == "utf-8"
+
+
+def test_detect_latin1(tmp_path):
+    pth = tmp_path / "latin1.csv"
+    pth.write_bytes("name\nKöln\n".encode("iso-8859-1"))
+    assert detect_encoding(pth) == "iso-8859-1"
+
+
+def test_detect_latin1_after_first_block(tmp_path):
+    pth = tmp_path / "latin1.csv"
+    pth.write_bytes("name\nBonn\nKöln\n".encode("iso-8859-1"))
+    assert detect_encoding(pth, block_size=8) == "iso-8859-1"
+
+
+def test_detect_only_prefix(tmp_path):
+    pth = tmp_path / "latin1.csv"
+    pth.write_bytes("name\nBonn\nKöln\n".encode("iso-8859-1"))
+    assert detect_encoding(pth, max_size=10, block_size=4) == "utf-8"
+    assert detect_encoding(pth, max_size=20, block_size=4) == "iso-8859-1"
+
+
+def test_read_csv_latin1_after_sample(tmp_path, settings):
+    settings.CONTRIBUTION_DIRECTORY = tmp_path
+    rows = ["Bonn"] * 300000 + ["Köln"]
+    (tmp_path / "latin1.csv").write_bytes(
+        "\n".join(["name"] + rows).encode("iso-8859-1")
+    )
+    contribution = MagicMock(file_name="latin1.csv", has_header=True)
+    with patch(
+        "vran.contribution.tag_definition.queue.util.ENCODING_SAMPLE_SIZE", 1000
+    ):
+        assert (
+            list(read_csv_of_candidate(contribution, nrows=10)["name"]) == ["Bonn"] * 10
+        )
+        assert list(read_csv_of_candidate(contribution)["name"]) == rows
+
+
+def test_read_csv_chunks_latin1_after_first_chunk(tmp_path, settings):
+    settings.CONTRIBUTION_DIRECTORY = tmp_path
+    rows = ["Bonn"] * 300000 + ["Köln"]
+    (tmp_path / "latin1.csv").write_bytes(
+        "\n".join(["name"] + rows).encode("iso-8859-1")
+    )
+    contribution = MagicMock(file_name="latin1.csv", has_header=True)
+    values = [
+        value
+        for data_frame in read_csv_of_candidate(contribution, chunksize=100000)
+        for value in data_frame["name"]
+    ]
+    assert values == rows
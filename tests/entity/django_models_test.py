@@ -5,7 +5,7 @@ import pytest
 
 import tests.entity.common as c
 from vran.contribution.models_django import ContributionCandidate
-from vran.entity.models_django import Entity
+from vran.entity.models_django import Entity, EntityHead
 from vran.exception import DbObjectExistsException, EntityUpdatedException
 
 
@@ -164,3 +164,32 @@ def test_keeps_contribution_candidate(entity0, user):
         str(changed.contribution_candidate.id_persistent) == contribution.id_persistent
     )
     assert do_write
+
+
+@pytest.mark.django_db
+def test_head_follows_new_version(entity0, updated_entity0):
+    entity0.save()
+    assert (
+        EntityHead.objects.get(  # pylint: disable=no-member
+            id_persistent=c.id_persistent_test_0
+        ).entity_id
+        == entity0.id
+    )
+    updated_entity0.save()
+    assert (
+        EntityHead.objects.get(  # pylint: disable=no-member
+            id_persistent=c.id_persistent_test_0
+        ).entity_id
+        == updated_entity0.id
+    )
+    assert list(Entity.most_recent()) == [updated_entity0]
+
+
+@pytest.mark.django_db
+def test_head_recomputed_on_delete(entity0, updated_entity0):
+    entity0.save()
+    updated_entity0.save()
+    Entity.objects.filter(id=updated_entity0.id).delete()  # pylint: disable=no-member
+    assert Entity.most_recent_by_id(c.id_persistent_test_0) == entity0
+    entity0.delete()
+    assert not EntityHead.objects.exists()  # pylint: disable=no-member
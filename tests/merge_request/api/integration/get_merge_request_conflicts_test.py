@@ -53,7 +53,7 @@ def test_conflicts_no_resolution(
     )
     assert rsp.status_code == 200
     json = rsp.json()
-    assert len(json) == 3
+    assert len(json) == 5
     assert_versioned(
         json["merge_request"],
         {
@@ -158,7 +158,7 @@ def test_conflicts_same_value(
     )
     assert rsp.status_code == 200
     json = rsp.json()
-    assert len(json) == 3
+    assert len(json) == 5
     assert_versioned(
         json["merge_request"],
         {
@@ -216,7 +216,7 @@ def test_conflict_resolved(
     )
     assert rsp.status_code == 200
     json = rsp.json()
-    assert len(json) == 3
+    assert len(json) == 5
     assert_versioned(
         json["merge_request"],
         {
@@ -313,7 +313,7 @@ def test_conflict_resolved_tag_def_origin_changed(
     )
     assert rsp.status_code == 200
     json = rsp.json()
-    assert len(json) == 3
+    assert len(json) == 5
     assert_versioned(
         json["merge_request"],
         {
@@ -448,7 +448,7 @@ def test_tag_instance_destination_value_added(
     )
     assert rsp.status_code == 200
     json = rsp.json()
-    assert len(json) == 3
+    assert len(json) == 5
     assert_versioned(
         json["merge_request"],
         {
@@ -530,3 +530,91 @@ def test_tag_instance_destination_value_added(
         ],
     )
     assert_versioned(json["updated"], [conflict1])
+
+
+def test_conflicts_chunked(
+    auth_server, merge_request_user, conflict_resolution_replace
+):
+    server, cookies = auth_server
+    rsp = req.get_conflicts(
+        server.url,
+        merge_request_user.id_persistent,
+        cookies=cookies,
+        params={"limit": 1},
+    )
+    assert rsp.status_code == 200
+    json = rsp.json()
+    assert len(json["conflicts"]) == 1
+    assert json["conflicts"][0]["tag_instance_origin"]["value"] == c.value_origin
+    assert json["next_offset_updated"] is None
+    next_offset = json["next_offset_conflicts"]
+    assert next_offset is not None
+    rsp = req.get_conflicts(
+        server.url,
+        merge_request_user.id_persistent,
+        cookies=cookies,
+        params={"limit": 1, "offset_conflicts": next_offset},
+    )
+    assert rsp.status_code == 200
+    json = rsp.json()
+    assert len(json["conflicts"]) == 1
+    assert json["conflicts"][0]["tag_instance_origin"]["value"] == c.value_origin1
+    assert json["conflicts"][0]["replace"]
+    next_offset = json["next_offset_conflicts"]
+    rsp = req.get_conflicts(
+        server.url,
+        merge_request_user.id_persistent,
+        cookies=cookies,
+        params={"limit": 1, "offset_conflicts": next_offset},
+    )
+    assert rsp.status_code == 200
+    json = rsp.json()
+    assert json["conflicts"] == []
+    assert json["next_offset_conflicts"] is None
+
+
+def test_conflicts_limit_too_large(auth_server, merge_request_user):
+    server, cookies = auth_server
+    rsp = req.get_conflicts(
+        server.url,
+        merge_request_user.id_persistent,
+        cookies=cookies,
+        params={"limit": 100000},
+    )
+    assert rsp.status_code == 400
+
+
+def test_conflict_summary(auth_server, merge_request_user, conflict_resolution_replace):
+    server, cookies = auth_server
+    rsp = req.get_conflict_summary(
+        server.url, merge_request_user.id_persistent, cookies=cookies
+    )
+    assert rsp.status_code == 200
+    assert rsp.json() == {"conflict_count": 2, "resolved_count": 1, "updated_count": 0}
+
+
+def test_conflict_summary_no_conflicts(auth_server, merge_request_user):
+    server, cookies = auth_server
+    rsp = req.get_conflict_summary(
+        server.url, merge_request_user.id_persistent, cookies=cookies
+    )
+    assert rsp.status_code == 200
+    assert rsp.json() == {"conflict_count": 0, "resolved_count": 0, "updated_count": 0}
+
+
+def test_conflict_summary_updated(
+    auth_server, merge_request_user, conflict_resolution_replace
+):
+    old_tag_definition = conflict_resolution_replace.tag_definition_origin
+    TagDefinitionHistory.change_or_create(
+        id_persistent=old_tag_definition.id_persistent,
+        version=old_tag_definition.id,
+        name="changed tag definition test",
+        time_edit=datetime(1912, 4, 8),
+    )[0].save()
+    server, cookies = auth_server
+    rsp = req.get_conflict_summary(
+        server.url, merge_request_user.id_persistent, cookies=cookies
+    )
+    assert rsp.status_code == 200
+    assert rsp.json() == {"conflict_count": 2, "resolved_count": 0, "updated_count": 1}
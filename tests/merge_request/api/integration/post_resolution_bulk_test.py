@@ -0,0 +1,166 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring,redefined-outer-name,invalid-name,unused-argument,too-many-locals,too-many-arguments,too-many-statements
+from unittest.mock import MagicMock, patch
+
+import tests.entity.common as ce
+import tests.merge_request.api.integration.requests as req
+import tests.merge_request.common as c
+from vran.exception import NotAuthenticatedException
+from vran.merge_request.models_django import (
+    TagConflictResolution as ConflictResolutionDb,
+)
+
+
+def test_unknown_user(auth_server):
+    mock = MagicMock()
+    mock.side_effect = NotAuthenticatedException()
+    server, cookies = auth_server
+    with patch("vran.merge_request.api.check_user", mock):
+        rsp = req.post_resolution_bulk(
+            server.url, c.id_persistent_merge_request, True, cookies=cookies
+        )
+        assert rsp.status_code == 401
+
+
+def test_no_mr(auth_server):
+    server, cookies = auth_server
+    rsp = req.post_resolution_bulk(
+        server.url, "4e679630-241e-40f8-b175-c4b7916be379", True, cookies=cookies
+    )
+    assert rsp.status_code == 404
+
+
+def test_no_mode(auth_server, merge_request_user):
+    server, cookies = auth_server
+    rsp = req.post_resolution_bulk(
+        server.url, merge_request_user.id_persistent, cookies=cookies
+    )
+    assert rsp.status_code == 400
+
+
+def test_replace_all(
+    auth_server,
+    merge_request_user,
+    instances_merge_request_origin_user,
+    instance_merge_request_destination_user_conflict,
+):
+    server, cookies = auth_server
+    rsp = req.post_resolution_bulk(
+        server.url, merge_request_user.id_persistent, True, cookies=cookies
+    )
+    assert rsp.status_code == 200
+    assert rsp.json() == {"resolved_count": 2}
+    resolutions = ConflictResolutionDb.objects.filter(  # pylint: disable=no-member
+        merge_request=merge_request_user
+    ).order_by("tag_instance_origin_id")
+    assert len(resolutions) == 2
+    assert all(resolution.replace for resolution in resolutions)
+    assert resolutions[0].tag_instance_origin_id == (
+        instances_merge_request_origin_user[0].id
+    )
+    assert resolutions[0].tag_instance_destination_id is None
+    assert resolutions[1].tag_instance_origin_id == (
+        instances_merge_request_origin_user[1].id
+    )
+    assert resolutions[1].tag_instance_destination_id == (
+        instance_merge_request_destination_user_conflict.id
+    )
+    assert len(ConflictResolutionDb.only_recent(resolutions)) == 2
+
+
+def test_keep_all_replaces_existing(
+    auth_server, merge_request_user, conflict_resolution_replace
+):
+    server, cookies = auth_server
+    rsp = req.post_resolution_bulk(
+        server.url, merge_request_user.id_persistent, False, cookies=cookies
+    )
+    assert rsp.status_code == 200
+    assert rsp.json() == {"resolved_count": 2}
+    resolutions = ConflictResolutionDb.objects.filter(  # pylint: disable=no-member
+        merge_request=merge_request_user
+    )
+    assert len(resolutions) == 2
+    assert not any(resolution.replace for resolution in resolutions)
+
+
+def test_decisions(
+    auth_server,
+    merge_request_user,
+    instances_merge_request_origin_user,
+    instance_merge_request_destination_user_conflict,
+):
+    server, cookies = auth_server
+    rsp = req.post_resolution_bulk(
+        server.url,
+        merge_request_user.id_persistent,
+        decisions=[
+            {
+                "id_entity_persistent": ce.id_persistent_test_1,
+                "id_tag_instance_origin_version": instances_merge_request_origin_user[
+                    1
+                ].id,
+                "id_tag_instance_destination_version": (
+                    instance_merge_request_destination_user_conflict.id
+                ),
+                "replace": True,
+            }
+        ],
+        cookies=cookies,
+    )
+    assert rsp.status_code == 200
+    assert rsp.json() == {"resolved_count": 1}
+    resolution = ConflictResolutionDb.objects.get(  # pylint: disable=no-member
+        merge_request=merge_request_user
+    )
+    assert resolution.replace
+    assert resolution.entity.id_persistent == ce.id_persistent_test_1
+
+
+def test_decisions_outdated(
+    auth_server,
+    merge_request_user,
+    instances_merge_request_origin_user,
+    instance_merge_request_destination_user_conflict_changed,
+):
+    server, cookies = auth_server
+    rsp = req.post_resolution_bulk(
+        server.url,
+        merge_request_user.id_persistent,
+        decisions=[
+            {
+                "id_entity_persistent": ce.id_persistent_test_0,
+                "id_tag_instance_origin_version": instances_merge_request_origin_user[
+                    0
+                ].id,
+                "id_tag_instance_destination_version": None,
+                "replace": True,
+            },
+            {
+                "id_entity_persistent": ce.id_persistent_test_1,
+                "id_tag_instance_origin_version": instances_merge_request_origin_user[
+                    1
+                ].id,
+                "id_tag_instance_destination_version": (
+                    instance_merge_request_destination_user_conflict_changed.previous_version_id
+                ),
+                "replace": True,
+            },
+        ],
+        cookies=cookies,
+    )
+    assert rsp.status_code == 400
+    assert not ConflictResolutionDb.objects.filter(  # pylint: disable=no-member
+        merge_request=merge_request_user
+    ).exists()
+
+
+def test_replace_all_no_conflicts(auth_server, merge_request_user):
+    server, cookies = auth_server
+    rsp = req.post_resolution_bulk(
+        server.url, merge_request_user.id_persistent, True, cookies=cookies
+    )
+    assert rsp.status_code == 200
+    assert rsp.json() == {"resolved_count": 0}
+    assert not ConflictResolutionDb.objects.filter(  # pylint: disable=no-member
+        merge_request=merge_request_user
+    ).exists()
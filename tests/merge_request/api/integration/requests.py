@@ -6,9 +6,19 @@ def get_merge_requests(url, cookies=None):
     return requests.get(url + "/vran/api/merge_requests", cookies=cookies, timeout=900)
 
 
-def get_conflicts(url, id_merge_request_persistent, cookies=None):
+def get_conflicts(url, id_merge_request_persistent, cookies=None, params=None):
     return requests.get(
         url + f"/vran/api/merge_requests/{id_merge_request_persistent}/conflicts",
+        params=params,
+        cookies=cookies,
+        timeout=900,
+    )
+
+
+def get_conflict_summary(url, id_merge_request_persistent, cookies=None):
+    return requests.get(
+        url
+        + f"/vran/api/merge_requests/{id_merge_request_persistent}/conflicts/summary",
         cookies=cookies,
         timeout=900,
     )
@@ -65,3 +75,19 @@ def patch_merge_request(url, id_merge_request_persistent, patch_dict, cookies=No
         cookies=cookies,
         timeout=900,
     )
+
+
+def post_resolution_bulk(
+    url, id_merge_request_persistent, replace_all=None, decisions=None, cookies=None
+):
+    json = {}
+    if replace_all is not None:
+        json["replace_all"] = replace_all
+    if decisions is not None:
+        json["decisions"] = decisions
+    return requests.post(
+        url + f"/vran/api/merge_requests/{id_merge_request_persistent}/resolve/bulk",
+        json=json,
+        cookies=cookies,
+        timeout=900,
+    )
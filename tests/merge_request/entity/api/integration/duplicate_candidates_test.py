@@ -0,0 +1,61 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring,redefined-outer-name,invalid-name,unused-argument
+from unittest.mock import MagicMock, patch
+
+import tests.merge_request.entity.common as c
+from tests.merge_request.entity.api.integration import requests as req
+from vran.merge_request.entity.models_django import EntityDuplicateCandidate
+from vran.merge_request.entity.queue import detect_entity_duplicates
+
+
+def test_detect_normal_user(auth_server1):
+    server, _, cookies = auth_server1
+    mock = MagicMock()
+    with patch("vran.merge_request.entity.api.enqueue", mock):
+        rsp = req.post_detect_duplicates(server.url, cookies=cookies)
+    assert rsp.status_code == 403
+    mock.assert_not_called()
+
+
+def test_detect(auth_server_commissioner):
+    server, cookies = auth_server_commissioner
+    mock = MagicMock()
+    with patch("vran.merge_request.entity.api.enqueue", mock):
+        rsp = req.post_detect_duplicates(server.url, cookies=cookies)
+    assert rsp.status_code == 200
+    mock.assert_called_once_with(detect_entity_duplicates)
+
+
+def test_get_candidates_normal_user(auth_server1):
+    server, _, cookies = auth_server1
+    rsp = req.get_duplicate_candidates(server.url, cookies=cookies)
+    assert rsp.status_code == 403
+
+
+def test_get_candidates(
+    auth_server_commissioner, origin_entity_for_mr, destination_entity_for_mr
+):
+    server, cookies = auth_server_commissioner
+    for id_origin_persistent, version, score in [
+        (c.id_entity_origin_persistent, origin_entity_for_mr.id, 0.7),
+        ("not-existing", origin_entity_for_mr.id, 0.9),
+    ]:
+        EntityDuplicateCandidate.objects.create(  # pylint: disable=no-member
+            id_origin_persistent=id_origin_persistent,
+            id_destination_persistent=c.id_entity_destination_persistent,
+            entity_origin_version=version,
+            entity_destination_version=destination_entity_for_mr.id,
+            levenshtein_similarity=0.5,
+            equal_instance_count=1,
+            total_instance_count=1,
+            score=score,
+        )
+    rsp = req.get_duplicate_candidates(server.url, cookies=cookies)
+    assert rsp.status_code == 200
+    candidates = rsp.json()["duplicate_candidates"]
+    assert len(candidates) == 1
+    assert candidates[0]["origin"]["id_persistent"] == c.id_entity_origin_persistent
+    assert (
+        candidates[0]["destination"]["id_persistent"]
+        == c.id_entity_destination_persistent
+    )
+    assert candidates[0]["score"] == 0.7
@@ -0,0 +1,54 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring,redefined-outer-name,invalid-name,unused-argument
+from unittest.mock import MagicMock, patch
+
+import tests.merge_request.entity.common as c
+import tests.user.common as cu
+from tests.merge_request.entity.api.integration import requests as req
+from vran.merge_request.entity.queue import deduplicate_entities
+
+
+def test_no_cookies(auth_server_commissioner):
+    server, _ = auth_server_commissioner
+    rsp = req.post_deduplicate(
+        server.url,
+        [[c.id_entity_origin_persistent, c.id_entity_destination_persistent]],
+    )
+    assert rsp.status_code == 401
+
+
+def test_normal_user(auth_server1):
+    server, _, cookies = auth_server1
+    rsp = req.post_deduplicate(
+        server.url,
+        [[c.id_entity_origin_persistent, c.id_entity_destination_persistent]],
+        cookies=cookies,
+    )
+    assert rsp.status_code == 403
+
+
+def test_no_pairs(auth_server_commissioner):
+    server, cookies = auth_server_commissioner
+    mock = MagicMock()
+    with patch("vran.merge_request.entity.api.enqueue", mock):
+        rsp = req.post_deduplicate(server.url, [], cookies=cookies)
+    assert rsp.status_code == 400
+    mock.assert_not_called()
+
+
+def test_start_deduplication(auth_server_commissioner):
+    server, cookies = auth_server_commissioner
+    mock = MagicMock()
+    mock.return_value.id = "id_job_test"
+    with patch("vran.merge_request.entity.api.enqueue", mock):
+        rsp = req.post_deduplicate(
+            server.url,
+            [[c.id_entity_origin_persistent, c.id_entity_destination_persistent]],
+            cookies=cookies,
+        )
+    assert rsp.status_code == 200
+    assert rsp.json() == {"id_job": "id_job_test"}
+    mock.assert_called_once_with(
+        deduplicate_entities,
+        [(c.id_entity_origin_persistent, c.id_entity_destination_persistent)],
+        cu.test_uuid_commissioner,
+    )
@@ -90,3 +90,29 @@ def post_start_merge(url, id_merge_request_persistent, cookies=None):
         cookies=cookies,
         timeout=900,
     )
+
+
+def post_deduplicate(url, pairs, cookies=None):
+    return requests.post(
+        url + "/vran/api/merge_requests/entities/deduplicate",
+        json={"pairs": pairs},
+        cookies=cookies,
+        timeout=900,
+    )
+
+
+def post_detect_duplicates(url, cookies=None):
+    return requests.post(
+        url + "/vran/api/merge_requests/entities/duplicate_candidates",
+        cookies=cookies,
+        timeout=900,
+    )
+
+
+def get_duplicate_candidates(url, offset=0, limit=100, cookies=None):
+    return requests.get(
+        url + "/vran/api/merge_requests/entities/duplicate_candidates",
+        params={"offset": offset, "limit": limit},
+        cookies=cookies,
+        timeout=900,
+    )
@@ -1,13 +1,29 @@
 # pylint: disable=missing-module-docstring, missing-function-docstring,redefined-outer-name,invalid-name,unused-argument,too-many-arguments
 
+import pytest
 from django.db import models
 
 from tests.merge_request.entity import common as c
 from vran.entity.models_django import Entity
-from vran.merge_request.entity.models_django import EntityMergeRequest
-from vran.merge_request.entity.queue import apply_entity_merge_request
+from vran.merge_request.entity.models_django import (
+    EntityDuplicateCandidate,
+    EntityMergeRequest,
+)
+from vran.merge_request.entity.queue import (
+    apply_entity_merge_request,
+    cluster_survivors,
+    deduplicate_entities,
+    detect_entity_duplicates,
+    duplicate_clusters,
+    free_tag_definition_names,
+)
 from vran.merge_request.models_django import TagMergeRequest
-from vran.tag.models_django import TagDefinition, TagInstance
+from vran.tag.models_django import (
+    TagDefinition,
+    TagDefinitionHistory,
+    TagInstance,
+    TagInstanceHistory,
+)
 
 
 def test_creates_tag_merge_requests(conflict_resolution_replace):
@@ -115,3 +131,294 @@ def test_creates_tag_merge_request_for_updated(
         .filter(hidden=True)
     )
     assert len(hidden_tag_def_instances) == 3
+
+
+def test_free_tag_definition_names(conflict_resolution_replace):
+    merge_request = conflict_resolution_replace.merge_request
+    tag_definition = conflict_resolution_replace.tag_definition
+    prefix = f"from entity merge {merge_request.id_persistent}_"
+    TagDefinitionHistory.objects.create(  # pylint: disable=no-member
+        id_persistent="a4f1f0f4-1ab4-4c02-8fd5-1f6d8a0e9b2c",
+        name=prefix + "0",
+        id_parent_persistent=tag_definition.id_persistent,
+        type=TagDefinition.STRING,
+        time_edit=tag_definition.time_edit,
+        owner=merge_request.created_by,
+        hidden=True,
+    )
+    other_merge_request = EntityMergeRequest(
+        id_persistent="0d7c4b8e-5a3f-4e1b-9c2d-6f8a7b9c0d1e"
+    )
+    names = free_tag_definition_names(
+        [
+            (merge_request, tag_definition.id_persistent),
+            (merge_request, tag_definition.id_persistent),
+            (merge_request, "other"),
+            (other_merge_request, tag_definition.id_persistent),
+        ]
+    )
+    assert names == [
+        prefix + "1",
+        prefix + "2",
+        prefix + "0",
+        f"from entity merge {other_merge_request.id_persistent}_0",
+    ]
+
+
+def test_duplicate_clusters():
+    clusters = duplicate_clusters(
+        [("a", "b"), ("c", "d"), ("b", "c"), ("e", "f"), ("f", "e"), ("g", "g")]
+    )
+    assert sorted(clusters) == [["a", "b", "c", "d"], ["e", "f"]]
+
+
+def test_cluster_survivors_skips_contribution_entities(
+    contribution_for_mr, origin_entity_for_mr, destination_entity_for_mr
+):
+    id_contribution_entity_persistent = "5c0f3a52-6f5e-4d2a-9a43-0d7f8f0c2e11"
+    Entity.objects.create(  # pylint: disable=no-member
+        id_persistent=id_contribution_entity_persistent,
+        display_txt="contribution entity",
+        time_edit=c.time_entity_origin,
+        contribution_candidate=contribution_for_mr,
+    )
+    survivors = cluster_survivors(
+        [
+            [
+                id_contribution_entity_persistent,
+                c.id_entity_destination_persistent,
+                c.id_entity_origin_persistent,
+            ]
+        ]
+    )
+    assert survivors == {
+        c.id_entity_destination_persistent: c.id_entity_origin_persistent
+    }
+
+
+def test_deduplicate_entities(
+    instances_merge_request_origin_user,
+    instance_merge_request_destination_user_no_conflict,
+    tag_def,
+    user_commissioner,
+):
+    id_third_persistent = "0e6c0b71-2a5e-4f8e-9b1c-3c7c9d1b3f55"
+    Entity.objects.create(  # pylint: disable=no-member
+        id_persistent=id_third_persistent,
+        display_txt="third entity",
+        time_edit=c.time_entity_destination,
+    )
+    TagInstanceHistory.objects.create(  # pylint: disable=no-member
+        id_entity_persistent=id_third_persistent,
+        id_tag_definition_persistent=tag_def.id_persistent,
+        value=c.value_origin,
+        id_persistent="9b0e4f1c-0d0c-4b44-8f43-5f2f0b1c7a6e",
+        time_edit=c.time_instance_destination,
+    )
+    merged_count = deduplicate_entities(
+        [
+            (id_third_persistent, c.id_entity_destination_persistent),
+            (c.id_entity_destination_persistent, c.id_entity_origin_persistent),
+        ],
+        user_commissioner.id_persistent,
+    )
+    assert merged_count == 2
+    assert [entity.id_persistent for entity in Entity.most_recent_queryset()] == [
+        c.id_entity_origin_persistent
+    ]
+    survivor_instances = TagInstance.objects.filter(  # pylint: disable=no-member
+        id_entity_persistent=c.id_entity_origin_persistent
+    )
+    assert len(survivor_instances) == 4
+    assert {instance.value for instance in survivor_instances} == {
+        c.value_origin,
+        c.value_origin1,
+        c.value_origin_curated,
+    }
+    merged_requests = EntityMergeRequest.objects.filter(  # pylint: disable=no-member
+        state=EntityMergeRequest.MERGED
+    )
+    assert {
+        (mr.id_origin_persistent, mr.id_destination_persistent)
+        for mr in merged_requests
+    } == {
+        (id_third_persistent, c.id_entity_origin_persistent),
+        (c.id_entity_destination_persistent, c.id_entity_origin_persistent),
+    }
+
+
+def visible_instances(id_entity_persistent):
+    return TagInstance.objects.filter(  # pylint: disable=no-member
+        id_entity_persistent=id_entity_persistent,
+        id_tag_definition_persistent__in=TagDefinition.query_set().values(
+            "id_persistent"
+        ),
+    )
+
+
+def test_deduplicate_entities_without_write_access(
+    origin_entity_for_mr,
+    destination_entity_for_mr,
+    tag_def,
+    tag_def_curated,
+    user_commissioner,
+):
+    for id_persistent, tag_definition, value in [
+        (c.id_instance_destination, tag_def, c.value_destination),
+        (
+            c.id_instance_destination_curated,
+            tag_def_curated,
+            c.value_destination_curated,
+        ),
+    ]:
+        TagInstanceHistory.objects.create(  # pylint: disable=no-member
+            id_entity_persistent=c.id_entity_destination_persistent,
+            id_tag_definition_persistent=tag_definition.id_persistent,
+            value=value,
+            id_persistent=id_persistent,
+            time_edit=c.time_instance_destination,
+        )
+    merged_count = deduplicate_entities(
+        [(c.id_entity_destination_persistent, c.id_entity_origin_persistent)],
+        user_commissioner.id_persistent,
+    )
+    assert merged_count == 1
+    # The curated tag definition is writable for commissioners.
+    assert [
+        (instance.id_tag_definition_persistent, instance.value)
+        for instance in visible_instances(c.id_entity_origin_persistent)
+    ] == [(tag_def_curated.id_persistent, c.value_destination_curated)]
+    tag_merge_request = TagMergeRequest.objects.get()  # pylint: disable=no-member
+    assert tag_merge_request.id_destination_persistent == tag_def.id_persistent
+    assert tag_merge_request.assigned_to == tag_def.owner
+    assert tag_merge_request.created_by == user_commissioner
+    instance_hidden = TagInstance.objects.get(  # pylint: disable=no-member
+        id_tag_definition_persistent=tag_merge_request.id_origin_persistent
+    )
+    assert instance_hidden.id_entity_persistent == c.id_entity_origin_persistent
+    assert instance_hidden.value == c.value_destination
+
+
+def test_deduplicate_entities_differing_values(
+    origin_entity_for_mr, destination_entity_for_mr, tag_def_curated, user_commissioner
+):
+    for id_persistent, id_entity_persistent, value in [
+        (
+            c.id_instance_origin_curated,
+            c.id_entity_origin_persistent,
+            c.value_origin_curated,
+        ),
+        (
+            c.id_instance_destination_curated,
+            c.id_entity_destination_persistent,
+            c.value_destination_curated,
+        ),
+    ]:
+        TagInstanceHistory.objects.create(  # pylint: disable=no-member
+            id_entity_persistent=id_entity_persistent,
+            id_tag_definition_persistent=tag_def_curated.id_persistent,
+            value=value,
+            id_persistent=id_persistent,
+            time_edit=c.time_instance_destination,
+        )
+    merged_count = deduplicate_entities(
+        [(c.id_entity_destination_persistent, c.id_entity_origin_persistent)],
+        user_commissioner.id_persistent,
+    )
+    assert merged_count == 1
+    assert [
+        instance.value for instance in visible_instances(c.id_entity_origin_persistent)
+    ] == [c.value_origin_curated]
+    tag_merge_request = TagMergeRequest.objects.get()  # pylint: disable=no-member
+    assert tag_merge_request.id_destination_persistent == tag_def_curated.id_persistent
+    assert tag_merge_request.assigned_to is None
+    instance_hidden = TagInstance.objects.get(  # pylint: disable=no-member
+        id_tag_definition_persistent=tag_merge_request.id_origin_persistent
+    )
+    assert instance_hidden.id_entity_persistent == c.id_entity_origin_persistent
+    assert instance_hidden.value == c.value_destination_curated
+
+
+def test_detect_entity_duplicates(db, tag_def_curated):
+    id_older_persistent = "5b1d36a8-6a2c-4b0e-8d6a-52f0f9b5f3a1"
+    id_newer_persistent = "0c9b9d2e-3f4b-4c55-9a0e-7c1d2e3f4a5b"
+    id_other_persistent = "e2f1a0b9-8c7d-4e6f-a5b4-c3d2e1f0a9b8"
+    for id_persistent, display_txt in [
+        (id_older_persistent, "Jane Doe"),
+        (id_newer_persistent, "Jane Doe"),
+        (id_other_persistent, "Max Mustermann"),
+    ]:
+        Entity.objects.create(  # pylint: disable=no-member
+            id_persistent=id_persistent,
+            display_txt=display_txt,
+            time_edit=c.time_entity_origin,
+        )
+    for idx, id_entity_persistent in enumerate(
+        [id_older_persistent, id_other_persistent]
+    ):
+        TagInstanceHistory.objects.create(  # pylint: disable=no-member
+            id_entity_persistent=id_entity_persistent,
+            id_tag_definition_persistent=tag_def_curated.id_persistent,
+            value="1234",
+            id_persistent=f"c7a5b3d1-0000-4000-8000-00000000000{idx}",
+            time_edit=c.time_instance_origin,
+        )
+    detect_entity_duplicates()
+    candidates = [
+        (
+            candidate.id_origin_persistent,
+            candidate.id_destination_persistent,
+            candidate.score,
+        )
+        for candidate in EntityDuplicateCandidate.ranked_query_set()
+    ]
+    assert candidates == [
+        (id_newer_persistent, id_older_persistent, pytest.approx(0.6)),
+        (id_other_persistent, id_older_persistent, pytest.approx(0.4)),
+    ]
+    newer = Entity.most_recent_by_id(id_newer_persistent)
+    changed, _ = Entity.change_or_create(
+        id_persistent=id_newer_persistent,
+        version=newer.id,
+        display_txt="Jane Doe changed",
+        time_edit=c.time_entity_origin_changed,
+    )
+    changed.save()
+    assert [
+        candidate.id_origin_persistent
+        for candidate in EntityDuplicateCandidate.ranked_query_set()
+    ] == [id_other_persistent]
+
+
+def test_detect_entity_duplicates_normalized_value(db, tag_def_curated):
+    id_older_persistent = "5b1d36a8-6a2c-4b0e-8d6a-52f0f9b5f3a1"
+    id_newer_persistent = "0c9b9d2e-3f4b-4c55-9a0e-7c1d2e3f4a5b"
+    for idx, (id_persistent, display_txt, value) in enumerate(
+        [
+            (id_older_persistent, "Jane Doe", "Value ABC"),
+            (id_newer_persistent, "Max Mustermann", " value abc "),
+        ]
+    ):
+        Entity.objects.create(  # pylint: disable=no-member
+            id_persistent=id_persistent,
+            display_txt=display_txt,
+            time_edit=c.time_entity_origin,
+        )
+        TagInstanceHistory.objects.create(  # pylint: disable=no-member
+            id_entity_persistent=id_persistent,
+            id_tag_definition_persistent=tag_def_curated.id_persistent,
+            value=value,
+            id_persistent=f"c7a5b3d1-0000-4000-8000-00000000000{idx}",
+            time_edit=c.time_instance_origin,
+        )
+    detect_entity_duplicates()
+    candidates = [
+        (
+            candidate.id_origin_persistent,
+            candidate.id_destination_persistent,
+            candidate.equal_instance_count,
+            candidate.total_instance_count,
+        )
+        for candidate in EntityDuplicateCandidate.ranked_query_set()
+    ]
+    assert candidates == [(id_newer_persistent, id_older_persistent, 1, 1)]
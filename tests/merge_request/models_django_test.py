@@ -1,8 +1,18 @@
 # pylint: disable=missing-module-docstring, missing-function-docstring,redefined-outer-name,invalid-name,unused-argument
 from datetime import datetime
 
+import pytest
+
+import tests.entity.common as ce
+from tests.merge_request import common as c
+from vran.contribution.models_django import ContributionCandidate
 from vran.entity.models_django import Entity
-from vran.merge_request.models_django import TagConflictResolution, TagMergeRequest
+from vran.merge_request.models_django import (
+    TagConflictResolution,
+    TagMergeRequest,
+    TagMergeRequestConflict,
+)
+from vran.tag.models_django import TagInstanceHistory
 
 
 def test_created_by_user(user, merge_request_user, merge_request_user1):
@@ -137,3 +147,116 @@ def test_non_recent_change_all(
 ):
     recent = TagConflictResolution.non_recent()
     assert len(recent) == 1
+
+
+def test_tag_definitions_for_entities_request(
+    user1, contribution_for_mr, origin_tag_def_for_mr, destination_tag_def_for_mr
+):
+    id_origin = origin_tag_def_for_mr.id_persistent
+    id_destination = destination_tag_def_for_mr.id_persistent
+    id_contribution = str(contribution_for_mr.id_persistent)
+    mapping = TagMergeRequest.get_tag_definitions_for_entities_request(
+        [id_destination], id_contribution, None, user1
+    )
+    assert mapping == {id_destination: {(id_destination, True)}}
+    TagMergeRequest.objects.create(  # pylint: disable=no-member
+        id_origin_persistent=id_origin,
+        id_destination_persistent=id_destination,
+        created_by=origin_tag_def_for_mr.owner,
+        assigned_to=destination_tag_def_for_mr.owner,
+        created_at=datetime(2023, 1, 1),
+        id_persistent="d3a4f5b6-89b3-4b07-86be-7f6d2f7a0b7c",
+        contribution_candidate=contribution_for_mr,
+    )
+    mapping = TagMergeRequest.get_tag_definitions_for_entities_request(
+        [id_destination, id_origin, "id_other"], id_contribution, None, user1
+    )
+    pair = {(id_destination, True), (id_origin, False)}
+    assert mapping == {
+        id_destination: pair,
+        id_origin: pair,
+        "id_other": {("id_other", True)},
+    }
+
+
+def test_conflict_table_populated(
+    merge_request_user,
+    instances_merge_request_origin_user,
+    instance_merge_request_destination_user_conflict,
+):
+    conflicts = TagMergeRequestConflict.objects.filter(  # pylint: disable=no-member
+        merge_request=merge_request_user
+    ).order_by("tag_instance_origin_id")
+    assert [
+        (
+            conflict.id_entity_persistent,
+            conflict.tag_instance_origin_id,
+            conflict.tag_instance_destination_id,
+        )
+        for conflict in conflicts
+    ] == [
+        (ce.id_persistent_test_0, instances_merge_request_origin_user[0].id, None),
+        (
+            ce.id_persistent_test_1,
+            instances_merge_request_origin_user[1].id,
+            instance_merge_request_destination_user_conflict.id,
+        ),
+    ]
+
+
+def test_conflict_table_updated_for_new_version(
+    user,
+    merge_request_user,
+    instances_merge_request_origin_user,
+    instance_merge_request_destination_user_conflict,
+):
+    TagInstanceHistory.change_or_create(
+        id_persistent=instance_merge_request_destination_user_conflict.id_persistent,
+        id_entity_persistent=ce.id_persistent_test_1,
+        id_tag_definition_persistent=merge_request_user.id_destination_persistent,
+        version=instance_merge_request_destination_user_conflict.id,
+        user=user,
+        value=c.value_origin1,
+        time_edit=datetime(1990, 1, 1),
+    )[0].save()
+    conflict = TagMergeRequestConflict.objects.get(  # pylint: disable=no-member
+        merge_request=merge_request_user
+    )
+    assert conflict.id_entity_persistent == ce.id_persistent_test_0
+
+
+def test_conflict_table_merged(
+    merge_request_user,
+    instances_merge_request_origin_user,
+    instance_merge_request_destination_user_conflict,
+):
+    merge_request_user.state = TagMergeRequest.MERGED
+    merge_request_user.save()
+    assert not TagMergeRequestConflict.objects.filter(  # pylint: disable=no-member
+        merge_request=merge_request_user
+    ).exists()
+    merge_request_user.state = TagMergeRequest.OPEN
+    merge_request_user.save()
+    assert (
+        TagMergeRequestConflict.objects.filter(  # pylint: disable=no-member
+            merge_request=merge_request_user
+        ).count()
+        == 2
+    )
+
+
+def test_tag_definitions_for_entities_request_checks_access_when_cached(
+    user1, contribution_for_mr, destination_tag_def_for_mr
+):
+    id_destination = destination_tag_def_for_mr.id_persistent
+    id_contribution = str(contribution_for_mr.id_persistent)
+    TagMergeRequest.get_tag_definitions_for_entities_request(
+        [id_destination], id_contribution, None, user1
+    )
+    ContributionCandidate.objects.filter(  # pylint: disable=no-member
+        id_persistent=id_contribution
+    ).delete()
+    with pytest.raises(ContributionCandidate.DoesNotExist):
+        TagMergeRequest.get_tag_definitions_for_entities_request(
+            [id_destination], id_contribution, None, user1
+        )
@@ -225,3 +225,109 @@ def test_instance_changed(
         merge_request_user.id_persistent, merge_request_user.assigned_to
     )
     assert merge_request.state == TagMergeRequest.OPEN
+
+
+def test_fast_forward_copies_instances(
+    merge_request_user_fast_forward, instances_merge_request_origin_user
+):
+    q.merge_request_fast_forward(merge_request_user_fast_forward.id_persistent)
+    origin = TagInstance.objects.filter(  # pylint: disable=no-member
+        id_tag_definition_persistent=merge_request_user_fast_forward.id_origin_persistent
+    )
+    destination = TagInstance.objects.filter(  # pylint: disable=no-member
+        id_tag_definition_persistent=merge_request_user_fast_forward.id_destination_persistent
+    )
+    assert len(origin) > 0
+    assert sorted(destination.values_list("id_entity_persistent", "value")) == sorted(
+        origin.values_list("id_entity_persistent", "value")
+    )
+    assert len({instance.time_edit for instance in destination}) == 1
+    assert not set(destination.values_list("id_persistent", flat=True)) & set(
+        origin.values_list("id_persistent", flat=True)
+    )
+
+
+def test_merge_contribution_fast_forward(
+    merge_request_user_fast_forward_disable_origin, instances_merge_request_origin_user
+):
+    merge_request = merge_request_user_fast_forward_disable_origin
+    q.merge_contribution(merge_request.contribution_candidate_id)
+    merge_request_after = TagMergeRequest.by_id_persistent(
+        merge_request.id_persistent, merge_request.created_by
+    )
+    assert merge_request_after.state == TagMergeRequest.MERGED
+    assert TagDefinition.most_recent_by_id(merge_request.id_origin_persistent).disabled
+    destination = TagInstance.objects.filter(  # pylint: disable=no-member
+        id_tag_definition_persistent=merge_request.id_destination_persistent
+    )
+    assert sorted(destination.values_list("id_entity_persistent", "value")) == sorted(
+        (instance.id_entity_persistent, instance.value)
+        for instance in instances_merge_request_origin_user
+    )
+
+
+def test_merge_contribution_conflict(
+    merge_request_user_fast_forward,
+    instances_merge_request_origin_user,
+    instance_merge_request_destination_user_conflict_fast_forward,
+):
+    q.merge_contribution(merge_request_user_fast_forward.contribution_candidate_id)
+    merge_request_after = TagMergeRequest.by_id_persistent(
+        merge_request_user_fast_forward.id_persistent,
+        merge_request_user_fast_forward.created_by,
+    )
+    assert merge_request_after.state == TagMergeRequest.CONFLICTS
+
+
+def test_merge_contribution_same_destination(
+    merge_request_user_fast_forward, instances_merge_request_origin_user
+):
+    other = TagMergeRequest.objects.create(  # pylint: disable=no-member
+        id_origin_persistent=merge_request_user_fast_forward.id_origin_persistent,
+        id_destination_persistent=merge_request_user_fast_forward.id_destination_persistent,
+        created_by=merge_request_user_fast_forward.created_by,
+        assigned_to=merge_request_user_fast_forward.assigned_to,
+        created_at=merge_request_user_fast_forward.created_at,
+        id_persistent="7a5e2b9e-1e39-4b53-a0a0-53c64c3f4b8e",
+        contribution_candidate=merge_request_user_fast_forward.contribution_candidate,
+    )
+    q.merge_contribution(merge_request_user_fast_forward.contribution_candidate_id)
+    states = sorted(
+        TagMergeRequest.objects.filter(  # pylint: disable=no-member
+            id_persistent__in=[
+                merge_request_user_fast_forward.id_persistent,
+                other.id_persistent,
+            ]
+        ).values_list("state", flat=True)
+    )
+    assert states == sorted([TagMergeRequest.MERGED, TagMergeRequest.CONFLICTS])
+
+
+def test_merge_contribution_missing_tag_definition(
+    merge_request_user_fast_forward, instances_merge_request_origin_user
+):
+    other = TagMergeRequest.objects.create(  # pylint: disable=no-member
+        id_origin_persistent=merge_request_user_fast_forward.id_origin_persistent,
+        id_destination_persistent="id_tag_definition_missing",
+        created_by=merge_request_user_fast_forward.created_by,
+        assigned_to=merge_request_user_fast_forward.assigned_to,
+        created_at=merge_request_user_fast_forward.created_at,
+        id_persistent="7a5e2b9e-1e39-4b53-a0a0-53c64c3f4b8e",
+        contribution_candidate=merge_request_user_fast_forward.contribution_candidate,
+    )
+    q.merge_contribution(merge_request_user_fast_forward.contribution_candidate_id)
+    states = {
+        str(id_persistent): state
+        for id_persistent, state in TagMergeRequest.objects.filter(  # pylint: disable=no-member
+            id_persistent__in=[
+                merge_request_user_fast_forward.id_persistent,
+                other.id_persistent,
+            ]
+        ).values_list(
+            "id_persistent", "state"
+        )
+    }
+    assert states == {
+        str(merge_request_user_fast_forward.id_persistent): TagMergeRequest.MERGED,
+        str(other.id_persistent): TagMergeRequest.ERROR,
+    }
@@ -0,0 +1,93 @@
+# pylint: disable=missing-module-docstring, missing-function-docstring,redefined-outer-name,invalid-name,unused-argument
+from datetime import datetime
+from os import environ
+from time import perf_counter
+
+import pytest
+
+from vran.entity.models_django import Entity
+from vran.merge_request.models_django import TagConflictResolution
+from vran.tag.models_django import TagInstanceHistory
+
+pytestmark = pytest.mark.skipif(
+    environ.get("VRAN_BENCHMARK") is None,
+    reason="Benchmarks only run when VRAN_BENCHMARK is set.",
+)
+
+time_edit = datetime(2000, 1, 1)
+
+
+def add_resolutions(merge_request, tag_def_origin, tag_def_destination, start, stop):
+    # pylint: disable=no-member
+    entities = Entity.objects.bulk_create(
+        Entity(
+            id_persistent=f"benchmark-entity-{idx}",
+            display_txt=f"entity {idx}",
+            time_edit=time_edit,
+        )
+        for idx in range(start, stop)
+    )
+    origins = TagInstanceHistory.objects.bulk_create(
+        TagInstanceHistory(
+            id_persistent=f"benchmark-origin-{idx}",
+            id_entity_persistent=entity.id_persistent,
+            id_tag_definition_persistent=tag_def_origin.id_persistent,
+            value="origin",
+            time_edit=time_edit,
+        )
+        for idx, entity in zip(range(start, stop), entities)
+    )
+    destinations = TagInstanceHistory.objects.bulk_create(
+        TagInstanceHistory(
+            id_persistent=f"benchmark-destination-{idx}",
+            id_entity_persistent=entity.id_persistent,
+            id_tag_definition_persistent=tag_def_destination.id_persistent,
+            value="destination",
+            time_edit=time_edit,
+        )
+        for idx, entity in zip(range(start, stop), entities)
+    )
+    TagConflictResolution.objects.bulk_create(
+        TagConflictResolution(
+            entity=entity,
+            tag_definition_origin=tag_def_origin,
+            tag_definition_destination=tag_def_destination,
+            tag_instance_origin=origin,
+            tag_instance_destination=destination,
+            merge_request=merge_request,
+            replace=True,
+        )
+        for entity, origin, destination in zip(entities, origins, destinations)
+    )
+
+
+def time_staleness(merge_request):
+    resolutions = TagConflictResolution.for_merge_request_query_set(merge_request)
+    start = perf_counter()
+    assert not TagConflictResolution.non_recent(resolutions).exists()
+    recent_count = TagConflictResolution.only_recent(resolutions).count()
+    return perf_counter() - start, recent_count
+
+
+def test_staleness_scales_linearly(
+    merge_request_user, origin_tag_def_for_mr, destination_tag_def_for_mr
+):
+    add_resolutions(
+        merge_request_user, origin_tag_def_for_mr, destination_tag_def_for_mr, 0, 5000
+    )
+    time_small, count_small = time_staleness(merge_request_user)
+    add_resolutions(
+        merge_request_user,
+        origin_tag_def_for_mr,
+        destination_tag_def_for_mr,
+        5000,
+        50000,
+    )
+    time_large, count_large = time_staleness(merge_request_user)
+    assert count_small == 5000
+    assert count_large == 50000
+    # allow for constant overhead and noise on top of linear scaling
+    assert time_large < 20 * time_small + 1, (
+        f"staleness of {count_small} resolutions: {time_small:.3f}s, "
+        f"of {count_large} resolutions: {time_large:.3f}s"
+    )
@@ -109,7 +109,7 @@ def test_bad_db(auth_server_commissioner, display_txt_only):
     live_server, cookies = auth_server_commissioner
     mock = MagicMock()
     mock.side_effect = IntegrityError()
-    with patch("vran.entity.models_django.Entity.save", mock):
+    with patch("vran.person.api.bulk_create_changed", mock):
         req = post_person(live_server.url, display_txt_only, cookies=cookies)
     assert req.status_code == 500
     assert req.json()["msg"] == "Provided data not consistent with database."
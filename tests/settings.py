@@ -149,6 +149,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 AUTH_USER_MODEL = "vran.VranUser"
 
 CONTRIBUTION_DIRECTORY = "/tmp"
+CONTRIBUTION_MAX_UPLOAD_SIZE = 256 * 1024 * 1024
 
 RQ_QUEUES = {
     "default": {
@@ -18,6 +18,7 @@ def test_empty_chunk(auth_server, tag_def):
     assert rsp.status_code == 200
     json = rsp.json()
     assert len(json["tag_instances"]) == 0
+    assert json["next_offset"] is None
 
 
 def test_missing_tag_def(auth_server):
@@ -59,6 +60,32 @@ def test_can_slice(auth_server, tag_def_user, entity0):
     assert len(instances) == 4
     for i in range(4):
         assert instances[i]["value"] == str(float(i) + 3.3)
+    assert rsp.json()["next_offset"] == instances[-1]["version"] + 1
+
+
+def test_iterate_chunks(auth_server, tag_def_user, entity0):
+    live_server, cookies = auth_server
+    entity0.save()
+    instances = [
+        {
+            "value": str(float(i) + 0.3),
+            "id_entity_persistent": entity0.id_persistent,
+            "id_tag_definition_persistent": tag_def_user.id_persistent,
+        }
+        for i in range(10)
+    ]
+    post_tag_instances(live_server.url, instances, cookies=cookies)
+    values = []
+    offset = 0
+    while offset is not None:
+        rsp = post_tag_instance_chunks(
+            live_server.url, tag_def_user.id_persistent, offset, 4, cookies=cookies
+        )
+        assert rsp.status_code == 200
+        json = rsp.json()
+        values.extend(instance["value"] for instance in json["tag_instances"])
+        offset = json["next_offset"]
+    assert values == [str(float(i) + 0.3) for i in range(10)]
 
 
 def test_non_existent_slice(auth_server, tag_def, entity0):
@@ -144,7 +144,7 @@ def test_bad_db(auth_server, float_tag):
     live_server, cookies = auth_server
     mock = MagicMock()
     mock.side_effect = IntegrityError()
-    with patch("vran.tag.models_django.TagInstanceHistory.save", mock):
+    with patch("vran.tag.api.instances.bulk_create_changed", mock):
         req = r.post_tag_instance(live_server.url, float_tag, cookies=cookies)
     assert req.status_code == 500
     assert req.json()["msg"] == "Provided data not consistent with database."
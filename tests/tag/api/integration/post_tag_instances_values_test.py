@@ -168,7 +168,7 @@ def test_bad_db(auth_server):
     mock = MagicMock()
     mock.side_effect = Exception()
     with patch(
-        "vran.tag.models_django.TagInstance.most_recent_by_entity_and_definition_id_query_set",
+        "vran.tag.models_django.TagInstance.most_recent_by_entity_and_definition_id_pairs",
         mock,
     ):
         req = post_tag_instance_values(
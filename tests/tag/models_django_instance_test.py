@@ -2,11 +2,13 @@
 from datetime import timedelta
 
 import pytest
+from django.db import connection
 
 import tests.person.common as cp
 import tests.tag.common as c
 from vran.exception import (
     EntityMissingException,
+    InvalidTagValueException,
     TagDefinitionDisabledException,
     TagDefinitionMissingException,
     TagDefinitionPermissionException,
@@ -229,3 +231,118 @@ def test_not_existing_tag():
     with pytest.raises(TagDefinitionMissingException) as exc_info:
         TagInstance.by_tag_chunked(c.id_tag_def_persistent_test, 0, 5)
     assert exc_info.value.args[0] == c.id_tag_def_persistent_test
+
+
+@pytest.mark.django_db
+def test_most_recent_follows_history(tag):
+    tag.save()
+    updated = TagInstanceHistory(
+        id_persistent=c.id_tag_persistent_test,
+        id_entity_persistent=cp.id_persistent_test,
+        id_tag_definition_persistent=c.id_tag_def_persistent_test,
+        time_edit=c.time_edit_test + timedelta(hours=1),
+        value="3.0",
+        previous_version=tag,
+    )
+    updated.save()
+    most_recent = TagInstance.objects.get(  # pylint: disable=no-member
+        id_persistent=c.id_tag_persistent_test
+    )
+    assert most_recent.id == updated.id  # pylint: disable=no-member
+    assert most_recent.value == "3.0"
+    assert most_recent.previous_version_id == tag.id  # pylint: disable=no-member
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "delete from vran_taginstancehistory where id = %s",
+            [updated.id],  # pylint: disable=no-member
+        )
+    most_recent = TagInstance.objects.get(  # pylint: disable=no-member
+        id_persistent=c.id_tag_persistent_test
+    )
+    assert most_recent.id == tag.id  # pylint: disable=no-member
+    assert most_recent.value == "2.0"
+
+
+@pytest.mark.django_db
+def test_by_id_pairs(tag):
+    tag.save()
+    other = TagInstanceHistory(
+        id_persistent="id_tag_test_other",
+        id_entity_persistent="id_entity_test_1",
+        id_tag_definition_persistent=c.id_tag_def_persistent_test,
+        time_edit=c.time_edit_test,
+        value="1.0",
+    )
+    other.save()
+    pair = (cp.id_persistent_test, c.id_tag_def_persistent_test)
+    pair_other = ("id_entity_test_1", c.id_tag_def_persistent_test)
+    pair_missing = ("id_entity_test_2", c.id_tag_def_persistent_test)
+    ret = TagInstance.most_recent_by_entity_and_definition_id_pairs(
+        [pair_missing, pair, pair_other, pair]
+    )
+    assert list(ret) == [pair_missing, pair, pair_other]
+    assert ret[pair_missing] == []
+    assert [instance.value for instance in ret[pair]] == ["2.0"]
+    assert [instance.value for instance in ret[pair_other]] == ["1.0"]
+
+
+@pytest.mark.django_db
+def test_change_or_create_bulk(entity0, tag_def_user, user1):
+    entity0.save()
+    ret = TagInstanceHistory.change_or_create_bulk(
+        [
+            (
+                c.id_tag_persistent_test,
+                None,
+                entity0.id_persistent,
+                tag_def_user.id_persistent,
+                "2.0",
+            ),
+            (
+                "id_tag_test_missing_entity",
+                None,
+                "id_entity_test_missing",
+                tag_def_user.id_persistent,
+                "2.0",
+            ),
+            (
+                "id_tag_test_missing_tag_def",
+                None,
+                entity0.id_persistent,
+                c.id_tag_def_persistent_test,
+                "2.0",
+            ),
+            (
+                "id_tag_test_invalid",
+                None,
+                entity0.id_persistent,
+                tag_def_user.id_persistent,
+                "not a float",
+            ),
+        ],
+        tag_def_user.owner,
+        c.time_edit_test,
+    )
+    created, do_write = ret[0]
+    assert do_write
+    assert created.value == "2.0"
+    assert created.id_entity_persistent == entity0.id_persistent
+    assert created.time_edit == c.time_edit_test
+    assert created.previous_version is None
+    assert isinstance(ret[1], EntityMissingException)
+    assert isinstance(ret[2], TagDefinitionMissingException)
+    assert isinstance(ret[3], InvalidTagValueException)
+    ret = TagInstanceHistory.change_or_create_bulk(
+        [
+            (
+                c.id_tag_persistent_test,
+                None,
+                entity0.id_persistent,
+                tag_def_user.id_persistent,
+                "2.0",
+            )
+        ],
+        user1,
+        c.time_edit_test,
+    )
+    assert isinstance(ret[0], TagDefinitionPermissionException)
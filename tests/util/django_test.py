@@ -5,6 +5,7 @@ import pytest
 from django.db import IntegrityError
 
 from vran.entity.models_django import Entity
+from vran.exception import DbObjectExistsException, EntityUpdatedException
 from vran.util import django as du
 
 
@@ -49,3 +50,60 @@ def test_does_rollback():
     with pytest.raises(IntegrityError):
         du.save_many_atomic(entities_test)
     assert len(Entity.objects.all()) == 0  # pylint: disable=no-member
+
+
+@pytest.mark.django_db
+def test_bulk_versioned_create_and_change():
+    entity_test_0 = Entity(
+        id_persistent="test_id_0", display_txt="foo", time_edit=datetime(2022, 11, 14)
+    )
+    entity_test_0.save()
+    time_edit = datetime(2022, 11, 15)
+    results = du.change_or_create_versioned_bulk(
+        Entity,
+        [
+            (
+                "test_id_0",
+                entity_test_0.id,  # pylint: disable=no-member
+                {"display_txt": "bar", "time_edit": time_edit},
+            ),
+            ("test_id_1", None, {"display_txt": "baz", "time_edit": time_edit}),
+        ],
+    )
+    changed, do_write = results[0]
+    assert do_write
+    assert changed.previous_version_id == entity_test_0.id  # pylint: disable=no-member
+    assert changed.display_txt == "bar"
+    created, do_write = results[1]
+    assert do_write
+    assert created.previous_version_id is None
+    for entity, _ in results:
+        entity.proxy_name = "entity"
+    du.bulk_create_changed(Entity, results)
+    assert {entity.display_txt for entity in Entity.most_recent()} == {"bar", "baz"}
+
+
+@pytest.mark.django_db
+def test_bulk_versioned_errors_per_item():
+    entity_test_0 = Entity(
+        id_persistent="test_id_0", display_txt="foo", time_edit=datetime(2022, 11, 14)
+    )
+    entity_test_0.save()
+    time_edit = datetime(2022, 11, 15)
+    results = du.change_or_create_versioned_bulk(
+        Entity,
+        [
+            ("test_id_0", -1, {"display_txt": "bar", "time_edit": time_edit}),
+            ("test_id_0", None, {"display_txt": "bar", "time_edit": time_edit}),
+            (
+                "test_id_0",
+                entity_test_0.id,  # pylint: disable=no-member
+                {"display_txt": "foo", "time_edit": time_edit},
+            ),
+        ],
+    )
+    assert isinstance(results[0], EntityUpdatedException)
+    assert results[0].new_value == entity_test_0
+    assert isinstance(results[1], DbObjectExistsException)
+    assert results[2] == (entity_test_0, False)
+    assert du.bulk_create_changed(Entity, results) == []
@@ -1,5 +1,6 @@
 "API methods for handling contributions."
 import os
+from hashlib import sha256
 from uuid import uuid4
 
 from django.conf import settings
@@ -15,7 +16,10 @@ from vran.contribution.models_api import (
     ContributionPostRequest,
     ContributionPostResponse,
 )
-from vran.contribution.models_conversion import contribution_db_to_api
+from vran.contribution.models_conversion import (
+    contribution_db_to_api,
+    match_engine_mapping_api_to_db,
+)
 from vran.contribution.models_django import (
     ContributionCandidate as ContributionCandidateDb,
 )
@@ -44,10 +48,42 @@ ALLOWED_CONTENT_TYPES = [
     "text/tab-separated-values",
 ]
 
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class UploadTooLargeException(Exception):
+    "Exception indicating that an uploaded file exceeds the configured size limit."
+
+
+def write_upload(file: UploadedFile, out_file_path: str, max_size: int):
+    """Stream an uploaded file to disk in chunks.
+    Returns the sha256 hex digest of the content."""
+    file_hash = sha256()
+    size = 0
+    with open(out_file_path, "wb") as out_f:
+        for chunk in file.chunks(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_size:
+                raise UploadTooLargeException()
+            file_hash.update(chunk)
+            out_f.write(chunk)
+    return file_hash.hexdigest()
+
+
+def remove_upload(out_file_path: str):
+    "Remove a partially or redundantly written upload."
+    if os.path.exists(out_file_path):
+        os.remove(out_file_path)
+
 
 @router.post(
     "",
-    response={200: ContributionPostResponse, 400: ApiError, 500: ApiError},
+    response={
+        200: ContributionPostResponse,
+        400: ApiError,
+        413: ApiError,
+        500: ApiError,
+    },
 )
 def contribution_post(
     request,
@@ -55,6 +91,7 @@ def contribution_post(
     file: UploadedFile = File(...),
 ):
     "Create a new contribution"
+    # pylint: disable=too-many-return-statements
     try:
         content_type = file.content_type
         if content_type in ALLOWED_CONTENT_TYPES:
@@ -63,20 +100,34 @@ def contribution_post(
             return 400, ApiError(
                 msg=f"Invalid content type. Only {', '.join(ALLOWED_CONTENT_TYPES)} allowed."
             )
+        max_size = settings.CONTRIBUTION_MAX_UPLOAD_SIZE
+        if file.size is not None and file.size > max_size:
+            return 413, ApiError(msg="The uploaded file is too large.")
         contribution_db = mk_initial_contribution_candidate(contribution, request.user)
         out_file_name = contribution_db.id_persistent + extension
         out_file_path = os.path.join(settings.CONTRIBUTION_DIRECTORY, out_file_name)
         contribution_db.file_name = out_file_name
         try:
-            with open(out_file_path, "wb") as out_f:
-                out_f.write(file.read())
+            file_hash = write_upload(file, out_file_path, max_size)
+        except UploadTooLargeException:
+            remove_upload(out_file_path)
+            return 413, ApiError(msg="The uploaded file is too large.")
         except IOError:
+            remove_upload(out_file_path)
             return 500, ApiError(msg="Could not save the uploaded file.")
+        contribution_db.file_hash = file_hash
         try:
+            existing = ContributionCandidateDb.by_file_hash(
+                file_hash, contribution.has_header, request.user
+            ).first()
+            if existing is not None:
+                remove_upload(out_file_path)
+                return 200, ContributionPostResponse(
+                    id_persistent=str(existing.id_persistent), duplicate=True
+                )
             contribution_db.save()
         except DatabaseError:
-            if os.path.exists(out_file_path):
-                os.remove(out_file_path)
+            remove_upload(out_file_path)
             return 500, ApiError(
                 msg="Could not store the contribution in the database."
             )
@@ -147,8 +198,12 @@ def contribution_patch(
     "Update metadata of a contribution"
     try:
         user = check_user(request)
+        patch_dict = patch_data.dict(exclude_unset=True)
+        match_engine = patch_dict.pop("match_engine", None)
+        if match_engine is not None:
+            patch_dict["match_engine"] = match_engine_mapping_api_to_db[match_engine]
         contribution_db = ContributionCandidateDb.update(
-            id_persistent, user, **patch_data.dict(exclude_unset=True)
+            id_persistent, user, **patch_dict
         )
         return 200, contribution_db_to_api(contribution_db)
 
@@ -2,13 +2,19 @@
 import logging
 from typing import Dict, List, Optional
 
+import django_rq
 from django.db import transaction
 from django.db.models import Q
 from django.http import HttpRequest
 from ninja import Router, Schema
 
-from vran.contribution.entity.match_entities import find_matches
-from vran.contribution.entity.models_django import EntityDuplicate
+from vran.contribution.entity.match_entities import (
+    compute_matches,
+    current_entity_matches,
+    stale_matches,
+)
+from vran.contribution.entity.models_django import EntityDuplicate, EntityMatch
+from vran.contribution.entity.queue import AUTO_ASSIGN_STATES, auto_assign_duplicates
 from vran.contribution.models_django import ContributionCandidate
 from vran.entity.models_django import Entity
 from vran.exception import ApiError, NotAuthenticatedException
@@ -62,6 +68,18 @@ class PutDuplicateResponse(Schema):
     assigned_duplicate: Optional[PersonNatural]
 
 
+class AutoAssignDuplicatesRequest(Schema):
+    "API model for automatically assigning duplicates with a high score."
+    # pylint: disable=too-few-public-methods
+    threshold: float = 0.9
+
+
+class AutoAssignDuplicatesResponse(Schema):
+    "API model for the job automatically assigning duplicates."
+    # pylint: disable=too-few-public-methods
+    id_job: str
+
+
 empty_match = ScoredMatchesWithDuplicateAssignment(assigned_duplicate=None, matches=[])
 
 
@@ -125,15 +143,37 @@ def post_similar(request: HttpRequest, similar_request: PostSimilarRequest):
             return 404, ApiError(
                 msg="Some entities are not part of the contribution candidate."
             )
-        matches = find_matches(
+        # Matches are precomputed in the background.
+        # Only recompute them for entities that changed since.
+        # The TF-IDF index is only built on the queue, so the database engine is used.
+        id_stale_list = stale_matches(
             candidate.id_persistent, similar_request.id_entity_persistent_list
         )
+        if id_stale_list:
+            compute_matches(
+                candidate.id_persistent,
+                id_stale_list,
+                match_engine=ContributionCandidate.MATCH_ENGINE_POSTGRES,
+            )
+        matches = current_entity_matches(
+            EntityMatch.objects.filter(  # pylint: disable=no-member
+                contribution_candidate=candidate,
+                id_entity_persistent__in=similar_request.id_entity_persistent_list,
+            )
+        )
+        assigned_duplicates = get_assigned_duplicates(
+            similar_request.id_entity_persistent_list
+        )
         scored_matches = {
-            entity.id_persistent: ScoredMatchesWithDuplicateAssignment(
-                assigned_duplicate=person_db_dict_to_api(entity.assigned_duplicate),
-                matches=[scored_match_db_to_api(match) for match in entity.matches],
+            entity_match.id_entity_persistent: ScoredMatchesWithDuplicateAssignment(
+                assigned_duplicate=assigned_duplicates.get(
+                    entity_match.id_entity_persistent
+                ),
+                matches=[
+                    scored_match_db_to_api(match) for match in entity_match.matches
+                ],
             )
-            for entity in matches
+            for entity_match in matches
         }
         for id_persistent in similar_request.id_entity_persistent_list:
             if id_persistent not in scored_matches:
@@ -203,6 +243,70 @@ def put_duplicate_assignment(
         )
 
 
+def get_assigned_duplicates(id_entity_persistent_list):
+    "Get the API representation of assigned duplicates by id of the origin entity."
+    duplicates = dict(
+        EntityDuplicate.objects.filter(  # pylint: disable=no-member
+            id_origin_persistent__in=id_entity_persistent_list
+        ).values_list("id_origin_persistent", "id_destination_persistent")
+    )
+    destinations = {
+        entity.id_persistent: entity
+        for entity in Entity.most_recent_queryset(include_disabled=True).filter(
+            id_persistent__in=duplicates.values()
+        )
+    }
+    return {
+        id_origin_persistent: person_db_to_api(destinations[id_destination_persistent])
+        for id_origin_persistent, id_destination_persistent in duplicates.items()
+        if id_destination_persistent in destinations
+    }
+
+
+@router.post(
+    "duplicates/auto_assign",
+    response={
+        200: AutoAssignDuplicatesResponse,
+        400: ApiError,
+        401: ApiError,
+        404: ApiError,
+        500: ApiError,
+    },
+)
+def post_auto_assign_duplicates(
+    request: HttpRequest, body: AutoAssignDuplicatesRequest
+):
+    """API method for starting a job, that assigns the best match as duplicate
+    for all entities of a contribution where the match score exceeds a threshold."""
+    try:
+        user = check_user(request)
+    except NotAuthenticatedException:
+        return 401, ApiError(msg="Not authenticated.")
+
+    id_contribution_persistent = request.resolver_match.captured_kwargs[
+        "id_contribution_persistent"
+    ]
+    try:
+        candidate = ContributionCandidate.by_id_persistent(
+            id_contribution_persistent, user
+        ).get()
+        if candidate.state not in AUTO_ASSIGN_STATES:
+            return 400, ApiError(
+                msg="Duplicates can not be assigned in the current state of the contribution."
+            )
+        job = django_rq.enqueue(
+            auto_assign_duplicates, str(candidate.id_persistent), body.threshold
+        )
+        return 200, AutoAssignDuplicatesResponse(id_job=job.id)
+    except ContributionCandidate.DoesNotExist:  # pylint: disable=no-member
+        return 404, ApiError(msg="Contribution candidate does not exist.")
+    except Exception as exc:  # pylint: disable=broad-except
+        logging.warning("", exc_info=exc)
+        return 500, ApiError(
+            msg="Could not assign entity duplicates for the contribution."
+        )
+
+
 def scored_match_db_to_api(match):
     "Converts an entity annotated with a similarity score to a scored match"
     id_match_tag_definition_persistent_list = match["equal_tag_definition_list"]
@@ -1,118 +1,346 @@
 "Queue method for finding duplicates in entity names for contribution candidate."
+from django.db import connection
+from django.db.models import Count, Max, OuterRef, Subquery
 
+from vran.contribution.entity.models_django import EntityMatch
+from vran.contribution.entity.tfidf import (
+    TfidfIndex,
+    TfidfMatcher,
+    levenshtein_similarity,
+)
+from vran.contribution.models_django import ContributionCandidate
 from vran.entity.models_django import Entity
+from vran.tag.models_django import TagDefinition, TagInstance
 
+# Number of nearest existing entities by display text that are scored per entity.
+MATCH_CANDIDATE_COUNT = 25
+DISPLAY_TXT_SIMILARITY_WEIGHT = 0.6
+MATCH_COUNT_WEIGHT = 0.4
 
-def find_matches(id_contribution_persistent, id_entity_persistent_list):
-    """Find matches for the entities selected in the argument query set."""
+
+def find_matches(
+    id_contribution_persistent,
+    id_entity_persistent_list,
+    tfidf_matcher=None,
+    match_engine=None,
+):
+    """Find matches for the entities selected in the argument query set.
+    The display texts are compared by the match engine of the contribution,
+    unless a match engine is given.
+    A TF-IDF matcher can be passed for reusing its worker processes."""
+    if match_engine is None:
+        match_engine = (
+            ContributionCandidate.objects.filter(  # pylint: disable=no-member
+                id_persistent=id_contribution_persistent
+            )
+            .values_list("match_engine", flat=True)
+            .first()
+        )
+    if match_engine == ContributionCandidate.MATCH_ENGINE_TFIDF:
+        return find_matches_tfidf(
+            id_contribution_persistent, id_entity_persistent_list, tfidf_matcher
+        )
     return Entity.objects.raw(  # pylint: disable=no-member
         MATCHES_QUERY_STRING,
         {
             "id_entity_persistent_list": id_entity_persistent_list,
             "id_contribution_persistent": str(id_contribution_persistent),
-            "display_txt_similarity_weight": 0.6,
-            "match_count_weight": 0.4,
+            "id_tag_definition_curated_list": curated_tag_definition_ids(),
+            "display_txt_similarity_weight": DISPLAY_TXT_SIMILARITY_WEIGHT,
+            "match_count_weight": MATCH_COUNT_WEIGHT,
             "display_txt_similarity_threshold": 0.7,
+            "candidate_count": MATCH_CANDIDATE_COUNT,
         },
     )
 
 
-MATCHES_QUERY_STRING = """
+_tfidf_index_cache = {}
+
+
+def existing_entities_tfidf_index():
+    """Get a TF-IDF index for the display texts of all existing entities.
+    The index is cached in the current process until entities change.
+    As queue workers run each job in a new process, it is built once per job."""
+    entities = Entity.most_recent_queryset().filter(contribution_candidate=None)
+    key = entities.aggregate(version=Max("id"), count=Count("id"))
+    if _tfidf_index_cache.get("key") != key:
+        id_persistent_list, display_txt_list = [], []
+        for id_persistent, display_txt in entities.values_list(
+            "id_persistent", "display_txt"
+        ).iterator():
+            id_persistent_list.append(id_persistent)
+            display_txt_list.append(display_txt)
+        _tfidf_index_cache["key"] = key
+        _tfidf_index_cache["index"] = TfidfIndex(id_persistent_list, display_txt_list)
+    return _tfidf_index_cache["index"]
+
+
+def find_matches_tfidf(
+    id_contribution_persistent, id_entity_persistent_list, tfidf_matcher=None
+):
+    """Find matches with display texts compared on the queue worker.
+    Candidates are the nearest neighbours by char n-gram TF-IDF vectors
+    and entities with equal curated tag values. They are ranked by levenshtein similarity.
+    Only the match counts of curated tag values are computed by the database.
+    Without a matcher, the nearest neighbours are searched in the current process."""
+    contribution_entities = list(
+        Entity.most_recent_queryset()
+        .filter(id_persistent__in=id_entity_persistent_list)
+        .values_list("id_persistent", "display_txt")
+    )
+    if tfidf_matcher is None:
+        tfidf_matcher = TfidfMatcher(existing_entities_tfidf_index(), process_count=1)
+    index = tfidf_matcher.index
+    candidates = {}
+    for (id_persistent, _), neighbours in zip(
+        contribution_entities,
+        tfidf_matcher.nearest_neighbours(
+            [display_txt for _, display_txt in contribution_entities],
+            MATCH_CANDIDATE_COUNT,
+        ),
+    ):
+        for id_existing_persistent, similarity in neighbours:
+            candidates[(id_persistent, id_existing_persistent)] = similarity
+    display_txt_by_id_persistent = dict(contribution_entities)
+    id_tag_definition_curated_list = curated_tag_definition_ids()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            CANDIDATES_TAG_VALUE_QUERY_STRING,
+            {
+                "id_entity_persistent_list": id_entity_persistent_list,
+                "id_contribution_persistent": str(id_contribution_persistent),
+                "id_tag_definition_curated_list": id_tag_definition_curated_list,
+            },
+        )
+        for id_persistent, id_existing_persistent in cursor.fetchall():
+            row = index.row_by_id_persistent.get(id_existing_persistent)
+            if (
+                row is None
+                or id_persistent not in display_txt_by_id_persistent
+                or (id_persistent, id_existing_persistent) in candidates
+            ):
+                continue
+            candidates[
+                (id_persistent, id_existing_persistent)
+            ] = levenshtein_similarity(
+                index.display_txt_list[row],
+                display_txt_by_id_persistent[id_persistent],
+            )
+    if not candidates:
+        return []
+    return Entity.objects.raw(  # pylint: disable=no-member
+        PRECOMPUTED_MATCHES_QUERY_STRING,
+        {
+            "id_entity_persistent_list": id_entity_persistent_list,
+            "id_contribution_persistent": str(id_contribution_persistent),
+            "id_tag_definition_curated_list": id_tag_definition_curated_list,
+            "contribution_id_persistent_list": [pair[0] for pair in candidates],
+            "existing_id_persistent_list": [pair[1] for pair in candidates],
+            "levenshtein_similarity_list": list(candidates.values()),
+            "display_txt_similarity_weight": DISPLAY_TXT_SIMILARITY_WEIGHT,
+            "match_count_weight": MATCH_COUNT_WEIGHT,
+            "display_txt_similarity_threshold": 0.7,
+        },
+    )
+
+
+def curated_tag_definition_ids():
+    "Get the id_persistent values of all curated tag definitions."
+    return list(
+        TagDefinition.query_set()
+        .filter(curated=True)
+        .values_list("id_persistent", flat=True)
+    )
+
+
+def match_score(match):
+    "Compute the combined score of a match, as used for ranking matches."
+    total_instance_count = match["total_instance_count"]
+    if total_instance_count:
+        match_ratio = match["equal_instance_count"] / total_instance_count
+    else:
+        match_ratio = 0.0
+    return (
+        DISPLAY_TXT_SIMILARITY_WEIGHT * match["levenshtein_similarity"]
+        + MATCH_COUNT_WEIGHT * match_ratio
+    )
+
+
+def entity_versions(id_entity_persistent_list):
+    """Get the versions of entities and their tag instances.
+    Matches have to be recomputed if any of them changes."""
+    tag_instance_version = (
+        TagInstance.objects.filter(  # pylint: disable=no-member
+            id_entity_persistent=OuterRef("id_persistent")
+        )
+        .values("id_entity_persistent")
+        .annotate(tag_instance_version=Max("id"))
+        .values("tag_instance_version")
+    )
+    entities = (
+        Entity.most_recent_queryset()
+        .filter(id_persistent__in=id_entity_persistent_list)
+        .annotate(tag_instance_version=Subquery(tag_instance_version))
+        .values_list("id_persistent", "id", "tag_instance_version")
+    )
+    return {
+        id_persistent: (version, tag_instance_version)
+        for id_persistent, version, tag_instance_version in entities
+    }
+
+
+def stale_matches(id_contribution_persistent, id_entity_persistent_list):
+    "Get the ids of entities whose stored matches are missing or outdated."
+    stored = {
+        id_persistent: (entity_version, tag_instance_version)
+        for id_persistent, entity_version, tag_instance_version in (
+            EntityMatch.objects.filter(  # pylint: disable=no-member
+                contribution_candidate_id=id_contribution_persistent,
+                id_entity_persistent__in=id_entity_persistent_list,
+            ).values_list(
+                "id_entity_persistent", "entity_version", "tag_instance_version"
+            )
+        )
+    }
+    return [
+        id_persistent
+        for id_persistent, versions in entity_versions(
+            id_entity_persistent_list
+        ).items()
+        if stored.get(id_persistent) != versions
+    ]
+
+
+def current_entity_matches(entity_matches):
+    """Remove stored matches with existing entities that have been disabled
+    or merged since the matches were computed.
+    The matches are only changed in memory, as they stay valid for the contribution entity.
+    Returns a list of the entity matches."""
+    entity_matches = list(entity_matches)
+    id_existing_persistent_set = set(
+        Entity.most_recent_queryset()
+        .filter(
+            id_persistent__in={
+                match["id_persistent"]
+                for entity_match in entity_matches
+                for match in entity_match.matches
+            },
+            contribution_candidate=None,
+            disabled=False,
+        )
+        .values_list("id_persistent", flat=True)
+    )
+    for entity_match in entity_matches:
+        entity_match.matches = [
+            match
+            for match in entity_match.matches
+            if match["id_persistent"] in id_existing_persistent_set
+        ]
+    return entity_matches
+
+
+def compute_matches(
+    id_contribution_persistent,
+    id_entity_persistent_list,
+    tfidf_matcher=None,
+    match_engine=None,
+):
+    """Compute scored matches for entities of a contribution and store them.
+    The match engine of the contribution is used, unless a match engine is given."""
+    versions = entity_versions(id_entity_persistent_list)
+    if not versions:
+        return
+    matches = {
+        entity.id_persistent: entity.matches
+        for entity in find_matches(
+            id_contribution_persistent, list(versions), tfidf_matcher, match_engine
+        )
+    }
+    EntityMatch.objects.bulk_create(  # pylint: disable=no-member
+        [
+            EntityMatch(
+                contribution_candidate_id=id_contribution_persistent,
+                id_entity_persistent=id_persistent,
+                entity_version=entity_version,
+                tag_instance_version=tag_instance_version,
+                matches=matches.get(id_persistent, []),
+            )
+            for id_persistent, (
+                entity_version,
+                tag_instance_version,
+            ) in versions.items()
+        ],
+        update_conflicts=True,
+        unique_fields=["contribution_candidate", "id_entity_persistent"],
+        update_fields=["entity_version", "tag_instance_version", "matches"],
+    )
+
+
+_MATCHES_ENTITIES_QUERY_STRING = """
         with "entity_most_recent" as (
-            select *
-            from (
-                select max("id") max_id
-                from vran_entity
-                group by id_persistent
-            ) with_version
-            left join  (
-                select *
-                from vran_entity without_version
-            ) enabled_only
-            on "with_version"."max_id"="enabled_only"."id"
-		),
-		"entity_pairs" as (
-			select *
-			from(
-				select "id" "existing_id"
-                    , "id_persistent" "existing_id_persistent"
-                    , "display_txt" "existing_display_txt"
-				from entity_most_recent "entity_existing"
-	        	where not disabled and contribution_candidate_id is null
-            ) existing
-            cross join (
-                select "id" "contribution_id"
-                    , "id_persistent" "contribution_id_persistent"
-                    , "display_txt" "contribution_display_txt"
-                    , "disabled" "contribution_disabled"
-                    , "previous_version_id" "contribution_previous_version_id"
-                    , "contribution_candidate_id" "contribution_contribution_candidate_id"
-                    , "time_edit" "contribution_time_edit"
-            	from entity_most_recent "entity_candidate"
-            	where not disabled
-                    and "id_persistent" =  ANY(%(id_entity_persistent_list)s)
-            ) contribution
-		),
-		"with_levenshtein" as (
-			select existing_id_persistent, contribution_id_persistent
-                , (
-                	case when "similarity" > 0.3 then
-                		(1-levenshtein_less_equal(
-		                	"existing_display_txt",
-		                	"contribution_display_txt",
-		                	ceiling(
-		                    	0.25*length("contribution_display_txt"))::int)::float/length("contribution_display_txt"))
-                   	else 0.0
-                   	end) "levenshtein_similarity"
-            from (
-                select *
-                    , SIMILARITY("existing_display_txt", "contribution_display_txt")
-                from entity_pairs
-            ) with_similarity
+            select "vran_entityhead"."entity_id" max_id, "vran_entity".*
+            from vran_entityhead
+            inner join vran_entity
+            on "vran_entityhead"."entity_id"="vran_entity"."id"
 		),
+		"entity_contribution" as (
+            select "id" "contribution_id"
+                , "id_persistent" "contribution_id_persistent"
+                , "display_txt" "contribution_display_txt"
+                , "disabled" "contribution_disabled"
+                , "previous_version_id" "contribution_previous_version_id"
+                , "contribution_candidate_id" "contribution_contribution_candidate_id"
+                , "time_edit" "contribution_time_edit"
+            from entity_most_recent "entity_candidate"
+            where not disabled
+                and "id_persistent" =  ANY(%(id_entity_persistent_list)s)
+		),"""
+
+CANDIDATES_TAG_VALUE_QUERY_STRING = """
+            select "instances_origin"."id_entity_persistent" "contribution_id_persistent"
+                , "instances_destination"."id_entity_persistent" "existing_id_persistent"
+            from vran_tagmergerequest
+            inner join vran_taginstance "instances_origin"
+            on "vran_tagmergerequest"."id_origin_persistent" = "instances_origin"."id_tag_definition_persistent"
+            inner join vran_taginstance "instances_destination"
+            -- Uses the value hash index.
+            on "vran_tagmergerequest"."id_destination_persistent" = "instances_destination"."id_tag_definition_persistent"
+                and md5(lower(trim("instances_destination"."value")))
+                    = md5(lower(trim("instances_origin"."value")))
+                and lower(trim("instances_destination"."value"))
+                    = lower(trim("instances_origin"."value"))
+            where "vran_tagmergerequest"."contribution_candidate_id"=%(id_contribution_persistent)s
+                and "vran_tagmergerequest"."id_destination_persistent"
+                    = ANY(%(id_tag_definition_curated_list)s)
+                and "instances_origin"."id_entity_persistent" = ANY(%(id_entity_persistent_list)s)
+        """
+
+_MATCHES_SCORING_QUERY_STRING = """
 	 	with_match_count as (
+            -- Only equal values are counted. They are looked up by the value hash index
+            -- for each pair instead of comparing all values of all entities.
 			select
-				id_entity_origin
-				, id_entity_destination
-				, count (case when "value_origin" = "value_destination" then 1 end) equal_instance_count
-				, array_agg (case when "value_origin" = "value_destination" then "id_destination_persistent" end) equal_tag_definition_list
+				"instances_origin"."id_entity_persistent" id_entity_origin
+				, "instances_destination"."id_entity_persistent" id_entity_destination
+				, count(*) equal_instance_count
+				, array_agg("tagmergerequest"."id_destination_persistent") equal_tag_definition_list
 				, count(*) total_instance_count
-			from (
-				select "id_entity_origin", "value_origin", "id_entity_destination" ,"value_destination", "id_destination_persistent"
-				from (
-					(
-                        select "id_origin_persistent",  "id_destination_persistent"
-						from vran_tagmergerequest
-						where contribution_candidate_id=%(id_contribution_persistent)s
-					) tagmergerequest
-					inner join (
-						select "id_persistent"
-						from vran_tagdefinition
-						where "curated"
-					) tag_definition_curated
-					on "id_destination_persistent" = "tag_definition_curated"."id_persistent"
-				) merge_requests
-				left join (
-					select "id_entity_persistent" "id_entity_destination", "value" "value_destination", "id_tag_definition_persistent"
-                    from vran_taginstance
-					where id_entity_persistent in (
-						select existing_id_persistent
-						from entity_pairs
-					)
-				) instances_destination
-				on "merge_requests"."id_destination_persistent" = "instances_destination"."id_tag_definition_persistent"
-				left join (
-						select "id_entity_persistent" "id_entity_origin", "value" "value_origin", "id_tag_definition_persistent"
-                        from vran_taginstance
-						where id_entity_persistent in (
-							select contribution_id_persistent
-							from entity_pairs
-                        )
-				) instances_origin
-				on "merge_requests"."id_origin_persistent" = "instances_origin"."id_tag_definition_persistent"
-				where "value_origin"="value_destination"
-			) instance_pairs
-			group by id_entity_origin, id_entity_destination
+			from entity_pairs
+			inner join vran_taginstance "instances_origin"
+			on "instances_origin"."id_entity_persistent" = "entity_pairs"."contribution_id_persistent"
+			inner join vran_tagmergerequest "tagmergerequest"
+			on "tagmergerequest"."id_origin_persistent" = "instances_origin"."id_tag_definition_persistent"
+				and "tagmergerequest"."contribution_candidate_id"=%(id_contribution_persistent)s
+				and "tagmergerequest"."id_destination_persistent"
+					= ANY(%(id_tag_definition_curated_list)s)
+			inner join vran_taginstance "instances_destination"
+			on "instances_destination"."id_tag_definition_persistent" = "tagmergerequest"."id_destination_persistent"
+				and md5(lower(trim("instances_destination"."value")))
+					= md5(lower(trim("instances_origin"."value")))
+				and lower(trim("instances_destination"."value"))
+					= lower(trim("instances_origin"."value"))
+				and "instances_destination"."id_entity_persistent" = "entity_pairs"."existing_id_persistent"
+			group by "instances_origin"."id_entity_persistent", "instances_destination"."id_entity_persistent"
 		),
 		"with_json_match" as (
 			select *,
@@ -186,6 +414,107 @@ MATCHES_QUERY_STRING = """
         on "matches_with_detail"."id_persistent" = "duplicate_assignments"."id_origin_persistent"
         """
 
+MATCHES_QUERY_STRING = (
+    _MATCHES_ENTITIES_QUERY_STRING
+    + """
+		"candidates_display_txt" as (
+            -- Uses the trigram index for retrieving the nearest existing entities.
+            select "contribution_id_persistent", "existing"."id_persistent" "existing_id_persistent"
+            from entity_contribution
+            cross join lateral (
+                select "vran_entity"."id_persistent"
+                from vran_entity
+                inner join vran_entityhead
+                on "vran_entityhead"."entity_id"="vran_entity"."id"
+                where not "vran_entity"."disabled"
+                    and "vran_entity"."contribution_candidate_id" is null
+                order by "vran_entity"."display_txt" <-> "contribution_display_txt"
+                limit %(candidate_count)s
+            ) existing
+		),
+		"candidates_tag_value" as ("""
+    + CANDIDATES_TAG_VALUE_QUERY_STRING
+    + """
+		),
+		"entity_pairs" as (
+			select "existing_id"
+                , "candidates"."existing_id_persistent"
+                , "existing_display_txt"
+                , "entity_contribution".*
+			from (
+                select * from candidates_display_txt
+                union
+                select * from candidates_tag_value
+            ) candidates
+            inner join (
+				select "id" "existing_id"
+                    , "id_persistent" "existing_candidate_id_persistent"
+                    , "display_txt" "existing_display_txt"
+				from entity_most_recent "entity_existing"
+	        	where not disabled and contribution_candidate_id is null
+            ) existing
+            on "candidates"."existing_id_persistent" = "existing"."existing_candidate_id_persistent"
+            inner join entity_contribution
+            on "candidates"."contribution_id_persistent" = "entity_contribution"."contribution_id_persistent"
+		),
+		"with_levenshtein" as (
+			select existing_id_persistent, contribution_id_persistent
+                , (
+                	case when "similarity" > 0.3 then
+                		(1-levenshtein_less_equal(
+		                	"existing_display_txt",
+		                	"contribution_display_txt",
+		                	ceiling(
+		                    	0.25*length("contribution_display_txt"))::int)::float/length("contribution_display_txt"))
+                   	else 0.0
+                   	end) "levenshtein_similarity"
+            from (
+                select *
+                    , SIMILARITY("existing_display_txt", "contribution_display_txt")
+                from entity_pairs
+            ) with_similarity
+		),"""
+    + _MATCHES_SCORING_QUERY_STRING
+)
+
+PRECOMPUTED_MATCHES_QUERY_STRING = (
+    _MATCHES_ENTITIES_QUERY_STRING
+    + """
+		"candidates" as (
+            select *
+            from unnest(
+                %(contribution_id_persistent_list)s::text[],
+                %(existing_id_persistent_list)s::text[],
+                %(levenshtein_similarity_list)s::float[]
+            ) precomputed(
+                "contribution_id_persistent",
+                "existing_id_persistent",
+                "levenshtein_similarity"
+            )
+		),
+		"entity_pairs" as (
+			select "existing_id"
+                , "candidates"."existing_id_persistent"
+                , "existing_display_txt"
+                , "entity_contribution".*
+			from candidates
+            inner join (
+				select "id" "existing_id"
+                    , "id_persistent" "existing_candidate_id_persistent"
+                    , "display_txt" "existing_display_txt"
+				from entity_most_recent "entity_existing"
+	        	where not disabled and contribution_candidate_id is null
+            ) existing
+            on "candidates"."existing_id_persistent" = "existing"."existing_candidate_id_persistent"
+            inner join entity_contribution
+            on "candidates"."contribution_id_persistent" = "entity_contribution"."contribution_id_persistent"
+		),
+		"with_levenshtein" as (
+			select * from candidates
+		),"""
+    + _MATCHES_SCORING_QUERY_STRING
+)
+
 
 def add_assigned_duplicates_query(matches_query):
     "Add information on duplicates to matches_query"
@@ -11,3 +11,27 @@ class EntityDuplicate(models.Model):
     contribution_candidate = models.ForeignKey(
         "contributioncandidate", on_delete=models.CASCADE
     )
+
+
+class EntityMatch(models.Model):
+    "A model for storing precomputed scored matches of an entity in a contribution."
+    contribution_candidate = models.ForeignKey(
+        "contributioncandidate", on_delete=models.CASCADE
+    )
+    id_entity_persistent = models.TextField()
+    "The id_persistent of the entity in the contribution"
+    entity_version = models.BigIntegerField()
+    "The version of the entity the matches were computed for."
+    tag_instance_version = models.BigIntegerField(blank=True, null=True)
+    "The most recent tag instance version of the entity the matches were computed for."
+    matches = models.JSONField(default=list)
+
+    class Meta:
+        "Meta class for entity matches"
+        # pylint: disable=too-few-public-methods
+        constraints = [
+            models.UniqueConstraint(
+                fields=["contribution_candidate", "id_entity_persistent"],
+                name="vran_entitymatch_contribution_entity_unique",
+            )
+        ]
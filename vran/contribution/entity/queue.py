@@ -1,19 +1,37 @@
 "Queue methods for removing duplicates of a contribution candidate."
 import logging
+from contextlib import nullcontext
 
 import django_rq
-from django.db import transaction
-from django.db.models import OuterRef, Subquery
+from django.db import connection, transaction
+from django.db.models import Subquery
 from django.db.utils import OperationalError
+from rq import get_current_job
 
-from vran.contribution.entity.models_django import EntityDuplicate
+from vran.contribution.entity.match_entities import (
+    compute_matches,
+    current_entity_matches,
+    existing_entities_tfidf_index,
+    match_score,
+    stale_matches,
+)
+from vran.contribution.entity.models_django import EntityDuplicate, EntityMatch
+from vran.contribution.entity.tfidf import TfidfMatcher
 from vran.contribution.models_django import ContributionCandidate
 from vran.entity.models_django import Entity
-from vran.entity.queue import update_display_txt_cache
-from vran.merge_request.queue import merge_request_fast_forward
-from vran.tag.models_django import TagInstance, TagInstanceHistory
+from vran.entity.queue import update_display_txt_caches
+from vran.merge_request.queue import merge_contribution
 from vran.util import timestamp
 
+MATCH_BATCH_SIZE = 200
+# The TF-IDF engine distributes a batch over worker processes.
+TFIDF_MATCH_BATCH_SIZE = 4096
+# Duplicates can only be assigned before the entities of a contribution are merged.
+AUTO_ASSIGN_STATES = [
+    ContributionCandidate.VALUES_EXTRACTED,
+    ContributionCandidate.ENTITIES_MATCHED,
+]
+
 
 def eliminate_duplicates(id_contribution_persistent):
     "Eliminate all marked duplicate entities for a contribution candidate"
@@ -29,28 +47,12 @@ def eliminate_duplicates(id_contribution_persistent):
             except OperationalError:
                 return
         time_edit = timestamp()
-        duplicates = EntityDuplicate.objects.filter(  # pylint: disable=no-member
-            contribution_candidate=contribution
-        )
-        tag_instances_with_duplicates = annotate_with_replacement_info(
-            TagInstance.objects.all(),  # pylint: disable=no-member
-            duplicates,
-            "id_entity_persistent",
-        )
-        update_tag_instances(
-            tag_instances_with_duplicates, contribution.created_by, time_edit
-        )
-
-        replaced_entities_with_duplicates = annotate_with_replacement_info(
-            Entity.objects.filter(  # pylint: disable=no-member
-                contribution_candidate=contribution
-            ),
-            duplicates,
-            "id_persistent",
-        )
-        update_entities(replaced_entities_with_duplicates)
-        for merge_request in contribution.tagmergerequest_set.all():
-            django_rq.enqueue(merge_request_fast_forward, merge_request.id_persistent)
+        with transaction.atomic():
+            id_entity_updated_list = update_tag_instances(contribution, time_edit)
+            update_entities(contribution)
+        if id_entity_updated_list:
+            django_rq.enqueue(update_display_txt_caches, id_entity_updated_list)
+        django_rq.enqueue(merge_contribution, id_contribution_persistent)
         contribution.set_state(ContributionCandidate.MERGED)
         contribution.save()
     except Exception as exc:  # pylint: disable=broad-except
@@ -65,50 +67,161 @@ def eliminate_duplicates(id_contribution_persistent):
             contribution_candidate.save()
 
 
-def update_tag_instances(tag_instances_with_duplicates, user, time_edit):
-    "Update tag instances according to replacement info."
-    # no good way to keep track of updates in bulk operation for now
-    tag_instances_with_duplicates = tag_instances_with_duplicates.filter(
-        replacement_id_entity_persistent__isnull=False
-    )
-    updated_tag_instances = [
-        TagInstanceHistory.change_or_create(
-            id_persistent=tag_instance.id_persistent,
-            id_entity_persistent=tag_instance.replacement_id_entity_persistent,
-            value=tag_instance.value,
-            id_tag_definition_persistent=tag_instance.id_tag_definition_persistent,
-            user=user,
-            version=tag_instance.id,
-            time_edit=time_edit,
-        )[0]
-        for tag_instance in tag_instances_with_duplicates
-    ]
-    TagInstanceHistory.objects.bulk_create(  # pylint: disable=no-member
-        updated_tag_instances
-    )
-    for tag_instance in updated_tag_instances:
-        django_rq.enqueue(update_display_txt_cache, tag_instance.id_entity_persistent)
-
-
-def annotate_with_replacement_info(manager, replacements, id_entity_field_name):
-    "Annotate DB objects with replacement information."
-    return manager.annotate(  # pylint: disable=no-member
-        replacement_id_entity_persistent=Subquery(
-            replacements.filter(
-                id_origin_persistent=OuterRef(id_entity_field_name)
-            ).values("id_destination_persistent")
+def update_tag_instances(contribution, time_edit):
+    """Move tag instances of replaced entities to the assigned duplicates.
+    New versions are written in a single statement.
+    Returns the id_persistent values of entities with moved tag instances."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """insert into vran_taginstancehistory (
+                id_persistent
+                , id_entity_persistent
+                , id_tag_definition_persistent
+                , value
+                , time_edit
+                , previous_version_id
+            )
+            select "vran_taginstance"."id_persistent"
+                , "vran_entityduplicate"."id_destination_persistent"
+                , "vran_taginstance"."id_tag_definition_persistent"
+                , "vran_taginstance"."value"
+                , %(time_edit)s
+                , "vran_taginstance"."id"
+            from vran_taginstance
+            inner join vran_entityduplicate
+            on "vran_taginstance"."id_entity_persistent"
+                = "vran_entityduplicate"."id_origin_persistent"
+            where "vran_entityduplicate"."contribution_candidate_id"
+                = %(id_contribution_persistent)s
+            returning id_entity_persistent""",
+            {
+                "time_edit": time_edit,
+                "id_contribution_persistent": contribution.id_persistent,
+            },
         )
-    )
+        return list({row[0] for row in cursor.fetchall()})
 
 
-def update_entities(entities_with_replacement_info):
-    """Update entities according to replacement info:
+def update_entities(contribution):
+    """Update entities of a contribution according to the assigned duplicates:
     Replaced entities will be deleted and
     others will be made full entities by removing the contribution_candidate."""
     # In the future the entities may just be disabled.
-    entities_with_replacement_info.filter(
-        replacement_id_entity_persistent__isnull=False
+    entities = Entity.objects.filter(  # pylint: disable=no-member
+        contribution_candidate=contribution
+    )
+    entities.filter(
+        id_persistent__in=Subquery(
+            EntityDuplicate.objects.filter(  # pylint: disable=no-member
+                contribution_candidate=contribution
+            ).values("id_origin_persistent")
+        )
     ).delete()
-    entities_with_replacement_info.filter(
-        replacement_id_entity_persistent__isnull=True
-    ).update(contribution_candidate=None)
+    entities.update(contribution_candidate=None)
+
+
+def compute_contribution_matches(id_contribution_persistent):
+    """Precompute scored matches for all entities of a contribution candidate.
+    The progress is stored as fraction of processed entities in the job meta data."""
+    try:
+        id_entity_persistent_list = list(
+            Entity.most_recent_queryset()
+            .filter(contribution_candidate_id=id_contribution_persistent)
+            .order_by("id_persistent")
+            .values_list("id_persistent", flat=True)
+        )
+        if (
+            ContributionCandidate.objects.filter(  # pylint: disable=no-member
+                id_persistent=id_contribution_persistent
+            )
+            .values_list("match_engine", flat=True)
+            .first()
+            == ContributionCandidate.MATCH_ENGINE_TFIDF
+        ):
+            batch_size = TFIDF_MATCH_BATCH_SIZE
+            # The worker processes are reused for all batches.
+            tfidf_matcher = TfidfMatcher(existing_entities_tfidf_index())
+        else:
+            batch_size = MATCH_BATCH_SIZE
+            tfidf_matcher = nullcontext()
+        job = get_current_job()
+        entity_count = len(id_entity_persistent_list)
+        with tfidf_matcher as matcher:
+            for offset in range(0, entity_count, batch_size):
+                compute_matches(
+                    id_contribution_persistent,
+                    id_entity_persistent_list[offset : offset + batch_size],
+                    matcher,
+                )
+                if job is not None:
+                    job.meta["progress"] = (
+                        min(offset + batch_size, entity_count) / entity_count
+                    )
+                    job.save_meta()
+    except Exception as exc:  # pylint: disable=broad-except
+        logging.warning(None, exc_info=exc)
+
+
+def auto_assign_duplicates(id_contribution_persistent, threshold):
+    """Assign the best scored match as duplicate for all entities of a contribution,
+    if the score exceeds the threshold. Entities with an assigned duplicate are skipped.
+    Nothing is assigned, if the entities of the contribution are already assigned.
+    The counts are stored as result in the job meta data.
+    Returns the number of assigned duplicates and the number of skipped entities."""
+    id_entity_persistent_list = list(
+        Entity.most_recent_queryset()
+        .filter(contribution_candidate_id=id_contribution_persistent)
+        .values_list("id_persistent", flat=True)
+    )
+    id_stale_list = stale_matches(id_contribution_persistent, id_entity_persistent_list)
+    for offset in range(0, len(id_stale_list), MATCH_BATCH_SIZE):
+        compute_matches(
+            id_contribution_persistent,
+            id_stale_list[offset : offset + MATCH_BATCH_SIZE],
+        )
+    with transaction.atomic():
+        contribution = (
+            ContributionCandidate.objects.filter(  # pylint: disable=no-member
+                id_persistent=id_contribution_persistent
+            )
+            .select_for_update()
+            .get()
+        )
+        if contribution.state not in AUTO_ASSIGN_STATES:
+            return 0, 0
+        id_assigned_set = set(
+            EntityDuplicate.objects.filter(  # pylint: disable=no-member
+                id_origin_persistent__in=id_entity_persistent_list
+            ).values_list("id_origin_persistent", flat=True)
+        )
+        duplicates = []
+        for entity_match in current_entity_matches(
+            EntityMatch.objects.filter(  # pylint: disable=no-member
+                contribution_candidate_id=id_contribution_persistent,
+                id_entity_persistent__in=id_entity_persistent_list,
+            )
+        ):
+            if (
+                entity_match.id_entity_persistent in id_assigned_set
+                or not entity_match.matches
+            ):
+                continue
+            best_match = max(entity_match.matches, key=match_score)
+            if match_score(best_match) > threshold:
+                duplicates.append(
+                    EntityDuplicate(
+                        id_origin_persistent=entity_match.id_entity_persistent,
+                        id_destination_persistent=best_match["id_persistent"],
+                        contribution_candidate_id=id_contribution_persistent,
+                    )
+                )
+        EntityDuplicate.objects.bulk_create(duplicates)  # pylint: disable=no-member
+    job = get_current_job()
+    if job is not None:
+        job.meta["progress"] = 1.0
+        job.meta["result"] = {
+            "assigned": len(duplicates),
+            "skipped": len(id_assigned_set),
+        }
+        job.save_meta()
+    return len(duplicates), len(id_assigned_set)
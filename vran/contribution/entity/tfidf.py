@@ -0,0 +1,201 @@
+"""Matching display texts by char n-gram TF-IDF vectors.
+The computations only depend on NumPy, such that they can run in worker processes."""
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from math import ceil
+from multiprocessing import get_context
+from os import cpu_count
+from typing import List, Optional, Tuple
+
+import numpy as np
+from Levenshtein import distance
+
+NGRAM_LENGTH = 3
+# Number of query texts sent to a worker process at once.
+TFIDF_BLOCK_SIZE = 256
+# Number of worker processes of a single matching job.
+# It is capped, as multiple queue workers may run on the same host.
+TFIDF_PROCESS_COUNT = min(4, cpu_count() or 1)
+
+
+def char_ngrams(text: Optional[str], ngram_length=NGRAM_LENGTH) -> List[str]:
+    "Get the char n-grams of a text padded by a single space at both ends."
+    if not text:
+        return []
+    padded = f" {text.lower()} "
+    return [
+        padded[start : start + ngram_length]
+        for start in range(len(padded) - ngram_length + 1)
+    ]
+
+
+def levenshtein_similarity(text_candidate: str, text: str) -> float:
+    """Compute the levenshtein similarity normalized by the length of text.
+    Pairs with a distance of more than a quarter of the length have similarity 0.
+    This corresponds to the similarity used for matching in the database."""
+    if not text or not text_candidate:
+        return 0.0
+    max_distance = ceil(0.25 * len(text))
+    text_distance = distance(text_candidate, text, score_cutoff=max_distance)
+    if text_distance > max_distance:
+        return 0.0
+    return 1 - text_distance / len(text)
+
+
+class TfidfIndex:
+    """Sparse char n-gram TF-IDF vectors of display texts.
+    The vectors are stored column wise, i.e. as posting lists for each n-gram."""
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, id_persistent_list: List[str], display_txt_list: List[str]):
+        self.id_persistent_list = list(id_persistent_list)
+        self.display_txt_list = list(display_txt_list)
+        self.row_by_id_persistent = {
+            id_persistent: row for row, id_persistent in enumerate(id_persistent_list)
+        }
+        self.vocabulary = {}
+        rows, columns, counts = [], [], []
+        for row, display_txt in enumerate(self.display_txt_list):
+            for ngram, count in Counter(char_ngrams(display_txt)).items():
+                rows.append(row)
+                columns.append(self.vocabulary.setdefault(ngram, len(self.vocabulary)))
+                counts.append(count)
+        rows = np.array(rows, dtype=np.int64)
+        columns = np.array(columns, dtype=np.int64)
+        document_frequency = np.bincount(columns, minlength=len(self.vocabulary))
+        self.idf = (
+            np.log((1 + len(self.display_txt_list)) / (1 + document_frequency)) + 1.0
+        )
+        weights = np.array(counts, dtype=np.float64) * self.idf[columns]
+        norms = np.sqrt(
+            np.bincount(
+                rows, weights=weights**2, minlength=len(self.display_txt_list)
+            )
+        )
+        weights /= norms[rows]
+        order = np.argsort(columns, kind="stable")
+        self.posting_indptr = np.concatenate(([0], np.cumsum(document_frequency)))
+        self.posting_rows = rows[order]
+        self.posting_weights = weights[order]
+
+    def vectorize(self, text: Optional[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the normalized TF-IDF vector of a text as columns and weights.
+        N-grams that do not occur in the index are ignored."""
+        columns, counts = [], []
+        for ngram, count in Counter(char_ngrams(text)).items():
+            column = self.vocabulary.get(ngram)
+            if column is not None:
+                columns.append(column)
+                counts.append(count)
+        columns = np.array(columns, dtype=np.int64)
+        weights = np.array(counts, dtype=np.float64) * self.idf[columns]
+        if len(weights):
+            weights /= np.sqrt(np.sum(weights**2))
+        return columns, weights
+
+    def top_k(self, text: Optional[str], k: int) -> List[Tuple[int, float]]:
+        """Get the rows of the k nearest display texts by cosine similarity.
+        Only rows sharing at least one n-gram with the text are considered.
+        Returns:
+            Tuples of row and cosine similarity ordered by descending similarity."""
+        columns, weights = self.vectorize(text)
+        if columns.size == 0:
+            return []
+        starts = self.posting_indptr[columns]
+        lengths = self.posting_indptr[columns + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        posting_idx = offsets + np.arange(np.sum(lengths))
+        rows, inverse = np.unique(self.posting_rows[posting_idx], return_inverse=True)
+        scores = np.bincount(
+            inverse,
+            weights=self.posting_weights[posting_idx] * np.repeat(weights, lengths),
+        )
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(rows[idx]), float(scores[idx])) for idx in top]
+
+    def nearest(self, text: Optional[str], k: int) -> List[Tuple[str, float]]:
+        """Get the k nearest display texts by cosine similarity
+        re-ranked by levenshtein similarity.
+        Returns:
+            Tuples of id_persistent and levenshtein similarity."""
+        candidates = [
+            (
+                self.id_persistent_list[row],
+                levenshtein_similarity(self.display_txt_list[row], text),
+            )
+            for row, _ in self.top_k(text, k)
+        ]
+        return sorted(candidates, key=lambda candidate: -candidate[1])
+
+
+_worker_state = {}
+
+
+def _init_worker(index: TfidfIndex):
+    _worker_state["index"] = index
+
+
+def _nearest_block(text_list: List[Optional[str]], k: int):
+    return [_worker_state["index"].nearest(text, k) for text in text_list]
+
+
+class TfidfMatcher:
+    """Nearest neighbour search in a TF-IDF index distributed over worker processes.
+    The worker processes are started when entering the context
+    and the index is sent to each of them once.
+    They are reused for all searches until the context is left."""
+
+    def __init__(
+        self,
+        index: TfidfIndex,
+        process_count: int = TFIDF_PROCESS_COUNT,
+        block_size: int = TFIDF_BLOCK_SIZE,
+    ):
+        self.index = index
+        self.process_count = process_count
+        self.block_size = block_size
+        self.pool: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self):
+        if self.process_count > 1:
+            # Worker processes are spawned, as forked processes would share
+            # the database connections of the parent.
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.process_count,
+                mp_context=get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.index,),
+            )
+        return self
+
+    def __exit__(self, *args):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def nearest_neighbours(
+        self, text_list: List[Optional[str]], k: int
+    ) -> List[List[Tuple[str, float]]]:
+        """Get the k nearest neighbours in the index for multiple texts.
+        Blocks of texts are processed by the worker processes.
+        Without worker processes, the texts are processed in the current process.
+        Returns:
+            For each text the result of `TfidfIndex.nearest`."""
+        blocks = [
+            text_list[offset : offset + self.block_size]
+            for offset in range(0, len(text_list), self.block_size)
+        ]
+        if self.pool is None or len(blocks) <= 1:
+            return [self.index.nearest(text, k) for text in text_list]
+        return [
+            neighbours
+            for block_neighbours in self.pool.map(
+                _nearest_block, blocks, [k] * len(blocks)
+            )
+            for neighbours in block_neighbours
+        ]
@@ -1,5 +1,5 @@
 "API models for contributions."
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 from ninja import Schema
 
@@ -16,8 +16,11 @@ class ContributionPostRequest(Schema):
 
 class ContributionPostResponse(Schema):
     # pylint: disable=too-few-public-methods
-    "Response data for successful creation of a contribution"
+    """Response data for successful creation of a contribution.
+    If the same file has already been uploaded, the existing contribution is returned
+    and duplicate is set."""
     id_persistent: str
+    duplicate: bool = False
 
 
 class ContributionChunkRequest(Schema):
@@ -39,6 +42,7 @@ class ContributionCandidate(Schema):
     error_msg: Optional[str]
     error_details: Optional[str]
     match_tag_definition_list: Optional[List[TagDefinitionResponse]]
+    match_engine: Literal["POSTGRES", "TFIDF"] = "POSTGRES"
 
 
 class ContributionCandidatePatchRequest(Schema):
@@ -47,6 +51,7 @@ class ContributionCandidatePatchRequest(Schema):
     name: Optional[str]
     description: Optional[str]
     has_header: Optional[bool]
+    match_engine: Optional[Literal["POSTGRES", "TFIDF"]]
 
 
 class ContributionChunkResponse(Schema):
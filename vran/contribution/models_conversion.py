@@ -16,6 +16,15 @@ _contribution_state_mapping_db_to_api = {
     ContributionCandidateDb.MERGED: "MERGED",
 }
 
+_match_engine_mapping_db_to_api = {
+    ContributionCandidateDb.MATCH_ENGINE_POSTGRES: "POSTGRES",
+    ContributionCandidateDb.MATCH_ENGINE_TFIDF: "TFIDF",
+}
+
+match_engine_mapping_api_to_db = {
+    value: key for key, value in _match_engine_mapping_db_to_api.items()
+}
+
 
 def contribution_db_to_api(
     contribution_db: ContributionCandidateDb,
@@ -43,4 +52,5 @@ def contribution_db_to_api(
         error_msg=contribution_db.error_msg,
         error_details=contribution_db.error_trace,
         match_tag_definition_list=match_tag_definition_list,
+        match_engine=_match_engine_mapping_db_to_api[contribution_db.match_engine],
     )
@@ -33,6 +33,12 @@ class ContributionCandidate(models.Model):
         (VALUES_ASSIGNED, "values assigned"),
         (MERGED, "merged"),
     ]
+    MATCH_ENGINE_POSTGRES = "PG"
+    MATCH_ENGINE_TFIDF = "TFI"
+    MATCH_ENGINE_CHOICES = [
+        (MATCH_ENGINE_POSTGRES, "postgres"),
+        (MATCH_ENGINE_TFIDF, "tfidf"),
+    ]
 
     name = models.TextField()
     description = models.TextField()
@@ -40,9 +46,19 @@ class ContributionCandidate(models.Model):
     has_header = models.BooleanField()
     created_by = models.ForeignKey("VranUser", on_delete=models.CASCADE)
     file_name = models.TextField()
+    file_hash = models.CharField(max_length=64, blank=True, null=True)
     state = models.CharField(max_length=4, choices=TYPE_CHOICES)
     error_msg = models.TextField(blank=True, null=True)
     error_trace = models.TextField(blank=True, null=True)
+    match_engine = models.CharField(
+        max_length=3, choices=MATCH_ENGINE_CHOICES, default=MATCH_ENGINE_POSTGRES
+    )
+    "Engine used for scoring matches of the contributed entities."
+
+    class Meta:
+        "Meta class for contribution candidates"
+        # pylint: disable=too-few-public-methods
+        indexes = [models.Index(fields=["created_by", "file_hash"])]
 
     def set_state(self, state, error_msg=None, exception=None):
         "Set state of the contribution and set or reset a possible error message."
@@ -62,6 +78,15 @@ class ContributionCandidate(models.Model):
             created_by=user
         ).all()[start : start + offset]
 
+    @classmethod
+    def by_file_hash(cls, file_hash: str, has_header: bool, user: VranUser):
+        """Get the not yet merged contribution candidates of a user
+        with a specific file hash.
+        The header flag is included, as it changes how the file is read."""
+        return ContributionCandidate.objects.filter(  # pylint: disable=no-member
+            created_by=user, file_hash=file_hash, has_header=has_header
+        ).exclude(state=ContributionCandidate.MERGED)
+
     @classmethod
     def by_id_persistent(
         cls,
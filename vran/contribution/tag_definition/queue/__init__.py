@@ -1,8 +1,13 @@
 "Dispatch of queue functions for contribution candidates."
 
 import django_rq
+from django.db import transaction
 
-from vran.contribution.entity.queue import eliminate_duplicates
+from vran.contribution.entity.models_django import EntityMatch
+from vran.contribution.entity.queue import (
+    compute_contribution_matches,
+    eliminate_duplicates,
+)
 from vran.contribution.models_django import ContributionCandidate
 from vran.contribution.tag_definition.queue.create import read_csv_head
 from vran.contribution.tag_definition.queue.ingest import ingest_values_from_csv
@@ -23,9 +28,32 @@ def dispatch_read_csv_head(
     ):
         django_rq.enqueue(read_csv_head, str(instance.id_persistent))
         return
+    if update_fields and "match_engine" in update_fields:
+        # Matches found by the previous engine are outdated.
+        EntityMatch.objects.filter(  # pylint: disable=no-member
+            contribution_candidate=instance
+        ).delete()
+        if instance.state in [
+            ContributionCandidate.VALUES_EXTRACTED,
+            ContributionCandidate.ENTITIES_MATCHED,
+        ]:
+            id_contribution_persistent = str(instance.id_persistent)
+            transaction.on_commit(
+                lambda: django_rq.enqueue(
+                    compute_contribution_matches, id_contribution_persistent
+                )
+            )
     if not (update_fields and "state" in update_fields):
         return
     if instance.state == ContributionCandidate.COLUMNS_ASSIGNED:
         django_rq.enqueue(ingest_values_from_csv, str(instance.id_persistent))
+    elif instance.state == ContributionCandidate.VALUES_EXTRACTED:
+        # Values are extracted within a transaction.
+        id_contribution_persistent = str(instance.id_persistent)
+        transaction.on_commit(
+            lambda: django_rq.enqueue(
+                compute_contribution_matches, id_contribution_persistent
+            )
+        )
     elif instance.state == ContributionCandidate.ENTITIES_ASSIGNED:
         django_rq.enqueue(eliminate_duplicates, str(instance.id_persistent))
@@ -1,52 +1,154 @@
 "Queue job for ingesting data after columns have been assigned."
 import logging
 from datetime import datetime
-from typing import List, Tuple
+from time import perf_counter
+from typing import List, Optional, Tuple
 from uuid import uuid4
 
 from django.db import transaction
 from django.db.utils import OperationalError
+from pandas import DataFrame, Series, isna, to_numeric
 
 from vran.contribution.models_django import ContributionCandidate
 from vran.contribution.tag_definition.models_django import TagDefinitionContribution
 from vran.contribution.tag_definition.queue.util import read_csv_of_candidate
 from vran.entity.models_django import Entity
-from vran.exception import TagDefinitionExistsException
+from vran.exception import InvalidTagValueException, TagDefinitionExistsException
 from vran.merge_request.models_django import TagMergeRequest
 from vran.tag.models_django import (
     TagDefinition,
     TagDefinitionHistory,
     TagInstanceHistory,
 )
+from vran.util.django import copy_rows
 
+INGEST_BATCH_SIZE = 10000
 
-def mk_display_txt_extractor(idx):
-    """Create a function to read the display text from csv rows.
-    If the index is None a function always returning None is the result of this function.
-    """
-    if idx is None:
-        return lambda _: None
-    return lambda row_tpl: row_tpl[idx]
+ENTITY_COPY_FIELDS = [
+    "proxy_name",
+    "display_txt",
+    "time_edit",
+    "id_persistent",
+    "contribution_candidate_id",
+    "disabled",
+]
 
+TAG_INSTANCE_COPY_FIELDS = [
+    "id_persistent",
+    "id_entity_persistent",
+    "id_tag_definition_persistent",
+    "value",
+    "time_edit",
+]
 
-def is_row_empty(
-    display_txt, row_tpl, column_assignment: List[Tuple[int, TagDefinition]]
+
+def empty_rows(
+    data_frame: DataFrame,
+    display_txt_idx: Optional[int],
+    column_assignments: List[Tuple[int, TagDefinition]],
+) -> Series:
+    "Check which rows of a data frame are empty for a given column assignment."
+    if display_txt_idx is None:
+        empty = Series(True, index=data_frame.index)
+    else:
+        display_txt = data_frame.iloc[:, display_txt_idx].astype(str).str.strip()
+        empty = display_txt.eq("") | display_txt.eq("None")
+    for idx, _ in column_assignments:
+        column = data_frame.iloc[:, int(idx)]
+        is_none = column.map(lambda val: val is None)
+        empty &= is_none | column.astype(str).str.strip().eq("")
+    return empty
+
+
+def non_empty_values(column: Series) -> Series:
+    "Get the values of a column that should be stored as tag instances."
+    column = column[column.notna()].astype(str)
+    return column[~(column.eq("nan") | column.str.strip().eq(""))]
+
+
+def check_values(tag_definition: TagDefinition, values: Series):
+    "Check the values of a column against the type of a tag definition."
+    if tag_definition.type == TagDefinition.INNER:
+        invalid = ~values.str.lower().isin({"true", "false"})
+    elif tag_definition.type == TagDefinition.FLOAT:
+        invalid = to_numeric(values.str.strip(), errors="coerce").isna()
+    else:
+        return
+    if invalid.any():
+        raise InvalidTagValueException(
+            tag_definition.id_persistent,
+            values[invalid].iloc[0],
+            tag_definition.type,
+        )
+
+
+def ingest_batch(
+    data_frame: DataFrame,
+    contribution: ContributionCandidate,
+    display_txt_idx: Optional[int],
+    column_assignments: List[Tuple[int, TagDefinition]],
+    time_add: datetime,
 ):
-    "Check if the entries of a row are empty for a given column assignment."
-    display_txt_str = str(display_txt)
-    if not (
-        display_txt_str == "None" or display_txt_str == "" or display_txt_str.isspace()
-    ):
-        return False
-    for idx, _ in column_assignment:
-        val = row_tpl[idx]
-        if val is None:
-            continue
-        val_string = str(val)
-        if val_string == "" or val_string.isspace():
-            continue
-        return False
-    return True
+    """Write entities and tag instances for a batch of csv rows.
+    Returns:
+        The number of created entities."""
+    data_frame = data_frame[
+        ~empty_rows(data_frame, display_txt_idx, column_assignments)
+    ]
+    values_by_tag_definition = []
+    for idx_in_file, tag_definition in column_assignments:
+        values = non_empty_values(data_frame.iloc[:, int(idx_in_file)])
+        check_values(tag_definition, values)
+        values_by_tag_definition.append((tag_definition, values))
+    id_entity_persistent_list = Series(
+        [str(uuid4()) for _ in range(len(data_frame))],
+        index=data_frame.index,
+        dtype=object,
+    )
+    if display_txt_idx is None:
+        display_txt_list = [None] * len(data_frame)
+    else:
+        display_txt_column = data_frame.iloc[:, display_txt_idx]
+        display_txt_list = [
+            None if isna(display_txt) else str(display_txt)
+            for display_txt in display_txt_column
+        ]
+    proxy_name = Entity.__name__.lower()
+    copy_rows(
+        Entity,
+        ENTITY_COPY_FIELDS,
+        (
+            (
+                proxy_name,
+                display_txt,
+                time_add,
+                id_entity_persistent,
+                contribution.id_persistent,
+                False,
+            )
+            for display_txt, id_entity_persistent in zip(
+                display_txt_list, id_entity_persistent_list
+            )
+        ),
+    )
+    for tag_definition, values in values_by_tag_definition:
+        copy_rows(
+            TagInstanceHistory,
+            TAG_INSTANCE_COPY_FIELDS,
+            (
+                (
+                    str(uuid4()),
+                    id_entity_persistent,
+                    tag_definition.id_persistent,
+                    value,
+                    time_add,
+                )
+                for id_entity_persistent, value in zip(
+                    id_entity_persistent_list.loc[values.index], values
+                )
+            ),
+        )
+    return len(data_frame)
 
 
 def ingest_values_from_csv(id_contribution_persistent):
@@ -118,39 +220,26 @@ def ingest_values_from_csv(id_contribution_persistent):
                     tag_definition_pairs.append(
                         (tag_definition_origin, tag_definition_destination)
                     )
-            display_txt_extractor = mk_display_txt_extractor(display_txt_idx)
-            data_frame = read_csv_of_candidate(contribution)
-            for row_tpl in data_frame.itertuples(index=False):
-                display_txt = display_txt_extractor(row_tpl)
-                if is_row_empty(
-                    display_txt,
-                    row_tpl,
-                    column_assignments,  # pylint: disable = undefined-loop-variable
-                ):
-                    continue
-                id_entity_persistent = str(uuid4())
-                entity, _ = Entity.change_or_create(
-                    id_persistent=id_entity_persistent,
-                    time_edit=time_add,
-                    display_txt=display_txt,
-                    version=None,
-                    contribution_candidate=contribution,
+            time_start = perf_counter()
+            row_count = 0
+            for data_frame in read_csv_of_candidate(
+                contribution, chunksize=INGEST_BATCH_SIZE
+            ):
+                row_count += ingest_batch(
+                    data_frame,
+                    contribution,
+                    display_txt_idx,
+                    column_assignments,
+                    time_add,
                 )
-                entity.save()
-                for idx_in_file, tag_definition in column_assignments:
-                    id_tag_instance_persistent = str(uuid4())
-                    value = str(row_tpl[int(idx_in_file)])
-                    if value == "nan" or value == "" or value.isspace():
-                        continue
-                    tag_instance, _ = TagInstanceHistory.change_or_create(
-                        id_persistent=id_tag_instance_persistent,
-                        id_entity_persistent=id_entity_persistent,
-                        id_tag_definition_persistent=tag_definition.id_persistent,
-                        user=contribution.created_by,
-                        time_edit=time_add,
-                        value=value,
-                    )
-                    tag_instance.save()
+            time_ingest = perf_counter() - time_start
+            logging.info(
+                "Ingested %d rows for contribution %s in %.1f s (%.0f rows per second).",
+                row_count,
+                contribution.id_persistent,
+                time_ingest,
+                row_count / time_ingest if time_ingest > 0 else 0,
+            )
             for origin, destination in tag_definition_pairs:
                 TagMergeRequest(
                     id_persistent=uuid4(),
@@ -163,7 +252,7 @@ def ingest_values_from_csv(id_contribution_persistent):
                     disable_origin_on_merge=True,
                 ).save()
             contribution.set_state(ContributionCandidate.VALUES_EXTRACTED)
-            contribution.save()
+            contribution.save(update_fields=["state", "error_msg", "error_trace"])
     except (  # pylint: disable=broad-except
         ContributionCandidate.MissingRequiredAssignmentsException,
         Exception,
@@ -1,25 +1,70 @@
 "Utils for contribution candidate queue methods."
+from codecs import getincrementaldecoder
 from os.path import join
 
 from django.conf import settings
 from pandas import read_csv
 
+ENCODING_BLOCK_SIZE = 1 << 20
+ENCODING_SAMPLE_SIZE = 1 << 20
+FALLBACK_ENCODING = "iso-8859-1"
 
-def read_csv_of_candidate(contribution, nrows=None):
-    "Read the csv file belonging to a contribution candidate"
+
+def detect_encoding(pth, max_size=None, block_size=ENCODING_BLOCK_SIZE):
+    """Detect the encoding of a file.
+    The file is decoded block wise, such that only a single block is held in memory.
+    If max_size is set, only the first max_size bytes are decoded.
+    Returns utf-8 if the file can be decoded as utf-8 and iso-8859-1 otherwise."""
+    decoder = getincrementaldecoder("utf-8")()
+    remaining = max_size
+    with open(pth, "rb") as csv_file:
+        try:
+            while remaining is None or remaining > 0:
+                if remaining is None:
+                    block = csv_file.read(block_size)
+                else:
+                    block = csv_file.read(min(block_size, remaining))
+                    remaining -= len(block)
+                if not block:
+                    decoder.decode(b"", final=True)
+                    break
+                # A block may end within a multi byte character.
+                decoder.decode(block)
+        except UnicodeDecodeError:
+            return FALLBACK_ENCODING
+    return "utf-8"
+
+
+def read_csv_of_candidate(contribution, nrows=None, chunksize=None):
+    """Read the csv file belonging to a contribution candidate.
+    If chunksize is set, an iterator over data frames with at most chunksize rows
+    is returned instead of a single data frame.
+    When reading chunks, the encoding is detected from the whole file before reading,
+    as decoding errors of chunks would only be raised after previous chunks
+    have been processed. Otherwise it is detected from the beginning of the file."""
     pth = join(settings.CONTRIBUTION_DIRECTORY, contribution.file_name)
     if contribution.has_header:
         header_param = 0
     else:
         header_param = None
-    for encoding in ["utf-8", "iso-8859-1"]:
-        try:
-            data_frame = read_csv(
-                pth, header=header_param, nrows=nrows, dtype=str, encoding=encoding
-            )
-            return data_frame
-        except ValueError:
-            pass
-    raise Exception(  # pylint: disable=broad-exception-raised
-        "Could not decode the csv."
-    )
+    if chunksize is not None:
+        return read_csv(
+            pth,
+            header=header_param,
+            chunksize=chunksize,
+            nrows=nrows,
+            dtype=str,
+            encoding=detect_encoding(pth),
+        )
+    try:
+        return read_csv(
+            pth,
+            header=header_param,
+            nrows=nrows,
+            dtype=str,
+            encoding=detect_encoding(pth, max_size=ENCODING_SAMPLE_SIZE),
+        )
+    except UnicodeDecodeError:
+        return read_csv(
+            pth, header=header_param, nrows=nrows, dtype=str, encoding=FALLBACK_ENCODING
+        )
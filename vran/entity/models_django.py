@@ -4,10 +4,12 @@ from typing import Optional
 
 from django.contrib.postgres.indexes import GistIndex
 from django.db import models
-from django.db.models.aggregates import Max
 
 from vran.exception import DbObjectExistsException
-from vran.util.django import change_or_create_versioned
+from vran.util.django import (
+    change_or_create_versioned,
+    change_or_create_versioned_bulk,
+)
 
 
 class Entity(models.Model):
@@ -30,11 +32,13 @@ class Entity(models.Model):
         # pylint: disable=too-few-public-methods
         indexes = [
             models.Index(fields=["id_persistent"]),
-            # Possible alternative gin index with `opclasses=["gin_trgrm_ops"],
-            # Would mean faster retrieval but increased size and update time.
-            # Needs to add extension via migration.
+            # Trigram index for nearest neighbour search on display texts of
+            # entities that are candidates for duplicate matching.
             GistIndex(
                 fields=["display_txt"],
+                opclasses=["gist_trgm_ops"],
+                condition=models.Q(disabled=False, contribution_candidate=None),
+                name="vran_entity_display_trgm_gist",
             ),
         ]
 
@@ -42,23 +46,14 @@ class Entity(models.Model):
     def most_recent_by_id(cls, id_persistent):
         """Return the most recent version of an entity."""
         # pylint: disable=no-member
-        return cls.objects.filter(id_persistent=id_persistent).order_by(
-            models.F("previous_version").desc(nulls_last=True)
-        )[0]
+        return cls.objects.filter(head__id_persistent=id_persistent)[0]
 
     @classmethod
     def most_recent_queryset(cls, manager=None, include_disabled=False):
         "Return most recent versions of all_tag_instances"
         if manager is None:
             manager = cls.objects  # pylint: disable=no-member
-        most_recent = manager.filter(
-            id=models.Subquery(
-                manager.filter(id_persistent=models.OuterRef("id_persistent"))
-                .values("id_persistent")
-                .annotate(max_id=Max("id"))
-                .values("max_id")
-            )
-        )
+        most_recent = manager.filter(head__isnull=False)
         if include_disabled:
             return most_recent
         return most_recent.filter(disabled=False)
@@ -91,19 +86,35 @@ class Entity(models.Model):
         except DbObjectExistsException as exc:
             raise DbObjectExistsException(display_txt) from exc
 
+    @classmethod
+    def change_or_create_bulk(cls, changes, time_edit: datetime):
+        """Changes multiple entities in the database by adding new versions.
+        Args:
+            changes: Tuples of id_persistent, version and a dict with changed fields.
+        Note:
+            The resulting objects are not saved.
+        Returns:
+            For each change either the new object and a write flag or an exception.
+        """
+        changes = [
+            (id_persistent, version, {"time_edit": time_edit, **kwargs})
+            for id_persistent, version, kwargs in changes
+        ]
+        ret = change_or_create_versioned_bulk(cls, changes)
+        for idx, result in enumerate(ret):
+            if isinstance(result, DbObjectExistsException):
+                ret[idx] = DbObjectExistsException(changes[idx][2].get("display_txt"))
+            elif not isinstance(result, Exception):
+                # Bulk writes do not call save.
+                result[0].proxy_name = cls.__name__.lower()
+        return ret
+
     @classmethod
     def most_recent(cls, manager=None, include_disabled=False):
         "Get all most recent entities"
         if manager is None:
             manager = cls.objects  # pylint: disable=no-member
-        most_recent = manager.filter(
-            id=models.Subquery(
-                manager.filter(id_persistent=models.OuterRef("id_persistent"))
-                .values("id_persistent")
-                .annotate(max_id=Max("id"))
-                .values("max_id")
-            )
-        )
+        most_recent = manager.filter(head__isnull=False)
         if include_disabled:
             return most_recent
         return most_recent.filter(disabled=False)
@@ -139,3 +150,15 @@ class Entity(models.Model):
             or other.contribution_candidate_id
             != self.contribution_candidate_id  # pylint: disable=no-member
         )
+
+
+class EntityHead(models.Model):
+    """Model pointing to the most recent version of each entity.
+    Note:
+        The table is maintained by database triggers on the entity table.
+        Do not write to it from Django."""
+
+    id_persistent = models.TextField(primary_key=True)
+    entity = models.OneToOneField(
+        Entity, on_delete=models.DO_NOTHING, related_name="head"
+    )
@@ -67,6 +67,12 @@ def update_display_txt_cache(id_entity_persistent):
         )
 
 
+def update_display_txt_caches(id_entity_persistent_list):
+    "Set the display txt for multiple entities in the cache."
+    for id_entity_persistent in id_entity_persistent_list:
+        update_display_txt_cache(id_entity_persistent)
+
+
 def tag_def_db_to_dict(tag_definition):
     "Convert a tag definition from Django ORM to dict representation."
     if tag_definition.owner is not None:
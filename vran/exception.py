@@ -109,3 +109,10 @@ class TagDefinitionDisabledException(Exception):
 
     def __init__(self, id_persistent):
         self.id_persistent = id_persistent
+
+
+class ConflictsChangedException(Exception):
+    "Indicates that conflict resolutions reference outdated or unknown versions."
+
+    def __init__(self, ids_tag_instance_origin_version):
+        self.ids_tag_instance_origin_version = ids_tag_instance_origin_version
@@ -6,7 +6,12 @@ from django.db import DatabaseError, transaction
 from django.http import HttpRequest
 from ninja import Router, Schema
 
-from vran.exception import ApiError, ForbiddenException, NotAuthenticatedException
+from vran.exception import (
+    ApiError,
+    ConflictsChangedException,
+    ForbiddenException,
+    NotAuthenticatedException,
+)
 from vran.merge_request.entity.api import TagInstance, merge_request_step_db_to_api_map
 from vran.merge_request.models_django import TagConflictResolution
 from vran.merge_request.models_django import TagMergeRequest as MergeRequestDb
@@ -21,6 +26,8 @@ from vran.util.auth import check_user
 
 router = Router()
 
+MAX_CONFLICT_CHUNK_LIMIT = 10000
+
 
 class MergeRequest(Schema):
     # pylint: disable=too-few-public-methods
@@ -50,6 +57,40 @@ class MergeRequestConflictResponse(Schema):
     conflicts: List[MergeRequestConflict]
     updated: List[MergeRequestConflict]
     merge_request: MergeRequest
+    next_offset_conflicts: Optional[int]
+    next_offset_updated: Optional[int]
+
+
+class MergeRequestConflictSummaryResponse(Schema):
+    # pylint: disable=too-few-public-methods
+    "API model for the number of conflicts of a merge request."
+    conflict_count: int
+    resolved_count: int
+    updated_count: int
+
+
+class ConflictDecision(Schema):
+    "Decision for a single conflict in a bulk resolution request."
+    # pylint: disable=too-few-public-methods
+    id_entity_persistent: str
+    id_tag_instance_origin_version: int
+    id_tag_instance_destination_version: Optional[int]
+    replace: bool
+
+
+class BulkConflictResolutionPostRequest(Schema):
+    """Body for requests that resolve multiple merge request conflicts.
+    Either replace_all or decisions has to be given."""
+
+    # pylint: disable=too-few-public-methods
+    replace_all: Optional[bool] = None
+    decisions: Optional[List[ConflictDecision]] = None
+
+
+class BulkConflictResolutionResponse(Schema):
+    "Response for requests that resolve multiple merge request conflicts."
+    # pylint: disable=too-few-public-methods
+    resolved_count: int
 
 
 class MergeRequestResponseList(Schema):
@@ -158,8 +199,21 @@ def patch_merge_request(
         500: ApiError,
     },
 )
-def get_merge_request_conflicts(request: HttpRequest, id_merge_request_persistent):
-    "API method for getting merge request conflicts."
+def get_merge_request_conflicts(
+    request: HttpRequest,
+    id_merge_request_persistent,
+    limit: Optional[int] = None,
+    offset_conflicts: int = 0,
+    offset_updated: int = 0,
+):
+    """API method for getting merge request conflicts.
+    If limit is given, at most limit conflicts and updated conflicts are returned
+    starting at the respective offsets."""
+    # pylint: disable=too-many-return-statements
+    if limit is not None and (limit < 1 or limit > MAX_CONFLICT_CHUNK_LIMIT):
+        return 400, ApiError(
+            msg=f"Please specify limit between 1 and {MAX_CONFLICT_CHUNK_LIMIT}."
+        )
     try:
         user = check_user(request)
         merge_request = MergeRequestDb.by_id_persistent(
@@ -167,20 +221,77 @@ def get_merge_request_conflicts(request: HttpRequest, id_merge_request_persisten
         )
         resolutions = TagConflictResolution.for_merge_request_query_set(merge_request)
         recent = TagConflictResolution.only_recent(resolutions)
-        updated_query_set = TagConflictResolution.non_recent(resolutions)
-        conflict_query_set = TagInstanceDb.annotate_entity(
-            merge_request.instance_conflicts_all(True, recent)
+        updated_query_set = (
+            TagConflictResolution.non_recent(resolutions)
+            .filter(id__gte=offset_updated)
+            .order_by("id")
         )
+        conflict_query_set = (
+            TagInstanceDb.annotate_entity(
+                merge_request.instance_conflicts_all(True, recent)
+            )
+            .filter(id__gte=offset_conflicts)
+            .order_by("id")
+        )
+        if limit is not None:
+            updated_query_set = updated_query_set[:limit]
+            conflict_query_set = conflict_query_set[:limit]
+        conflicts = list(conflict_query_set)
+        updated = list(updated_query_set)
         return 200, MergeRequestConflictResponse(
             conflicts=[
-                annotated_tag_instance_db_to_api(conflict)
-                for conflict in conflict_query_set
+                annotated_tag_instance_db_to_api(conflict) for conflict in conflicts
             ],
             updated=[
-                conflict_with_updated_data_db_to_api(updated)
-                for updated in updated_query_set
+                conflict_with_updated_data_db_to_api(updated_conflict)
+                for updated_conflict in updated
             ],
             merge_request=merge_request_db_to_api(merge_request),
+            next_offset_conflicts=next_offset(conflicts, limit),
+            next_offset_updated=next_offset(updated, limit),
+        )
+    except MergeRequestDb.DoesNotExist:  # pylint: disable=no-member
+        return 404, ApiError(msg="Merge request does not exist.")
+    except NotAuthenticatedException:
+        return 401, ApiError(msg="Not authenticated.")
+    except ForbiddenException:
+        return 403, ApiError(msg="Insufficient permissions")
+    except DatabaseError:
+        return 500, ApiError(
+            msg="Could not get the merge request conflicts from the database."
+        )
+    except Exception:  # pylint: disable=broad-except
+        return 500, ApiError(msg="Could not get the requested merge request conflicts.")
+
+
+@router.get(
+    "/{id_merge_request_persistent}/conflicts/summary",
+    response={
+        200: MergeRequestConflictSummaryResponse,
+        401: ApiError,
+        403: ApiError,
+        404: ApiError,
+        500: ApiError,
+    },
+)
+def get_merge_request_conflict_summary(
+    request: HttpRequest, id_merge_request_persistent
+):
+    "API method for getting the number of conflicts of a merge request."
+    try:
+        user = check_user(request)
+        merge_request = MergeRequestDb.by_id_persistent(
+            id_merge_request_persistent, user
+        )
+        resolutions = TagConflictResolution.for_merge_request_query_set(merge_request)
+        recent = TagConflictResolution.only_recent(resolutions)
+        conflict_query_set = merge_request.instance_conflicts_all(True, recent)
+        return 200, MergeRequestConflictSummaryResponse(
+            conflict_count=conflict_query_set.count(),
+            resolved_count=conflict_query_set.filter(
+                conflict_resolution_replace__isnull=False
+            ).count(),
+            updated_count=TagConflictResolution.non_recent(resolutions).count(),
         )
     except MergeRequestDb.DoesNotExist:  # pylint: disable=no-member
         return 404, ApiError(msg="Merge request does not exist.")
@@ -254,6 +365,67 @@ def post_resolve_conflict(
         return 500, ApiError(msg="Could not get the requested merge request conflicts.")
 
 
+@router.post(
+    "/{id_merge_request_persistent}/resolve/bulk",
+    response={
+        200: BulkConflictResolutionResponse,
+        400: ApiError,
+        401: ApiError,
+        403: ApiError,
+        404: ApiError,
+        500: ApiError,
+    },
+)
+def post_resolve_conflicts_bulk(
+    request: HttpRequest,
+    id_merge_request_persistent: str,
+    resolution_info: BulkConflictResolutionPostRequest,
+):
+    "API method for resolving multiple merge conflicts at once."
+    # pylint: disable=too-many-return-statements
+    if (resolution_info.replace_all is None) == (resolution_info.decisions is None):
+        return 400, ApiError(
+            msg="Please specify either replace_all or a list of decisions."
+        )
+    if resolution_info.decisions is None:
+        decisions = None
+    else:
+        decisions = [
+            (
+                decision.id_entity_persistent,
+                decision.id_tag_instance_origin_version,
+                decision.id_tag_instance_destination_version,
+                decision.replace,
+            )
+            for decision in resolution_info.decisions
+        ]
+    try:
+        user = check_user(request)
+        merge_request = MergeRequestDb.by_id_persistent(
+            id_merge_request_persistent, user
+        )
+        resolved_count = merge_request.resolve_conflicts_bulk(
+            resolution_info.replace_all, decisions
+        )
+        return 200, BulkConflictResolutionResponse(resolved_count=resolved_count)
+    except MergeRequestDb.DoesNotExist:  # pylint: disable=no-member
+        return 404, ApiError(msg="Merge request does not exists.")
+    except NotAuthenticatedException:
+        return 401, ApiError(msg="Not authenticated.")
+    except ForbiddenException:
+        return 403, ApiError(msg="Insufficient permissions")
+    except ConflictsChangedException:
+        return 400, ApiError(
+            msg="Some conflicts have changed. Please reload the conflicts."
+        )
+    except DatabaseError:
+        return 500, ApiError(
+            msg="Could not store the conflict resolutions in the database."
+        )
+    except Exception:  # pylint: disable=broad-except
+        return 500, ApiError(msg="Could not resolve the merge request conflicts.")
+
+
 @router.post(
     "/{id_merge_request_persistent}/merge",
     response={
@@ -290,7 +462,7 @@ def post_merge_request_merge(  # pylint: disable=too-many-return-statements
                 merge_request
             )
             updated = TagConflictResolution.non_recent(resolutions)
-            if len(updated) > 0:
+            if updated.exists():
                 return 400, ApiError(
                     msg="There are conflicts for the merge request, "
                     "where the underlying data has changed."
@@ -298,7 +470,7 @@ def post_merge_request_merge(  # pylint: disable=too-many-return-statements
             conflicts = merge_request.instance_conflicts_all(
                 include_resolved=False, resolution_values=resolutions
             )
-            if len(conflicts) > 0:
+            if conflicts.exists():
                 return 400, ApiError(
                     msg="There are unresolved conflicts for the merge request."
                 )
@@ -359,6 +531,14 @@ def annotated_tag_instance_db_to_api(annotated_instance):
     )
 
 
+def next_offset(rows, limit):
+    """Compute the offset of the next chunk of rows ordered by id.
+    Returns None if there are no more rows."""
+    if limit is None or len(rows) < limit:
+        return None
+    return rows[-1].id + 1
+
+
 def conflict_with_updated_data_db_to_api(annotated_conflict):
     "Transform an annotated conflict from DB to API representation."
     entity = annotated_conflict.entity_most_recent
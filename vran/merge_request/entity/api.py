@@ -1,5 +1,5 @@
 "API methods for entity merge requests"
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from uuid import uuid4
 
 from django.db import DatabaseError, transaction
@@ -12,10 +12,17 @@ from vran.exception import ApiError, ForbiddenException, NotAuthenticatedExcepti
 from vran.merge_request.entity.models_django import (
     EntityConflictResolution as EntityConflictResolutionDb,
 )
+from vran.merge_request.entity.models_django import (
+    EntityDuplicateCandidate as EntityDuplicateCandidateDb,
+)
 from vran.merge_request.entity.models_django import (
     EntityMergeRequest as EntityMergeRequestDb,
 )
-from vran.merge_request.entity.queue import apply_entity_merge_request
+from vran.merge_request.entity.queue import (
+    apply_entity_merge_request,
+    deduplicate_entities,
+    detect_entity_duplicates,
+)
 from vran.person.api import PersonNatural, person_db_to_api
 from vran.tag.models_django import TagDefinition as TagDefinitionDb
 from vran.tag.queue import get_tag_definition_name_path_from_parts
@@ -96,6 +103,35 @@ class EntityConflictResolutionPostRequest(Schema):
     replace: bool
 
 
+class EntityDeduplicationPostRequest(Schema):
+    "Body for requests that merge clusters of duplicate entities."
+    # pylint: disable=too-few-public-methods
+    pairs: List[Tuple[str, str]] = []
+
+
+class EntityDeduplicationPostResponse(Schema):
+    "API model for the job merging clusters of duplicate entities."
+    # pylint: disable=too-few-public-methods
+    id_job: str
+
+
+class EntityDuplicateCandidate(Schema):
+    "API model for scored pairs of existing entities that are likely duplicates."
+    # pylint: disable=too-few-public-methods
+    origin: PersonNatural
+    destination: PersonNatural
+    levenshtein_similarity: float
+    equal_instance_count: int
+    total_instance_count: int
+    score: float
+
+
+class EntityDuplicateCandidateList(Schema):
+    "API model for multiple entity duplicate candidates"
+    # pylint: disable=too-few-public-methods
+    duplicate_candidates: List[EntityDuplicateCandidate]
+
+
 @router.get(
     "/{id_merge_request_persistent}/conflicts",
     response={
@@ -407,6 +443,96 @@ merge_request_step_db_to_api_map = {
 }
 
 
+@router.post(
+    "deduplicate",
+    response={
+        200: EntityDeduplicationPostResponse,
+        400: ApiError,
+        401: ApiError,
+        403: ApiError,
+        500: ApiError,
+    },
+)
+def post_deduplicate(request: HttpRequest, body: EntityDeduplicationPostRequest):
+    "API method for starting a job, that merges clusters of duplicate entities."
+    try:
+        user = check_user(request)
+    except NotAuthenticatedException:
+        return 401, ApiError(msg="Not authenticated.")
+    if user.permission_group not in [VranUserDb.EDITOR, VranUserDb.COMMISSIONER]:
+        return 403, ApiError(msg="Insufficient permissions.")
+    try:
+        if not body.pairs:
+            return 400, ApiError(msg="No duplicate pairs given.")
+        job = enqueue(deduplicate_entities, list(body.pairs), str(user.id_persistent))
+        return 200, EntityDeduplicationPostResponse(id_job=job.id)
+    except Exception:  # pylint: disable=broad-except
+        return 500, ApiError(msg="Could not start the deduplication of entities.")
+
+
+@router.post(
+    "duplicate_candidates",
+    response={200: None, 401: ApiError, 403: ApiError, 500: ApiError},
+)
+def post_detect_duplicates(request: HttpRequest):
+    "API method for starting the detection of duplicates among existing entities."
+    try:
+        user = check_user(request)
+    except NotAuthenticatedException:
+        return 401, ApiError(msg="Not authenticated.")
+    if user.permission_group not in [VranUserDb.EDITOR, VranUserDb.COMMISSIONER]:
+        return 403, ApiError(msg="Insufficient permissions.")
+    try:
+        enqueue(detect_entity_duplicates)
+        return 200, None
+    except Exception:  # pylint: disable=broad-except
+        return 500, ApiError(msg="Could not start the detection of duplicates.")
+
+
+@router.get(
+    "duplicate_candidates",
+    response={
+        200: EntityDuplicateCandidateList,
+        401: ApiError,
+        403: ApiError,
+        500: ApiError,
+    },
+)
+def get_duplicate_candidates(request: HttpRequest, offset: int = 0, limit: int = 100):
+    "API method for retrieving duplicate candidates ordered by descending score."
+    try:
+        user = check_user(request)
+    except NotAuthenticatedException:
+        return 401, ApiError(msg="Not authenticated.")
+    if user.permission_group not in [VranUserDb.EDITOR, VranUserDb.COMMISSIONER]:
+        return 403, ApiError(msg="Insufficient permissions.")
+    try:
+        candidates = list(
+            EntityDuplicateCandidateDb.ranked_query_set()[offset : offset + limit]
+        )
+        entities = EntityDb.objects.in_bulk(  # pylint: disable=no-member
+            [candidate.entity_origin_version for candidate in candidates]
+            + [candidate.entity_destination_version for candidate in candidates]
+        )
+        return 200, EntityDuplicateCandidateList(
+            duplicate_candidates=[
+                EntityDuplicateCandidate(
+                    origin=person_db_to_api(entities[candidate.entity_origin_version]),
+                    destination=person_db_to_api(
+                        entities[candidate.entity_destination_version]
+                    ),
+                    levenshtein_similarity=candidate.levenshtein_similarity,
+                    equal_instance_count=candidate.equal_instance_count,
+                    total_instance_count=candidate.total_instance_count,
+                    score=candidate.score,
+                )
+                for candidate in candidates
+            ]
+        )
+    except Exception:  # pylint: disable=broad-except
+        return 500, ApiError(msg="Could not get duplicate candidates.")
+
+
 @router.get(
     "all",
     response={
@@ -0,0 +1,210 @@
+"Methods for finding duplicates among existing entities."
+from django.db import connection
+
+from vran.contribution.entity.match_entities import (
+    DISPLAY_TXT_SIMILARITY_WEIGHT,
+    MATCH_CANDIDATE_COUNT,
+    MATCH_COUNT_WEIGHT,
+)
+
+# Number of best scored candidates stored per entity.
+DUPLICATE_CANDIDATE_RANK_LIMIT = 5
+DISPLAY_TXT_SIMILARITY_THRESHOLD = 0.7
+
+
+def find_duplicate_candidates(
+    id_entity_persistent_list, id_tag_definition_curated_list
+):
+    """Score candidate duplicates for a batch of existing entities and store them.
+    Candidates are the nearest entities by display text and entities with equal values
+    for curated tag definitions. The pairs are scored like matches for contributions.
+    Returns:
+        The number of written pairs."""
+    if not id_entity_persistent_list:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            DUPLICATE_CANDIDATES_QUERY_STRING,
+            {
+                "id_entity_persistent_list": id_entity_persistent_list,
+                "id_tag_definition_curated_list": id_tag_definition_curated_list,
+                "display_txt_similarity_weight": DISPLAY_TXT_SIMILARITY_WEIGHT,
+                "match_count_weight": MATCH_COUNT_WEIGHT,
+                "display_txt_similarity_threshold": DISPLAY_TXT_SIMILARITY_THRESHOLD,
+                "candidate_count": MATCH_CANDIDATE_COUNT,
+                "rank_limit": DUPLICATE_CANDIDATE_RANK_LIMIT,
+            },
+        )
+        return cursor.rowcount
+
+
+DUPLICATE_CANDIDATES_QUERY_STRING = """
+        with "entity_batch" as (
+            select "vran_entity"."id", "vran_entity"."id_persistent", "vran_entity"."display_txt"
+            from vran_entity
+            inner join vran_entityhead
+            on "vran_entityhead"."entity_id" = "vran_entity"."id"
+            where not "vran_entity"."disabled"
+                and "vran_entity"."contribution_candidate_id" is null
+                and "vran_entity"."id_persistent" = any(%(id_entity_persistent_list)s)
+        ),
+        "candidates_display_txt" as (
+            -- Uses the trigram index for retrieving the nearest existing entities.
+            select "entity_batch"."id_persistent", "existing"."id_persistent" "candidate_id_persistent"
+            from entity_batch
+            cross join lateral (
+                select "vran_entity"."id_persistent"
+                from vran_entity
+                inner join vran_entityhead
+                on "vran_entityhead"."entity_id" = "vran_entity"."id"
+                where not "vran_entity"."disabled"
+                    and "vran_entity"."contribution_candidate_id" is null
+                    and "vran_entity"."id_persistent" <> "entity_batch"."id_persistent"
+                order by "vran_entity"."display_txt" <-> "entity_batch"."display_txt"
+                limit %(candidate_count)s
+            ) existing
+        ),
+        "candidates_tag_value" as (
+            select "entity_batch"."id_persistent", "existing"."id_entity_persistent" "candidate_id_persistent"
+            from entity_batch
+            inner join vran_taginstance
+            on "vran_taginstance"."id_entity_persistent" = "entity_batch"."id_persistent"
+                and "vran_taginstance"."id_tag_definition_persistent"
+                    = any(%(id_tag_definition_curated_list)s)
+            cross join lateral (
+                -- Limit the candidates of frequent values.
+                select "instance_existing"."id_entity_persistent"
+                from vran_taginstance "instance_existing"
+                where "instance_existing"."id_tag_definition_persistent"
+                        = "vran_taginstance"."id_tag_definition_persistent"
+                    -- Uses the value hash index.
+                    and md5(lower(trim("instance_existing"."value")))
+                        = md5(lower(trim("vran_taginstance"."value")))
+                    and lower(trim("instance_existing"."value"))
+                        = lower(trim("vran_taginstance"."value"))
+                    and "instance_existing"."id_entity_persistent"
+                        <> "entity_batch"."id_persistent"
+                limit %(candidate_count)s
+            ) existing
+        ),
+        "entity_pairs" as (
+            select "entity_batch"."id" "entity_id"
+                , "entity_batch"."id_persistent"
+                , "entity_batch"."display_txt"
+                , "candidate"."id" "candidate_id"
+                , "candidate"."id_persistent" "candidate_id_persistent"
+                , "candidate"."display_txt" "candidate_display_txt"
+            from (
+                select * from candidates_display_txt
+                union
+                select * from candidates_tag_value
+            ) candidates
+            inner join entity_batch
+            on "candidates"."id_persistent" = "entity_batch"."id_persistent"
+            inner join vran_entityhead "candidate_head"
+            on "candidates"."candidate_id_persistent" = "candidate_head"."id_persistent"
+            inner join vran_entity "candidate"
+            on "candidate_head"."entity_id" = "candidate"."id"
+            where not "candidate"."disabled"
+                and "candidate"."contribution_candidate_id" is null
+        ),
+        "with_levenshtein" as (
+            select *
+                , (
+                    case when SIMILARITY("candidate_display_txt", "display_txt") > 0.3 then
+                        (1-levenshtein_less_equal(
+                            "candidate_display_txt",
+                            "display_txt",
+                            ceiling(0.25*length("display_txt"))::int)::float/length("display_txt"))
+                    else 0.0
+                    end) "levenshtein_similarity"
+            from entity_pairs
+        ),
+        "with_match_count" as (
+            select "entity_pairs"."id_persistent"
+                , "entity_pairs"."candidate_id_persistent"
+                , count(*) filter (
+                    where lower(trim("instance"."value"))
+                        = lower(trim("instance_candidate"."value"))
+                ) "equal_instance_count"
+                , count(*) "total_instance_count"
+            from entity_pairs
+            inner join vran_taginstance "instance"
+            on "instance"."id_entity_persistent" = "entity_pairs"."id_persistent"
+                and "instance"."id_tag_definition_persistent"
+                    = any(%(id_tag_definition_curated_list)s)
+            inner join vran_taginstance "instance_candidate"
+            on "instance_candidate"."id_entity_persistent"
+                    = "entity_pairs"."candidate_id_persistent"
+                and "instance_candidate"."id_tag_definition_persistent"
+                    = "instance"."id_tag_definition_persistent"
+            group by "entity_pairs"."id_persistent", "entity_pairs"."candidate_id_persistent"
+        ),
+        "scored" as (
+            select *
+                , row_number() over (
+                    partition by "id_persistent" order by "score" desc
+                ) "match_rank"
+            from (
+                select "with_levenshtein".*
+                    , coalesce("equal_instance_count", 0) "equal_instance_count"
+                    , coalesce("total_instance_count", 0) "total_instance_count"
+                    , %(display_txt_similarity_weight)s*"levenshtein_similarity" + %(match_count_weight)s*(
+                        case when "total_instance_count" > 0
+                            then "equal_instance_count"::float/"total_instance_count"::float
+                            else 0.0 end
+                    ) "score"
+                    -- The entity created first is the destination.
+                    , (
+                        select min("id") from vran_entity "versions"
+                        where "versions"."id_persistent" = "with_levenshtein"."id_persistent"
+                    ) > (
+                        select min("id") from vran_entity "versions"
+                        where "versions"."id_persistent"
+                            = "with_levenshtein"."candidate_id_persistent"
+                    ) "is_newer"
+                from with_levenshtein
+                left join with_match_count
+                using ("id_persistent", "candidate_id_persistent")
+            ) with_score
+            where "equal_instance_count" > 0
+                or "levenshtein_similarity" > %(display_txt_similarity_threshold)s
+        )
+        insert into vran_entityduplicatecandidate (
+            id_origin_persistent
+            , id_destination_persistent
+            , entity_origin_version
+            , entity_destination_version
+            , levenshtein_similarity
+            , equal_instance_count
+            , total_instance_count
+            , score
+        )
+        select distinct on ("id_origin_persistent", "id_destination_persistent") *
+        from (
+            select
+                case when "is_newer" then "id_persistent"
+                    else "candidate_id_persistent" end "id_origin_persistent"
+                , case when "is_newer" then "candidate_id_persistent"
+                    else "id_persistent" end "id_destination_persistent"
+                , case when "is_newer" then "entity_id"
+                    else "candidate_id" end "entity_origin_version"
+                , case when "is_newer" then "candidate_id"
+                    else "entity_id" end "entity_destination_version"
+                , "levenshtein_similarity"
+                , "equal_instance_count"
+                , "total_instance_count"
+                , "score"
+            from scored
+            where "match_rank" <= %(rank_limit)s
+        ) pairs
+        order by "id_origin_persistent", "id_destination_persistent", "score" desc
+        on conflict ("id_origin_persistent", "id_destination_persistent") do update
+            set entity_origin_version = excluded.entity_origin_version
+                , entity_destination_version = excluded.entity_destination_version
+                , levenshtein_similarity = excluded.levenshtein_similarity
+                , equal_instance_count = excluded.equal_instance_count
+                , total_instance_count = excluded.total_instance_count
+                , score = excluded.score
+            where vran_entityduplicatecandidate.score < excluded.score
+        """
@@ -4,8 +4,9 @@ from __future__ import annotations
 from typing import Optional
 
 from django.db import models
+from django.db.models.expressions import RawSQL
 
-from vran.entity.models_django import Entity
+from vran.entity.models_django import Entity, EntityHead
 from vran.exception import ForbiddenException
 from vran.tag.models_django import (
     TagDefinition,
@@ -94,11 +95,42 @@ class AbstractConflictResolution(models.Model):
     )
     replace = models.BooleanField()
 
+    # Query marking each resolution as recent, i.e. all referenced objects are up to date,
+    # and whether the most recent origin and destination values are equal.
+    # Has to select id, recent and same_value for the ids given by the ids placeholder.
+    STALENESS_QUERY_STRING = None
+
     class Meta:
         # pylint: disable=too-few-public-methods
         "Meta class for abstract merge request django model"
         abstract = True
 
+    @classmethod
+    def staleness_query(cls, manager, condition):
+        """Get a query for the ids of resolutions in manager that fulfill a condition
+        on the columns of the staleness query."""
+        ids_sql, ids_params = manager.all().values("id").query.sql_with_params()
+        return RawSQL(
+            "select id from ("
+            + cls.STALENESS_QUERY_STRING.format(ids=ids_sql)
+            + ") staleness where "
+            + condition,
+            ids_params,
+        )
+
+    @classmethod
+    def filter_recent(cls, manager):
+        "Filter conflict resolutions that reference only up to date objects."
+        return manager.filter(id__in=cls.staleness_query(manager, "recent"))
+
+    @classmethod
+    def filter_non_recent(cls, manager):
+        """Filter conflict resolutions that reference outdated objects
+        and still conflict."""
+        return manager.filter(
+            id__in=cls.staleness_query(manager, "not recent and not same_value")
+        )
+
 
 class EntityMergeRequest(AbstractMergeRequest):
     "Django model for entity merge requests."
@@ -256,6 +288,66 @@ class EntityConflictResolution(AbstractConflictResolution):
         TagDefinitionHistory, on_delete=models.CASCADE, related_name="+"
     )
 
+    STALENESS_QUERY_STRING = """
+        select resolution.id
+            , coalesce(
+                tag_definition_recent.id = resolution.tag_definition_id
+                and entity_origin_head.entity_id = resolution.entity_origin_id
+                and entity_destination_head.entity_id = resolution.entity_destination_id
+                and tag_instance_origin_recent.id = resolution.tag_instance_origin_id,
+                false
+            )
+            and case
+                when resolution.tag_instance_destination_id is null
+                then tag_instance_destination_new.id is null
+                else coalesce(
+                    tag_instance_destination_recent.id
+                        = resolution.tag_instance_destination_id,
+                    false
+                )
+            end recent
+            , coalesce(
+                tag_instance_origin_recent.value = coalesce(
+                    tag_instance_destination_recent.value,
+                    tag_instance_destination_new.value
+                ),
+                false
+            ) same_value
+        from vran_entityconflictresolution resolution
+        join vran_entitymergerequest merge_request
+            on merge_request.id_persistent = resolution.merge_request_id
+        join vran_entity entity_origin on entity_origin.id = resolution.entity_origin_id
+        left join vran_entityhead entity_origin_head
+            on entity_origin_head.id_persistent = entity_origin.id_persistent
+        join vran_entity entity_destination
+            on entity_destination.id = resolution.entity_destination_id
+        left join vran_entityhead entity_destination_head
+            on entity_destination_head.id_persistent = entity_destination.id_persistent
+        join vran_tagdefinitionhistory tag_definition
+            on tag_definition.id = resolution.tag_definition_id
+        left join vran_tagdefinition tag_definition_recent
+            on tag_definition_recent.id_persistent = tag_definition.id_persistent
+        left join vran_taginstancehistory tag_instance_origin
+            on tag_instance_origin.id = resolution.tag_instance_origin_id
+        left join vran_taginstance tag_instance_origin_recent
+            on tag_instance_origin_recent.id_persistent
+                = tag_instance_origin.id_persistent
+        left join vran_taginstancehistory tag_instance_destination
+            on tag_instance_destination.id = resolution.tag_instance_destination_id
+        left join vran_taginstance tag_instance_destination_recent
+            on tag_instance_destination_recent.id_persistent
+                = tag_instance_destination.id_persistent
+        left join lateral (
+            select id, value
+            from vran_taginstance
+            where resolution.tag_instance_destination_id is null
+                and id_entity_persistent = merge_request.id_destination_persistent
+                and id_tag_definition_persistent = tag_definition.id_persistent
+            limit 1
+        ) tag_instance_destination_new on true
+        where resolution.id in ({ids})
+    """
+
     @classmethod
     def for_merge_request_query_set(cls, merge_request: EntityMergeRequest):
         "Get resolutions for a merge request."
@@ -269,7 +361,7 @@ class EntityConflictResolution(AbstractConflictResolution):
         tag definition or tag instances."""
         if manager is None:
             manager = cls.objects  # pylint: disable=no-member
-        with_version_info = manager.annotate(
+        return cls.filter_non_recent(manager).annotate(
             tag_definition_most_recent=models.Subquery(
                 TagDefinition.objects.filter(  # pylint: disable=no-member
                     id_persistent=models.OuterRef("tag_definition__id_persistent")
@@ -356,49 +448,6 @@ class EntityConflictResolution(AbstractConflictResolution):
                 ]
             ),
         )
-        non_recent_query_set = with_version_info.filter(
-            ~models.Q(
-                tag_definition__id=models.functions.Cast(
-                    models.F("tag_definition_most_recent__id"), models.BigIntegerField()
-                )
-            )
-            | ~models.Q(
-                entity_origin__id=models.functions.Cast(
-                    models.F("entity_origin_most_recent__id"),
-                    models.BigIntegerField(),
-                ),
-            )
-            | ~models.Q(
-                entity_destination__id=models.functions.Cast(
-                    models.F("entity_destination_most_recent__id"),
-                    models.BigIntegerField(),
-                ),
-            )
-            | (
-                models.Q(tag_instance_destination__isnull=False)
-                & ~models.Q(
-                    tag_instance_destination__id=models.functions.Cast(
-                        models.F("tag_instance_destination_most_recent__id"),
-                        models.BigIntegerField(),
-                    ),
-                )
-            )
-            | models.Q(
-                tag_instance_destination__isnull=True,
-                tag_instance_destination_most_recent__isnull=False,
-            )
-            | ~models.Q(
-                tag_instance_origin__id=models.functions.Cast(
-                    models.F("tag_instance_origin_most_recent__id"),
-                    models.BigIntegerField(),
-                )
-            )
-        )
-        return non_recent_query_set.exclude(
-            tag_instance_origin_most_recent__value=models.F(
-                "tag_instance_destination_most_recent__value"
-            )
-        )
 
     @classmethod
     def only_recent(cls, manager=None):
@@ -406,86 +455,68 @@ class EntityConflictResolution(AbstractConflictResolution):
         tag definition or tag instances."""
         if manager is None:
             manager = cls.objects  # pylint: disable=no-member
-        with_tag_definition_version_info = manager.annotate(
-            id_tag_definition_most_recent=TagDefinition.objects.filter(  # pylint: disable=no-member
-                id_persistent=models.OuterRef("tag_definition__id_persistent")
-            ).values(
-                "id"
-            )[
-                :1
-            ]
-        )
-        only_with_recent_tag_definitions = with_tag_definition_version_info.filter(
-            tag_definition__id=models.F("id_tag_definition_most_recent")
-        )
-        with_entity_origin_version_info = only_with_recent_tag_definitions.annotate(
-            id_entity_origin_most_recent=Entity.objects.filter(  # pylint: disable=no-member
-                id_persistent=models.OuterRef("entity_origin__id_persistent")
+        return cls.filter_recent(manager)
+
+
+class EntityDuplicateCandidate(models.Model):
+    """Django model for scored pairs of existing entities that are likely duplicates.
+    The pairs are written by a queue job and serve as suggestions for entity merge requests.
+    """
+
+    id_origin_persistent = models.TextField()
+    "The id_persistent of the more recently created entity."
+    id_destination_persistent = models.TextField()
+    "The id_persistent of the older entity."
+    entity_origin_version = models.BigIntegerField()
+    "The version of the origin entity the score was computed for."
+    entity_destination_version = models.BigIntegerField()
+    "The version of the destination entity the score was computed for."
+    levenshtein_similarity = models.FloatField()
+    equal_instance_count = models.IntegerField()
+    total_instance_count = models.IntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        "Meta class for entity duplicate candidates"
+        # pylint: disable=too-few-public-methods
+        indexes = [models.Index(fields=["-score"], name="vran_entdupcand_score_idx")]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["id_origin_persistent", "id_destination_persistent"],
+                name="vran_entityduplicatecandidate_pair_unique",
             )
-            .order_by(models.F("previous_version").desc(nulls_last=True))
-            .values("id")[:1]
-        )
-        only_with_recent_entity_origins = with_entity_origin_version_info.filter(
-            entity_origin__id=models.F("id_entity_origin_most_recent")
-        )
-        with_entity_destination_version_info = only_with_recent_entity_origins.annotate(
-            id_entity_destination_most_recent=Entity.objects.filter(  # pylint: disable=no-member
-                id_persistent=models.OuterRef("entity_destination__id_persistent")
+        ]
+
+    @classmethod
+    def ranked_query_set(cls):
+        """Get the candidates ordered by descending score.
+        Candidates are omitted if any of the entities changed since scoring
+        or if a merge request for the pair exists."""
+
+        def is_recent(id_field, version_field):
+            return models.Exists(
+                EntityHead.objects.filter(  # pylint: disable=no-member
+                    id_persistent=models.OuterRef(id_field),
+                    entity_id=models.OuterRef(version_field),
+                    entity__disabled=False,
+                )
             )
-            .order_by(models.F("previous_version").desc(nulls_last=True))
-            .values("id")[:1]
-        )
-        only_with_recent_entity_destinations = (
-            with_entity_destination_version_info.filter(
-                entity_destination__id=models.F("id_entity_destination_most_recent")
+
+        merge_requests = EntityMergeRequest.objects.filter(  # pylint: disable=no-member
+            models.Q(
+                id_origin_persistent=models.OuterRef("id_origin_persistent"),
+                id_destination_persistent=models.OuterRef("id_destination_persistent"),
             )
-        )
-        with_instance_origin_version_info = only_with_recent_entity_destinations.annotate(
-            id_tag_instance_origin_most_recent=TagInstance.objects.filter(  # pylint: disable=no-member
-                id_persistent=models.OuterRef("tag_instance_origin__id_persistent")
-            ).values(
-                "id"
-            )[
-                :1
-            ]
-        )
-        only_with_recent_instance_origin = with_instance_origin_version_info.filter(
-            tag_instance_origin__id=models.F("id_tag_instance_origin_most_recent")
-        )
-        with_instance_destination_version_info = only_with_recent_instance_origin.annotate(
-            id_tag_instance_destination_most_recent=models.Subquery(
-                TagInstance.objects.filter(  # pylint: disable=no-member
-                    models.Q(
-                        id_persistent=models.OuterRef(
-                            "tag_instance_destination__id_persistent"
-                        )
-                    )
-                    | models.Q(
-                        # case when tag_instance destination is null
-                        # therefore use entity information
-                        # and tag_definition information from merge request!
-                        id_tag_definition_persistent=models.OuterRef(
-                            "tag_definition__id_persistent"
-                        ),
-                        id_entity_persistent=models.OuterRef(
-                            "merge_request__id_destination_persistent"
-                        ),
-                    )
-                ).values("id")[:1]
+            | models.Q(
+                id_origin_persistent=models.OuterRef("id_destination_persistent"),
+                id_destination_persistent=models.OuterRef("id_origin_persistent"),
             )
         )
-        only_with_recent_instance_destination = (
-            with_instance_destination_version_info.filter(
-                models.Q(
-                    id_tag_instance_destination_most_recent__isnull=False,
-                    tag_instance_destination__id=models.F(
-                        "id_tag_instance_destination_most_recent"
-                    ),
-                )
-                | models.Q(
-                    tag_instance_destination__isnull=True,
-                    id_tag_instance_destination_most_recent__isnull=True,
-                )
+        return (
+            cls.objects.filter(  # pylint: disable=no-member
+                is_recent("id_origin_persistent", "entity_origin_version"),
+                is_recent("id_destination_persistent", "entity_destination_version"),
             )
+            .exclude(models.Exists(merge_requests))
+            .order_by("-score", "id")
         )
-        return only_with_recent_instance_destination
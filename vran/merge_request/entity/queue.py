@@ -1,29 +1,34 @@
 "Queue methods for entity merge requests"
 import logging
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Iterable, List, Set, Tuple
 from uuid import uuid4
 
-from django.db import models, transaction
+import django_rq
+from django.db import connection, models, transaction
+from rq import get_current_job
 
+from vran.contribution.entity.match_entities import curated_tag_definition_ids
 from vran.entity.models_django import Entity
-from vran.exception import (
-    EntityUpdatedException,
-    TagDefinitionExistsException,
-    TagDefinitionPermissionException,
-)
+from vran.entity.queue import update_display_txt_caches
+from vran.exception import EntityUpdatedException, TagDefinitionPermissionException
+from vran.merge_request.entity.match_entities import find_duplicate_candidates
 from vran.merge_request.entity.models_django import (
     EntityConflictResolution,
+    EntityDuplicateCandidate,
     EntityMergeRequest,
 )
 from vran.merge_request.models_django import TagMergeRequest
 from vran.tag.models_django import (
     TagDefinition,
     TagDefinitionHistory,
-    TagInstanceAbstract,
+    TagInstance,
     TagInstanceHistory,
 )
 from vran.util import VranUser, timestamp
+from vran.util.django import bulk_create_changed
+
+DUPLICATE_DETECTION_BATCH_SIZE = 200
 
 
 def apply_entity_merge_request(
@@ -49,9 +54,19 @@ def apply_entity_merge_request(
             )
             # get recent resolutions and apply them
             recent_resolutions = EntityConflictResolution.only_recent(resolutions)
-            for resolved in recent_resolutions:
-                if resolved.replace:
-                    apply_resolution(resolved, user, time_edit)
+            apply_resolutions(
+                list(
+                    recent_resolutions.filter(replace=True).select_related(
+                        "merge_request",
+                        "entity_destination",
+                        "tag_definition",
+                        "tag_instance_origin",
+                        "tag_instance_destination",
+                    )
+                ),
+                user,
+                time_edit,
+            )
             # get unresolved conflicts and create merge requests.
             unresolved_conflict_query_set = merge_request.instance_conflicts_all(
                 include_resolved=False, resolution_values=recent_resolutions
@@ -70,15 +85,19 @@ def apply_entity_merge_request(
                     )
                 )
             )
-            for unresolved in unresolved_conflict_query_set:
-                create_tag_definition_merge_request_for_unresolved_conflict(
-                    merge_request,
-                    unresolved,
-                    merge_request.id_destination_persistent,
-                    unresolved.tag_definition_dict,
-                    user,
-                    time_edit,
-                )
+            create_tag_definition_merge_requests_for_unresolved_conflicts(
+                [
+                    (
+                        merge_request,
+                        unresolved.value,
+                        merge_request.id_destination_persistent,
+                        unresolved.tag_definition_dict,
+                    )
+                    for unresolved in unresolved_conflict_query_set
+                ],
+                user,
+                time_edit,
+            )
             # disable the destination entity
             origin = Entity.most_recent_by_id(merge_request.id_origin_persistent)
             disabled, _ = Entity.change_or_create(
@@ -99,88 +118,472 @@ def apply_entity_merge_request(
         merge_request.save()
 
 
-def create_tag_definition_merge_request_for_unresolved_conflict(  # pylint: disable=too-many-arguments
-    entity_merge_request: EntityMergeRequest,
-    tag_instance_origin: TagInstanceAbstract,
-    id_entity_destination_persistent: str,
-    tag_definition_existing_dict: Dict[str, object],
-    user: VranUser,
-    time_edit: datetime,
+def tag_definition_name_prefix(entity_merge_request: EntityMergeRequest):
+    "Get the name prefix for temporary tag definitions of an entity merge request."
+    return f"from entity merge {entity_merge_request.id_persistent}_"
+
+
+def free_tag_definition_names(
+    name_requests: List[Tuple[EntityMergeRequest, str]],
 ):
-    "Create a new merge request for instances where an entity merge conflict is not resolved."
-    # Create TagDefinition Merge Request for the tag definition.
-    count = 0
-    # Create temporary i.e. disabled tag definition
-    while True:
-        try:
-            tag_definition_new, _do_write = TagDefinitionHistory.change_or_create(
-                id_persistent=uuid4(),
-                name=f"from entity merge {entity_merge_request.id_persistent}_{count}",
-                id_parent_persistent=tag_definition_existing_dict["id_persistent"],
-                type=tag_definition_existing_dict["type"],
-                time_edit=time_edit,
-                owner=user,
-                hidden=True,
+    """Find names for temporary tag definitions of entity merge requests.
+    Names are unique for each entity merge request and parent tag definition.
+    Existing names are fetched in a single query.
+    Args:
+        name_requests: Tuples of an entity merge request and the persistent id
+            of the parent tag definition.
+    Returns:
+        A name for each entry of name_requests in order."""
+    prefixes_by_length: Dict[int, Set[str]] = {}
+    for entity_merge_request, _ in name_requests:
+        prefix = tag_definition_name_prefix(entity_merge_request)
+        prefixes_by_length.setdefault(len(prefix), set()).add(prefix)
+    prefix_filter = models.Q()
+    for length, prefixes in prefixes_by_length.items():
+        prefix_filter |= models.Q(**{f"prefix_{length}__in": prefixes})
+    used: Dict[Tuple[str, str], Set[int]] = {}
+    for (
+        name,
+        id_parent_persistent,
+    ) in (
+        TagDefinition.objects.filter(  # pylint: disable=no-member
+            id_parent_persistent__in={
+                id_parent_persistent for _, id_parent_persistent in name_requests
+            },
+        )
+        .alias(
+            **{
+                f"prefix_{length}": models.functions.Left("name", length)
+                for length in prefixes_by_length
+            }
+        )
+        .filter(prefix_filter)
+        .values_list("name", "id_parent_persistent")
+    ):
+        prefix, _, suffix = name.rpartition("_")
+        if suffix.isdigit():
+            used.setdefault((prefix + "_", id_parent_persistent), set()).add(
+                int(suffix)
             )
-            tag_definition_new.save()
-            break
-        except TagDefinitionExistsException:
+    names = []
+    for entity_merge_request, id_parent_persistent in name_requests:
+        prefix = tag_definition_name_prefix(entity_merge_request)
+        used_for_parent = used.setdefault((prefix, id_parent_persistent), set())
+        count = 0
+        while count in used_for_parent:
             count += 1
-        # Create Tag Instance for that tag definition
-    tag_instance, _ = TagInstanceHistory.change_or_create(
-        id_persistent=uuid4(),
-        id_tag_definition_persistent=tag_definition_new.id_persistent,
-        id_entity_persistent=id_entity_destination_persistent,
-        value=tag_instance_origin.value,
-        time_edit=time_edit,
-        user=user,
-    )
-    tag_instance.save()
-    # Create tag definition merge request.
-    TagMergeRequest.objects.create(  # pylint: disable=no-member
-        id_origin_persistent=tag_definition_new.id_persistent,
-        id_destination_persistent=tag_definition_existing_dict["id_persistent"],
-        assigned_to_id=tag_definition_existing_dict["owner_id"],
-        created_by=user,
-        state=TagMergeRequest.OPEN,
-        created_at=time_edit,
-        id_persistent=uuid4(),
-        disable_origin_on_merge=True,
-    )
+        used_for_parent.add(count)
+        names.append(f"{prefix}{count}")
+    return names
 
 
-def apply_resolution(
-    resolution: EntityConflictResolution,
+def create_tag_definition_merge_requests_for_unresolved_conflicts(
+    unresolved_conflicts: List[Tuple[EntityMergeRequest, str, str, Dict[str, object]]],
     user: VranUser,
     time_edit: datetime,
 ):
-    "Apply a entity merge request conflict resolution"
-    if not resolution.replace:
+    """Create new merge requests for instances where an entity merge conflict is not resolved.
+    Args:
+        unresolved_conflicts: Tuples of the entity merge request,
+            the value of the origin tag instance, the persistent id of the destination
+            entity and a dict describing the existing tag definition.
+    Note:
+        Tag definitions, tag instances and merge requests are written in bulk."""
+    if not unresolved_conflicts:
         return
-    tag_instance_destination = resolution.tag_instance_destination
-    if tag_instance_destination is None:
-        id_destination_persistent = uuid4()
-        version = None
-    else:
-        id_destination_persistent = tag_instance_destination.id_persistent
-        version = tag_instance_destination.id
-    try:
-        instance, _do_write = TagInstanceHistory.change_or_create(
-            id_persistent=id_destination_persistent,
-            version=version,
-            id_entity_persistent=resolution.entity_destination.id_persistent,
-            id_tag_definition_persistent=resolution.tag_definition.id_persistent,
+    names = free_tag_definition_names(
+        [
+            (entity_merge_request, tag_definition_existing_dict["id_persistent"])
+            for entity_merge_request, _, _, tag_definition_existing_dict in unresolved_conflicts
+        ],
+    )
+    tag_definitions = []
+    tag_instances = []
+    merge_requests = []
+    for name, (
+        _,
+        value,
+        id_entity_destination_persistent,
+        tag_definition_existing_dict,
+    ) in zip(names, unresolved_conflicts):
+        # Create temporary i.e. hidden tag definition
+        tag_definition_new = TagDefinitionHistory(
+            id_persistent=str(uuid4()),
+            name=name,
+            id_parent_persistent=tag_definition_existing_dict["id_persistent"],
+            type=tag_definition_existing_dict["type"],
             time_edit=time_edit,
-            user=user,
-            value=resolution.tag_instance_origin.value,
+            owner=user,
+            hidden=True,
+        )
+        tag_definitions.append(tag_definition_new)
+        # Create Tag Instance for that tag definition.
+        # The value has already been checked for the type of the existing definition.
+        tag_instances.append(
+            TagInstanceHistory(
+                id_persistent=str(uuid4()),
+                id_tag_definition_persistent=tag_definition_new.id_persistent,
+                id_entity_persistent=id_entity_destination_persistent,
+                value=value,
+                time_edit=time_edit,
+            )
+        )
+        # Create tag definition merge request.
+        merge_requests.append(
+            TagMergeRequest(
+                id_origin_persistent=tag_definition_new.id_persistent,
+                id_destination_persistent=tag_definition_existing_dict["id_persistent"],
+                assigned_to_id=tag_definition_existing_dict["owner_id"],
+                created_by=user,
+                state=TagMergeRequest.OPEN,
+                created_at=time_edit,
+                id_persistent=uuid4(),
+                disable_origin_on_merge=True,
+            )
+        )
+    # pylint: disable=no-member
+    TagDefinitionHistory.objects.bulk_create(tag_definitions)
+    TagInstanceHistory.objects.bulk_create(tag_instances)
+    TagMergeRequest.objects.bulk_create(merge_requests)
+
+
+def apply_resolutions(
+    resolutions: List[EntityConflictResolution],
+    user: VranUser,
+    time_edit: datetime,
+):
+    """Apply entity merge request conflict resolutions.
+    Tag instances are written in bulk. Resolutions that can not be applied
+    because of changed data or missing permissions result in tag merge requests."""
+    resolutions = [resolution for resolution in resolutions if resolution.replace]
+    changes = []
+    for resolution in resolutions:
+        tag_instance_destination = resolution.tag_instance_destination
+        if tag_instance_destination is None:
+            id_destination_persistent = str(uuid4())
+            version = None
+        else:
+            id_destination_persistent = tag_instance_destination.id_persistent
+            version = tag_instance_destination.id
+        changes.append(
+            (
+                id_destination_persistent,
+                version,
+                resolution.entity_destination.id_persistent,
+                resolution.tag_definition.id_persistent,
+                resolution.tag_instance_origin.value,
+            )
+        )
+    results = TagInstanceHistory.change_or_create_bulk(changes, user, time_edit)
+    unresolved_conflicts = []
+    for resolution, result in zip(resolutions, results):
+        if isinstance(
+            result, (EntityUpdatedException, TagDefinitionPermissionException)
+        ):
+            unresolved_conflicts.append(
+                (
+                    resolution.merge_request,
+                    resolution.tag_instance_origin.value,
+                    resolution.entity_destination.id_persistent,
+                    {
+                        "id_persistent": resolution.tag_definition.id_persistent,
+                        "type": resolution.tag_definition.type,
+                        "owner_id": resolution.tag_definition.owner_id,
+                    },
+                )
+            )
+        elif isinstance(result, Exception):
+            raise result
+    bulk_create_changed(TagInstanceHistory, results)
+    create_tag_definition_merge_requests_for_unresolved_conflicts(
+        unresolved_conflicts, user, time_edit
+    )
+
+
+def duplicate_clusters(pairs: Iterable[Tuple[str, str]]) -> List[List[str]]:
+    """Compute the connected components of duplicate pairs with union-find.
+    Returns:
+        The clusters with at least two entities as lists of id_persistent values."""
+    parents: Dict[str, str] = {}
+
+    def find(id_persistent):
+        parents.setdefault(id_persistent, id_persistent)
+        while parents[id_persistent] != id_persistent:
+            # Path halving keeps the trees flat.
+            parents[id_persistent] = parents[parents[id_persistent]]
+            id_persistent = parents[id_persistent]
+        return id_persistent
+
+    for id_a_persistent, id_b_persistent in pairs:
+        root_a, root_b = find(id_a_persistent), find(id_b_persistent)
+        if root_a != root_b:
+            parents[root_b] = root_a
+    clusters: Dict[str, List[str]] = {}
+    for id_persistent in parents:
+        clusters.setdefault(find(id_persistent), []).append(id_persistent)
+    return [sorted(cluster) for cluster in clusters.values() if len(cluster) > 1]
+
+
+def cluster_survivors(clusters: List[List[str]]) -> Dict[str, str]:
+    """Pick the oldest enabled entity of each cluster as survivor.
+    Disabled or unknown entities and entities of contributions
+    are dropped from the clusters.
+    Returns:
+        A dict mapping the id_persistent of each entity to be merged
+        to the id_persistent of the survivor of its cluster."""
+    first_versions = dict(
+        Entity.objects.filter(  # pylint: disable=no-member
+            id_persistent__in=Entity.most_recent_queryset()
+            .filter(
+                id_persistent__in=[
+                    id_persistent for cluster in clusters for id_persistent in cluster
+                ],
+                contribution_candidate__isnull=True,
+            )
+            .values("id_persistent")
         )
-        instance.save()
-    except (EntityUpdatedException, TagDefinitionPermissionException):
-        create_tag_definition_merge_request_for_unresolved_conflict(
-            resolution.merge_request,
-            resolution.tag_instance_origin,
-            resolution.entity_destination.id_persistent,
-            resolution.tag_definition.__dict__,
-            user,
-            time_edit,
+        .values("id_persistent")
+        .annotate(first_version=models.Min("id"))
+        .values_list("id_persistent", "first_version")
+    )
+    survivors = {}
+    for cluster in clusters:
+        cluster = [
+            id_persistent
+            for id_persistent in cluster
+            if id_persistent in first_versions
+        ]
+        if len(cluster) < 2:
+            continue
+        survivor = min(cluster, key=first_versions.__getitem__)
+        for id_persistent in cluster:
+            if id_persistent != survivor:
+                survivors[id_persistent] = survivor
+    return survivors
+
+
+def merge_tag_instances_into_survivors(
+    merge_requests: Dict[str, EntityMergeRequest], user: VranUser, time_edit: datetime
+):
+    """Merge the tag instances of merged entities into the survivors.
+    Instances are moved in a single statement, if the survivor has no value for
+    the tag definition and the user has write access to the tag definition.
+    Values already present for the survivor are skipped.
+    All other values result in tag merge requests, which are written in bulk.
+    Args:
+        merge_requests: The entity merge requests by persistent id of the merged entity.
+    Returns:
+        The id_persistent values of survivors with moved tag instances."""
+    if not merge_requests:
+        return []
+    params = {
+        "time_edit": time_edit,
+        "id_merged_list": list(merge_requests.keys()),
+        "id_survivor_list": [
+            merge_request.id_destination_persistent
+            for merge_request in merge_requests.values()
+        ],
+    }
+    tag_definitions = {
+        tag_definition.id_persistent: tag_definition
+        for tag_definition in TagDefinition.objects.filter(  # pylint: disable=no-member
+            id_persistent__in=TagInstance.objects.filter(  # pylint: disable=no-member
+                id_entity_persistent__in=params["id_merged_list"]
+            ).values("id_tag_definition_persistent"),
+            disabled=False,
+        ).select_related("owner")
+    }
+    params["id_tag_definition_list"] = list(tag_definitions.keys())
+    params["id_tag_definition_writable_list"] = [
+        id_persistent
+        for id_persistent, tag_definition in tag_definitions.items()
+        if tag_definition.has_write_access(user)
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(MOVE_TAG_INSTANCES_QUERY_STRING, params)
+        id_entity_updated_list = list({row[0] for row in cursor.fetchall()})
+        # Moved instances are not part of the conflicts anymore.
+        cursor.execute(UNMOVED_TAG_INSTANCES_QUERY_STRING, params)
+        unresolved_conflicts = [
+            (
+                merge_requests[id_merged_persistent],
+                value,
+                id_survivor_persistent,
+                {
+                    "id_persistent": id_tag_definition_persistent,
+                    "type": tag_definitions[id_tag_definition_persistent].type,
+                    "owner_id": tag_definitions[id_tag_definition_persistent].owner_id,
+                },
+            )
+            for (
+                id_merged_persistent,
+                id_survivor_persistent,
+                id_tag_definition_persistent,
+                value,
+            ) in cursor.fetchall()
+        ]
+    create_tag_definition_merge_requests_for_unresolved_conflicts(
+        unresolved_conflicts, user, time_edit
+    )
+    return id_entity_updated_list
+
+
+MOVE_TAG_INSTANCES_QUERY_STRING = """
+    insert into vran_taginstancehistory (
+        id_persistent
+        , id_entity_persistent
+        , id_tag_definition_persistent
+        , value
+        , time_edit
+        , previous_version_id
+    )
+    -- At most one value is moved for each survivor and tag definition.
+    select distinct on (survivor.id_survivor, ti.id_tag_definition_persistent)
+        ti.id_persistent
+        , survivor.id_survivor
+        , ti.id_tag_definition_persistent
+        , ti.value
+        , %(time_edit)s
+        , ti.id
+    from unnest(
+        %(id_merged_list)s::text[], %(id_survivor_list)s::text[]
+    ) survivor(id_merged, id_survivor)
+    inner join vran_taginstance ti
+    on ti.id_entity_persistent = survivor.id_merged
+        and ti.id_tag_definition_persistent
+            = any(%(id_tag_definition_writable_list)s)
+    where not exists (
+        select
+        from vran_taginstance existing
+        where existing.id_entity_persistent = survivor.id_survivor
+            and existing.id_tag_definition_persistent = ti.id_tag_definition_persistent
+    )
+    order by survivor.id_survivor, ti.id_tag_definition_persistent, ti.id
+    returning id_entity_persistent"""
+
+UNMOVED_TAG_INSTANCES_QUERY_STRING = """
+    select distinct on (
+            survivor.id_survivor
+            , ti.id_tag_definition_persistent
+            , ti.value
         )
+        survivor.id_merged
+        , survivor.id_survivor
+        , ti.id_tag_definition_persistent
+        , ti.value
+    from unnest(
+        %(id_merged_list)s::text[], %(id_survivor_list)s::text[]
+    ) survivor(id_merged, id_survivor)
+    inner join vran_taginstance ti
+    on ti.id_entity_persistent = survivor.id_merged
+        and ti.id_tag_definition_persistent = any(%(id_tag_definition_list)s)
+    where not exists (
+        select
+        from vran_taginstance existing
+        where existing.id_entity_persistent = survivor.id_survivor
+            and existing.id_tag_definition_persistent = ti.id_tag_definition_persistent
+            and existing.value is not distinct from ti.value
+    )
+    order by survivor.id_survivor
+        , ti.id_tag_definition_persistent
+        , ti.value
+        , ti.id"""
+
+
+def deduplicate_entities(pairs: List[Tuple[str, str]], id_user_persistent: str):
+    """Queue method for merging clusters of duplicate entities.
+    The pairs are grouped into clusters and all entities of a cluster
+    are merged into the oldest one in a single pass:
+    Merged entity merge requests are written for documentation,
+    tag instances are merged into the survivor and the other entities are disabled."""
+    job = get_current_job()
+    try:
+        clusters = duplicate_clusters(pairs)
+        with transaction.atomic():
+            user = VranUser.by_id_persistent_query_set(id_user_persistent).get()
+            survivors = cluster_survivors(clusters)
+            time_edit = timestamp()
+            merge_requests = {
+                id_merged_persistent: EntityMergeRequest(
+                    id_origin_persistent=id_merged_persistent,
+                    id_destination_persistent=id_survivor_persistent,
+                    created_by=user,
+                    created_at=time_edit,
+                    id_persistent=uuid4(),
+                    state=EntityMergeRequest.MERGED,
+                )
+                for id_merged_persistent, id_survivor_persistent in survivors.items()
+            }
+            EntityMergeRequest.objects.bulk_create(  # pylint: disable=no-member
+                merge_requests.values()
+            )
+            id_entity_updated_list = merge_tag_instances_into_survivors(
+                merge_requests, user, time_edit
+            )
+            disabled = Entity.change_or_create_bulk(
+                [
+                    (
+                        entity.id_persistent,
+                        entity.id,
+                        {"display_txt": entity.display_txt, "disabled": True},
+                    )
+                    for entity in Entity.most_recent_queryset().filter(
+                        id_persistent__in=survivors.keys()
+                    )
+                ],
+                time_edit,
+            )
+            for result in disabled:
+                if isinstance(result, Exception):
+                    raise result
+            bulk_create_changed(Entity, disabled)
+            if id_entity_updated_list:
+                transaction.on_commit(
+                    lambda: django_rq.enqueue(
+                        update_display_txt_caches, id_entity_updated_list
+                    )
+                )
+        if job is not None:
+            job.meta["progress"] = 1.0
+            job.meta["result"] = {
+                "clusters": len(set(survivors.values())),
+                "merged": len(survivors),
+            }
+            job.save_meta()
+        return len(survivors)
+    except Exception as exc:  # pylint: disable=broad-except
+        logging.warning(None, exc_info=exc)
+        return 0
+
+
+def detect_entity_duplicates():
+    """Queue method for finding duplicates among all existing entities.
+    Entities are processed in batches ordered by id_persistent, such that
+    memory usage does not depend on the number of entities.
+    The progress is stored as fraction of processed entities in the job meta data."""
+    job = get_current_job()
+    try:
+        id_tag_definition_curated_list = curated_tag_definition_ids()
+        EntityDuplicateCandidate.objects.all().delete()  # pylint: disable=no-member
+        entities = (
+            Entity.most_recent_queryset()
+            .filter(contribution_candidate=None)
+            .order_by("id_persistent")
+            .values_list("id_persistent", flat=True)
+        )
+        entity_count = entities.count()
+        processed_count = 0
+        batch = list(entities[:DUPLICATE_DETECTION_BATCH_SIZE])
+        while batch:
+            find_duplicate_candidates(batch, id_tag_definition_curated_list)
+            processed_count += len(batch)
+            if job is not None:
+                job.meta["progress"] = processed_count / entity_count
+                job.save_meta()
+            batch = list(
+                entities.filter(id_persistent__gt=batch[-1])[
+                    :DUPLICATE_DETECTION_BATCH_SIZE
+                ]
+            )
+    except Exception as exc:  # pylint: disable=broad-except
+        logging.warning(None, exc_info=exc)
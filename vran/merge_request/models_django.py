@@ -1,12 +1,15 @@
 "Django models for merge requests."
 from __future__ import annotations
 
-from typing import Optional
+from typing import Dict, List, Optional, Set, Tuple
+from uuid import uuid4
 
-from django.db import models
+from django.core.cache import caches
+from django.db import models, transaction
 
 from vran.contribution.models_django import ContributionCandidate
-from vran.entity.models_django import Entity
+from vran.entity.models_django import Entity, EntityHead
+from vran.exception import ConflictsChangedException
 from vran.merge_request.entity.models_django import (
     AbstractConflictResolution,
     AbstractMergeRequest,
@@ -20,6 +23,39 @@ from vran.tag.models_django import (
 from vran.util import VranUser
 from vran.util.django import get_json_array_agg
 
+tag_definition_pairs_cache = caches["default"]
+TAG_DEFINITION_PAIRS_CACHE_TIMEOUT = 60 * 60
+
+
+def tag_definition_pairs_cache_key(id_contribution_persistent, user, check_access):
+    """Key for caching the tag definition pairs of a contribution for a user.
+    The key changes when the merge requests of the contribution change."""
+    generation = tag_definition_pairs_cache.get(
+        f"tag_definition_pairs_generation_{id_contribution_persistent}", ""
+    )
+    return (
+        f"tag_definition_pairs_{id_contribution_persistent}_{generation}_"
+        f"{user.id_persistent}_{check_access}"
+    )
+
+
+def _new_tag_definition_pairs_generation(id_contribution_persistent):
+    tag_definition_pairs_cache.set(
+        f"tag_definition_pairs_generation_{id_contribution_persistent}",
+        uuid4().hex,
+        None,
+    )
+
+
+def invalidate_tag_definition_pairs_cache(id_contribution_persistent):
+    """Invalidate all cached tag definition pairs of a contribution.
+    The cache is invalidated again after the current transaction commits,
+    as pairs read before the commit may have been cached in the meantime."""
+    _new_tag_definition_pairs_generation(id_contribution_persistent)
+    transaction.on_commit(
+        lambda: _new_tag_definition_pairs_generation(id_contribution_persistent)
+    )
+
 
 class TagMergeRequest(AbstractMergeRequest):
     "Django model for a merge request."
@@ -85,9 +121,16 @@ class TagMergeRequest(AbstractMergeRequest):
     ):
         """Change the owner for all merge requests that have
         a specific tag definition as destination."""
-        cls.objects.filter(  # pylint: disable=no-member
+        merge_requests = cls.objects.filter(  # pylint: disable=no-member
             id_destination_persistent=id_tag_definition_persistent
-        ).update(assigned_to=user)
+        )
+        for id_contribution_persistent in (
+            merge_requests.filter(contribution_candidate__isnull=False)
+            .values_list("contribution_candidate_id", flat=True)
+            .distinct()
+        ):
+            invalidate_tag_definition_pairs_cache(id_contribution_persistent)
+        merge_requests.update(assigned_to=user)
 
     @classmethod
     def get_for_contribution_query_set(cls, id_contribution_persistent):
@@ -99,55 +142,93 @@ class TagMergeRequest(AbstractMergeRequest):
     @classmethod
     def get_tag_definitions_for_entities_request(
         cls,
-        id_tag_definition_persistent: str,
+        id_tag_definition_persistent_list: List[str],
         id_contribution_persistent: Optional[str],
         id_merge_request_persistent: Optional[str],
         user: VranUser,
-    ):
+    ) -> Dict[str, Set[Tuple[str, bool]]]:
         """Get the tag definitions relevant for an entities focused tag_instance request.
         returns:
-        A set of tuples. The first element is the id of the tag definition.
+        A dictionary with a set of tuples for each requested tag definition.
+        The first element of a tuple is the id of the tag definition.
         The second element indicates whether this is existing data."""
+        pairs_by_id = {}
+        for id_origin_persistent, id_destination_persistent in reversed(
+            cls.tag_definition_pairs_for_entities_request(
+                id_contribution_persistent, id_merge_request_persistent, user
+            )
+        ):
+            # There can't be a duplicate assignment.
+            # Reversed iteration ensures that the first pair is used.
+            pair = {(id_destination_persistent, True), (id_origin_persistent, False)}
+            pairs_by_id[id_origin_persistent] = pair
+            pairs_by_id[id_destination_persistent] = pair
+        return {
+            id_tag_definition_persistent: pairs_by_id.get(
+                id_tag_definition_persistent, {(id_tag_definition_persistent, True)}
+            )
+            for id_tag_definition_persistent in id_tag_definition_persistent_list
+        }
+
+    @classmethod
+    def tag_definition_pairs_for_entities_request(
+        cls,
+        id_contribution_persistent: Optional[str],
+        id_merge_request_persistent: Optional[str],
+        user: VranUser,
+    ) -> List[Tuple[str, str]]:
+        """Get pairs of origin and destination tag definitions
+        of the merge requests relevant for an entities focused tag_instance request.
+        Note:
+            Pairs for contributions are cached per contribution and user."""
         if id_contribution_persistent is None:
             if id_merge_request_persistent is None:
-                return {(id_tag_definition_persistent, True)}
+                return []
             merge_request = TagMergeRequest.by_id_persistent(
                 id_merge_request_persistent, user
             )
-            if merge_request.contribution_candidate:
-                contribution = merge_request.contribution_candidate
-            elif (
-                # pylint:disable-next=consider-using-in
-                merge_request.id_destination_persistent == id_tag_definition_persistent
-                or merge_request.id_origin_persistent == id_tag_definition_persistent
-            ):
-                return {
-                    (merge_request.id_destination_persistent, True),
-                    (merge_request.id_origin_persistent, False),
-                }
+            if merge_request.contribution_candidate_id is None:
+                return [
+                    (
+                        merge_request.id_origin_persistent,
+                        merge_request.id_destination_persistent,
+                    )
+                ]
+            id_contribution_persistent = merge_request.contribution_candidate_id
+            check_access = False
         else:
-            contribution = ContributionCandidate.by_id_persistent(
+            check_access = True
+        if check_access:
+            ContributionCandidate.by_id_persistent(
                 id_contribution_persistent, user
             ).get()
-        merge_requests_manager = contribution.tagmergerequest_set
-        for merge_request in merge_requests_manager.iterator():
-            if (
-                # pylint:disable-next=consider-using-in
-                merge_request.id_origin_persistent == id_tag_definition_persistent
-                or merge_request.id_destination_persistent
-                == id_tag_definition_persistent
-            ) and (
-                # pylint:disable-next=consider-using-in
-                merge_request.assigned_to == user
-                or merge_request.created_by == user
-            ):
-                # There can't be a duplicate assignment.
-                # Therefore it is safe to return early
-                return {
-                    (merge_request.id_destination_persistent, True),
-                    (merge_request.id_origin_persistent, False),
-                }
-        return {(id_tag_definition_persistent, True)}
+        cache_key = tag_definition_pairs_cache_key(
+            id_contribution_persistent, user, check_access
+        )
+        pairs = tag_definition_pairs_cache.get(cache_key)
+        if pairs is None:
+            pairs = list(
+                cls.objects.filter(  # pylint: disable=no-member
+                    models.Q(assigned_to=user) | models.Q(created_by=user),
+                    contribution_candidate_id=id_contribution_persistent,
+                )
+                .order_by("created_at")
+                .values_list("id_origin_persistent", "id_destination_persistent")
+            )
+            tag_definition_pairs_cache.set(
+                cache_key, pairs, TAG_DEFINITION_PAIRS_CACHE_TIMEOUT
+            )
+        return pairs
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # pylint: disable=no-member
+        if self.contribution_candidate_id is not None:
+            invalidate_tag_definition_pairs_cache(self.contribution_candidate_id)
+
+    def has_maintained_conflicts(self):
+        "Check whether the conflicts of the merge request are kept in the conflict table."
+        return self.state not in [self.CLOSED, self.MERGED]
 
     def instance_conflicts_all(
         self,
@@ -155,18 +236,21 @@ class TagMergeRequest(AbstractMergeRequest):
         resolution_values: Optional[models.BaseManager[TagConflictResolution]] = None,
     ):
         """Get conflicts to merging the origin tag referenced by the merge request
-        into the destination tag"""
-        instance_origin_recent_query = TagInstanceHistory.most_recent_queryset().filter(
-            id_tag_definition_persistent=self.id_origin_persistent
-        )
-
-        if len(instance_origin_recent_query) == 0:
-            return instance_origin_recent_query
-
-        instance_destination_recent_query = (
-            TagInstanceHistory.most_recent_queryset().filter(
-                id_tag_definition_persistent=self.id_destination_persistent
+        into the destination tag.
+        The query set is always annotated with the destination instance and resolution,
+        even if there are no conflicts."""
+        # pylint: disable=no-member
+        if self.has_maintained_conflicts():
+            instance_origin_recent_query = TagInstance.objects.filter(
+                id__in=self.conflicts.values("tag_instance_origin_id")
+            )
+        else:
+            instance_origin_recent_query = TagInstance.objects.filter(
+                id_tag_definition_persistent=self.id_origin_persistent
             )
+
+        instance_destination_recent_query = TagInstance.objects.filter(
+            id_tag_definition_persistent=self.id_destination_persistent
         )
         conflicts_sub_query = instance_destination_recent_query.filter(
             id_entity_persistent=models.OuterRef("id_entity_persistent")
@@ -205,6 +289,107 @@ class TagMergeRequest(AbstractMergeRequest):
 
         return with_conflict_info.exclude(conflict_resolution_replace__isnull=False)
 
+    def resolve_conflicts_bulk(
+        self,
+        replace_all: Optional[bool] = None,
+        decisions: Optional[List[Tuple[str, int, Optional[int], bool]]] = None,
+    ):
+        """Resolve conflicts of the merge request in bulk.
+        Either all current conflicts are resolved using replace_all or only the
+        conflicts given by decisions. Each decision consists of the persistent entity id,
+        the origin and destination tag instance versions and the replace flag.
+        Returns the number of stored resolutions."""
+        # pylint: disable=no-member
+        id_tag_definition_origin_version = TagDefinition.most_recent_by_id(
+            self.id_origin_persistent
+        ).id
+        id_tag_definition_destination_version = TagDefinition.most_recent_by_id(
+            self.id_destination_persistent
+        ).id
+        conflicts = (
+            self.instance_conflicts_all(True)
+            .annotate(
+                id_entity_version=models.Subquery(
+                    EntityHead.objects.filter(
+                        id_persistent=models.OuterRef("id_entity_persistent")
+                    ).values("entity_id")
+                )
+            )
+            .values(
+                "id",
+                "id_persistent",
+                "id_entity_persistent",
+                "id_entity_version",
+                "tag_instance_destination",
+            )
+        )
+        conflict_map = {conflict["id"]: conflict for conflict in conflicts}
+        if decisions is None:
+            replace_map = {id_version: replace_all for id_version in conflict_map}
+        else:
+            replace_map = self.replace_map_for_decisions(conflict_map, decisions)
+        resolutions = []
+        for id_origin_version, replace in replace_map.items():
+            conflict = conflict_map[id_origin_version]
+            destination = conflict["tag_instance_destination"]
+            resolutions.append(
+                TagConflictResolution(
+                    entity_id=conflict["id_entity_version"],
+                    tag_definition_origin_id=id_tag_definition_origin_version,
+                    tag_instance_origin_id=id_origin_version,
+                    tag_definition_destination_id=id_tag_definition_destination_version,
+                    tag_instance_destination_id=(
+                        None if destination is None else destination["id"]
+                    ),
+                    merge_request=self,
+                    replace=replace,
+                )
+            )
+        with transaction.atomic():
+            TagConflictResolution.objects.filter(
+                merge_request=self,
+                tag_instance_origin__id_persistent__in=[
+                    conflict_map[id_origin_version]["id_persistent"]
+                    for id_origin_version in replace_map
+                ],
+            ).delete()
+            TagConflictResolution.objects.bulk_create(resolutions)
+        return len(resolutions)
+
+    @staticmethod
+    def replace_map_for_decisions(conflict_map, decisions):
+        """Check that decisions refer to the current conflicts.
+        Returns the replace flag by version of the origin tag instance.
+        Raises:
+            ConflictsChangedException: If any decision does not match a conflict."""
+        replace_map = {}
+        changed = []
+        for (
+            id_entity_persistent,
+            id_origin_version,
+            id_destination_version,
+            replace,
+        ) in decisions:
+            conflict = conflict_map.get(id_origin_version)
+            if conflict is None:
+                changed.append(id_origin_version)
+                continue
+            destination = conflict["tag_instance_destination"]
+            if (
+                conflict["id_entity_persistent"] != id_entity_persistent
+                or (destination is None and id_destination_version is not None)
+                or (
+                    destination is not None
+                    and destination["id"] != id_destination_version
+                )
+            ):
+                changed.append(id_origin_version)
+                continue
+            replace_map[id_origin_version] = replace
+        if changed:
+            raise ConflictsChangedException(changed)
+        return replace_map
+
     @classmethod
     def contribution_with_match_tag_definitions(cls, id_contribution_persistent):
         "Gets the tag definitions that were used for matching in a specific contribution."
@@ -247,6 +432,43 @@ class TagMergeRequest(AbstractMergeRequest):
         )
 
 
+class TagMergeRequestConflict(models.Model):
+    """Conflict of a tag merge request that is neither closed nor merged.
+    Note:
+        The table is maintained by database triggers on the tag instance history
+        and the merge request table. Do not write to it from Django."""
+
+    merge_request = models.ForeignKey(
+        TagMergeRequest, on_delete=models.CASCADE, related_name="conflicts"
+    )
+    id_entity_persistent = models.TextField()
+    tag_instance_origin = models.ForeignKey(
+        TagInstanceHistory,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+    )
+    tag_instance_destination = models.ForeignKey(
+        TagInstanceHistory,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name="+",
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        "Meta class for merge request conflicts"
+        # pylint: disable=too-few-public-methods
+        indexes = [models.Index(fields=["merge_request", "id_entity_persistent"])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["merge_request", "tag_instance_origin"],
+                name="vran_tagmergerequestconflict_origin_unique",
+            )
+        ]
+
+
 class TagConflictResolution(AbstractConflictResolution):
     "Django ORM model for resolutions to merge request conflicts."
 
@@ -261,6 +483,70 @@ class TagConflictResolution(AbstractConflictResolution):
     merge_request = models.ForeignKey(TagMergeRequest, on_delete=models.CASCADE)
     replace = models.BooleanField()
 
+    STALENESS_QUERY_STRING = """
+        select resolution.id
+            , coalesce(
+                entity_head.entity_id = resolution.entity_id
+                and tag_definition_origin_recent.id = resolution.tag_definition_origin_id
+                and tag_definition_destination_recent.id
+                    = resolution.tag_definition_destination_id
+                and tag_instance_origin_recent.id = resolution.tag_instance_origin_id,
+                false
+            )
+            and case
+                when resolution.tag_instance_destination_id is null
+                then tag_instance_destination_new.id is null
+                else coalesce(
+                    tag_instance_destination_recent.id
+                        = resolution.tag_instance_destination_id,
+                    false
+                )
+            end recent
+            , coalesce(
+                tag_instance_origin_recent.value = coalesce(
+                    tag_instance_destination_recent.value,
+                    tag_instance_destination_new.value
+                ),
+                false
+            ) same_value
+        from vran_tagconflictresolution resolution
+        join vran_tagmergerequest merge_request
+            on merge_request.id_persistent = resolution.merge_request_id
+        join vran_entity entity on entity.id = resolution.entity_id
+        left join vran_entityhead entity_head
+            on entity_head.id_persistent = entity.id_persistent
+        join vran_tagdefinitionhistory tag_definition_origin
+            on tag_definition_origin.id = resolution.tag_definition_origin_id
+        left join vran_tagdefinition tag_definition_origin_recent
+            on tag_definition_origin_recent.id_persistent
+                = tag_definition_origin.id_persistent
+        join vran_tagdefinitionhistory tag_definition_destination
+            on tag_definition_destination.id = resolution.tag_definition_destination_id
+        left join vran_tagdefinition tag_definition_destination_recent
+            on tag_definition_destination_recent.id_persistent
+                = tag_definition_destination.id_persistent
+        left join vran_taginstancehistory tag_instance_origin
+            on tag_instance_origin.id = resolution.tag_instance_origin_id
+        left join vran_taginstance tag_instance_origin_recent
+            on tag_instance_origin_recent.id_persistent
+                = tag_instance_origin.id_persistent
+        left join vran_taginstancehistory tag_instance_destination
+            on tag_instance_destination.id = resolution.tag_instance_destination_id
+        left join vran_taginstance tag_instance_destination_recent
+            on tag_instance_destination_recent.id_persistent
+                = tag_instance_destination.id_persistent
+        left join lateral (
+            select id, value
+            from vran_taginstance
+            where resolution.tag_instance_destination_id is null
+                and id_entity_persistent = entity.id_persistent
+                and id_tag_definition_persistent
+                    = merge_request.id_destination_persistent
+            limit 1
+        ) tag_instance_destination_new on true
+        where resolution.id in ({ids})
+    """
+
     @classmethod
     def for_merge_request_query_set(cls, merge_request: TagMergeRequest):
         "Get resolutions for a merge request."
@@ -274,7 +560,7 @@ class TagConflictResolution(AbstractConflictResolution):
         tag definition or tag instances."""
         if manager is None:
             manager = cls.objects  # pylint: disable=no-member
-        with_version_info = manager.annotate(
+        return cls.filter_non_recent(manager).annotate(
             entity_most_recent=models.Subquery(
                 Entity.objects.filter(  # pylint: disable=no-member
                     id_persistent=models.OuterRef("entity__id_persistent")
@@ -363,49 +649,6 @@ class TagConflictResolution(AbstractConflictResolution):
                 ]
             ),
         )
-        non_recent_query_set = with_version_info.filter(
-            ~models.Q(
-                entity__id=models.functions.Cast(
-                    models.F("entity_most_recent__id"), models.BigIntegerField()
-                )
-            )
-            | ~models.Q(
-                tag_definition_origin__id=models.functions.Cast(
-                    models.F("tag_definition_origin_most_recent__id"),
-                    models.BigIntegerField(),
-                ),
-            )
-            | ~models.Q(
-                tag_definition_destination__id=models.functions.Cast(
-                    models.F("tag_definition_destination_most_recent__id"),
-                    models.BigIntegerField(),
-                ),
-            )
-            | (
-                models.Q(tag_instance_destination__isnull=False)
-                & ~models.Q(
-                    tag_instance_destination__id=models.functions.Cast(
-                        models.F("tag_instance_destination_most_recent__id"),
-                        models.BigIntegerField(),
-                    ),
-                )
-            )
-            | models.Q(
-                tag_instance_destination__isnull=True,
-                tag_instance_destination_most_recent__isnull=False,
-            )
-            | ~models.Q(
-                tag_instance_origin__id=models.functions.Cast(
-                    models.F("tag_instance_origin_most_recent__id"),
-                    models.BigIntegerField(),
-                )
-            )
-        )
-        return non_recent_query_set.exclude(
-            tag_instance_origin_most_recent__value=models.F(
-                "tag_instance_destination_most_recent__value"
-            )
-        )
 
     @classmethod
     def only_recent(cls, manager=None):
@@ -413,90 +656,4 @@ class TagConflictResolution(AbstractConflictResolution):
         tag definition or tag instances."""
         if manager is None:
             manager = cls.objects  # pylint: disable=no-member
-        with_entity_version_info = manager.annotate(
-            id_entity_most_recent=Entity.objects.filter(  # pylint: disable=no-member
-                id_persistent=models.OuterRef("entity__id_persistent")
-            )
-            .order_by(models.F("previous_version").desc(nulls_last=True))
-            .values("id")[:1]
-        )
-        only_with_recent_entities = with_entity_version_info.filter(
-            entity__id=models.F("id_entity_most_recent")
-        )
-        with_tag_def_origin_version_info = only_with_recent_entities.annotate(
-            id_tag_definition_origin_most_recent=TagDefinition.objects.filter(  # pylint: disable=no-member
-                id_persistent=models.OuterRef("tag_definition_origin__id_persistent")
-            ).values(
-                "id"
-            )[
-                :1
-            ]
-        )
-        only_with_recent_tag_def_origins = with_tag_def_origin_version_info.filter(
-            tag_definition_origin__id=models.F("id_tag_definition_origin_most_recent")
-        )
-        with_tag_def_destination_version_info = only_with_recent_tag_def_origins.annotate(
-            id_tag_definition_destination_most_recent=TagDefinition.objects.filter(  # pylint: disable=no-member
-                id_persistent=models.OuterRef(
-                    "tag_definition_destination__id_persistent"
-                )
-            ).values(
-                "id"
-            )[
-                :1
-            ]
-        )
-        only_with_recent_tag_def_destinations = (
-            with_tag_def_destination_version_info.filter(
-                tag_definition_destination__id=models.F(
-                    "id_tag_definition_destination_most_recent"
-                )
-            )
-        )
-        with_instance_origin_version_info = only_with_recent_tag_def_destinations.annotate(
-            id_tag_instance_origin_most_recent=TagInstance.objects.filter(  # pylint: disable=no-member
-                id_persistent=models.OuterRef("tag_instance_origin__id_persistent")
-            ).values(
-                "id"
-            )[
-                :1
-            ]
-        )
-        only_with_recent_instance_origin = with_instance_origin_version_info.filter(
-            tag_instance_origin__id=models.F("id_tag_instance_origin_most_recent")
-        )
-        with_instance_destination_version_info = only_with_recent_instance_origin.annotate(
-            id_tag_instance_destination_most_recent=models.Subquery(
-                TagInstance.objects.filter(  # pylint: disable=no-member
-                    models.Q(
-                        id_persistent=models.OuterRef(
-                            "tag_instance_destination__id_persistent"
-                        )
-                    )
-                    | models.Q(
-                        # case when tag_instance destination is null
-                        # therefore use entity information
-                        # and tag_definition information from merge request!
-                        id_entity_persistent=models.OuterRef("entity__id_persistent"),
-                        id_tag_definition_persistent=models.OuterRef(
-                            "merge_request__id_destination_persistent"
-                        ),
-                    )
-                ).values("id")[:1]
-            )
-        )
-        only_with_recent_instance_destination = (
-            with_instance_destination_version_info.filter(
-                models.Q(
-                    id_tag_instance_destination_most_recent__isnull=False,
-                    tag_instance_destination__id=models.F(
-                        "id_tag_instance_destination_most_recent"
-                    ),
-                )
-                | models.Q(
-                    tag_instance_destination__isnull=True,
-                    id_tag_instance_destination_most_recent__isnull=True,
-                )
-            )
-        )
-        return only_with_recent_instance_destination
+        return cls.filter_recent(manager)
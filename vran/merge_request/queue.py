@@ -5,9 +5,20 @@ from uuid import uuid4
 import django_rq
 from django.db import models, transaction
 from django.db.utils import OperationalError
+from rq import get_current_job
 
-from vran.exception import EntityUpdatedException
-from vran.merge_request.models_django import TagConflictResolution, TagMergeRequest
+from vran.entity.models_django import Entity
+from vran.entity.queue import update_display_txt_caches
+from vran.exception import (
+    EntityUpdatedException,
+    InvalidTagValueException,
+    TagDefinitionDisabledException,
+)
+from vran.merge_request.models_django import (
+    TagConflictResolution,
+    TagMergeRequest,
+    invalidate_tag_definition_pairs_cache,
+)
 from vran.tag.models_django import (
     TagDefinition,
     TagDefinitionHistory,
@@ -61,22 +72,37 @@ def merge_request_fast_forward(id_merge_request_persistent):
             )
             time_merge = timestamp()
             if len(tag_instances_destination) == 0:
-                tag_instance_query = (
-                    TagInstance.objects.filter(  # pylint: disable=no-member
-                        id_tag_definition_persistent=merge_request.id_origin_persistent
+                # Validate once for the merge request instead of once per instance.
+                if tag_definition_destination.disabled:
+                    raise TagDefinitionDisabledException(
+                        tag_definition_destination.id_persistent
                     )
+                tag_definition_origin = TagDefinition.most_recent_by_id(
+                    merge_request.id_origin_persistent
                 )
-                for tag_instance in tag_instance_query:
-                    tag_instance, _do_write = TagInstanceHistory.change_or_create(
-                        id_persistent=str(uuid4()),
-                        id_entity_persistent=tag_instance.id_entity_persistent,
-                        id_tag_definition_persistent=merge_request.id_destination_persistent,
-                        value=tag_instance.value,
-                        user=merge_request.created_by,
-                        version=None,
-                        time_edit=time_merge,
+                if tag_definition_origin.type != tag_definition_destination.type:
+                    for value in (
+                        TagInstance.objects.filter(  # pylint: disable=no-member
+                            id_tag_definition_persistent=merge_request.id_origin_persistent
+                        )
+                        .values_list("value", flat=True)
+                        .iterator()
+                    ):
+                        tag_definition_destination.check_value(value)
+                TagInstanceHistory.copy_to_tag_definition(
+                    merge_request.id_origin_persistent,
+                    merge_request.id_destination_persistent,
+                    time_merge,
+                )
+                id_entity_persistent_list = entities_without_display_txt(
+                    [merge_request.id_destination_persistent]
+                )
+                if id_entity_persistent_list:
+                    transaction.on_commit(
+                        lambda: django_rq.enqueue(
+                            update_display_txt_caches, id_entity_persistent_list
+                        )
                     )
-                    tag_instance.save()
                 merge_request.state = TagMergeRequest.MERGED
                 merge_request.save()
                 disable_origin(merge_request, time_merge)
@@ -91,6 +117,181 @@ def merge_request_fast_forward(id_merge_request_persistent):
             merge_request.save()
 
 
+def entities_without_display_txt(id_tag_definition_persistent_list):
+    "Get persistent ids of entities without display_txt but tag instances for a tag."
+    return list(
+        Entity.most_recent_queryset(include_disabled=True)
+        .filter(
+            models.Q(display_txt=None) | models.Q(display_txt=""),
+            id_persistent__in=models.Subquery(
+                TagInstance.objects.filter(  # pylint: disable=no-member
+                    id_tag_definition_persistent__in=id_tag_definition_persistent_list
+                ).values("id_entity_persistent")
+            ),
+        )
+        .values_list("id_persistent", flat=True)
+    )
+
+
+def plan_contribution_merge(merge_requests):
+    """Sort merge requests of a contribution into fast forwardable ones,
+    ones with conflicts, erroneous ones and ones that have to be merged separately.
+    Merge requests without write access to the destination are left out."""
+    # pylint: disable=no-member
+    id_tag_definition_persistent_list = [
+        id_persistent
+        for merge_request in merge_requests
+        for id_persistent in [
+            merge_request.id_origin_persistent,
+            merge_request.id_destination_persistent,
+        ]
+    ]
+    tag_definitions = {
+        tag_definition.id_persistent: tag_definition
+        for tag_definition in TagDefinition.objects.filter(
+            id_persistent__in=id_tag_definition_persistent_list
+        )
+    }
+    non_empty_destinations = set(
+        TagInstance.objects.filter(
+            id_tag_definition_persistent__in=[
+                merge_request.id_destination_persistent
+                for merge_request in merge_requests
+            ]
+        )
+        .values_list("id_tag_definition_persistent", flat=True)
+        .distinct()
+    )
+    fast_forward, conflicts, errors = [], [], []
+    planned_destinations = set()
+    for merge_request in merge_requests:
+        tag_definition_destination = tag_definitions.get(
+            merge_request.id_destination_persistent
+        )
+        tag_definition_origin = tag_definitions.get(merge_request.id_origin_persistent)
+        if tag_definition_destination is None or tag_definition_origin is None:
+            logging.warning(
+                "Tag definitions of merge request %s do not exist.",
+                merge_request.id_persistent,
+            )
+            errors.append(merge_request)
+            continue
+        if not tag_definition_destination.has_write_access(merge_request.created_by):
+            continue
+        if merge_request.id_destination_persistent in non_empty_destinations:
+            conflicts.append(merge_request)
+            continue
+        try:
+            if tag_definition_destination.disabled:
+                raise TagDefinitionDisabledException(
+                    tag_definition_destination.id_persistent
+                )
+            if tag_definition_origin.type != tag_definition_destination.type:
+                for value in (
+                    TagInstance.objects.filter(
+                        id_tag_definition_persistent=merge_request.id_origin_persistent
+                    )
+                    .values_list("value", flat=True)
+                    .iterator()
+                ):
+                    tag_definition_destination.check_value(value)
+        except (TagDefinitionDisabledException, InvalidTagValueException) as exc:
+            logging.warning(None, exc_info=exc)
+            errors.append(merge_request)
+            continue
+        # Later merge requests to the same destination conflict with this one.
+        non_empty_destinations.add(merge_request.id_destination_persistent)
+        planned_destinations.add(merge_request.id_destination_persistent)
+        fast_forward.append(merge_request)
+    # Origins written by this merge have to be merged after it.
+    separate = [
+        merge_request
+        for merge_request in fast_forward
+        if merge_request.id_origin_persistent in planned_destinations
+    ]
+    fast_forward = [
+        merge_request for merge_request in fast_forward if merge_request not in separate
+    ]
+    return fast_forward, conflicts, errors, separate
+
+
+def merge_contribution(id_contribution_persistent):
+    """Merge all open merge requests of a contribution.
+    Merge requests with empty destinations are fast forwarded in a single statement,
+    all others are marked as having conflicts."""
+    merge_request_query = TagMergeRequest.objects.filter(  # pylint: disable=no-member
+        contribution_candidate_id=id_contribution_persistent,
+        state=TagMergeRequest.OPEN,
+    )
+    job = get_current_job()
+    try:
+        with transaction.atomic():
+            try:
+                merge_requests = list(merge_request_query.select_for_update())
+            except OperationalError:
+                return
+            fast_forward, conflicts, errors, separate = plan_contribution_merge(
+                merge_requests
+            )
+            time_merge = timestamp()
+            TagInstanceHistory.copy_to_tag_definitions(
+                [
+                    (
+                        merge_request.id_origin_persistent,
+                        merge_request.id_destination_persistent,
+                    )
+                    for merge_request in fast_forward
+                ],
+                time_merge,
+            )
+            for state, merge_request_list in [
+                (TagMergeRequest.MERGED, fast_forward),
+                (TagMergeRequest.CONFLICTS, conflicts),
+                (TagMergeRequest.ERROR, errors),
+            ]:
+                TagMergeRequest.objects.filter(  # pylint: disable=no-member
+                    id_persistent__in=[
+                        merge_request.id_persistent
+                        for merge_request in merge_request_list
+                    ]
+                ).update(state=state)
+            invalidate_tag_definition_pairs_cache(id_contribution_persistent)
+            for merge_request in fast_forward:
+                disable_origin(merge_request, time_merge)
+            id_entity_persistent_list = entities_without_display_txt(
+                [
+                    merge_request.id_destination_persistent
+                    for merge_request in fast_forward
+                ]
+            )
+            if id_entity_persistent_list:
+                transaction.on_commit(
+                    lambda: django_rq.enqueue(
+                        update_display_txt_caches, id_entity_persistent_list
+                    )
+                )
+            for merge_request in separate:
+                transaction.on_commit(
+                    lambda id_persistent=merge_request.id_persistent: django_rq.enqueue(
+                        merge_request_fast_forward, id_persistent
+                    )
+                )
+        if job is not None:
+            job.meta["progress"] = 1.0
+            job.meta["result"] = {
+                "merged": len(fast_forward),
+                "conflicts": len(conflicts),
+                "errors": len(errors),
+                "separate": len(separate),
+            }
+            job.save_meta()
+    except Exception as exc:  # pylint: disable=broad-except
+        logging.warning(None, exc_info=exc)
+        with transaction.atomic():
+            merge_request_query.update(state=TagMergeRequest.ERROR)
+            invalidate_tag_definition_pairs_cache(id_contribution_persistent)
+
+
 def merge_request_resolve_conflicts(id_merge_request_persistent):
     "Merges a merge request while incorporating conflict resolutions."
     merge_request_query = TagMergeRequest.objects.filter(  # pylint: disable=no-member
@@ -107,13 +308,13 @@ def merge_request_resolve_conflicts(id_merge_request_persistent):
                 merge_request.tagconflictresolution_set.select_related()
             )
             non_recent = TagConflictResolution.non_recent(conflicts_resolution_set)
-            if len(non_recent) > 0:
+            if non_recent.exists():
                 merge_request.state = merge_request.OPEN
                 merge_request.save()
                 return
             recent = TagConflictResolution.only_recent(conflicts_resolution_set)
             conflicts = merge_request.instance_conflicts_all(False, recent)
-            if len(conflicts) > 0:
+            if conflicts.exists():
                 merge_request.state = merge_request.OPEN
                 merge_request.save()
                 return
@@ -0,0 +1,79 @@
+# Generated by Django 4.2.8 on 2026-10-18 09:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    "Migration for a trigger maintained table of most recent entity versions."
+
+    dependencies = [
+        ("vran", "0038_tagdefinitionhistory_disabled_and_more"),
+    ]
+
+    create_trigger_query = """
+            create function vran_entityhead_maintain() returns trigger as $$
+            begin
+                if tg_op in ('DELETE', 'UPDATE') then
+                    delete from vran_entityhead where entity_id = old.id;
+                    if found then
+                        insert into vran_entityhead (id_persistent, entity_id)
+                            select id_persistent, max(id)
+                            from vran_entity
+                            where id_persistent = old.id_persistent
+                            group by id_persistent
+                        on conflict (id_persistent) do update
+                            set entity_id = excluded.entity_id
+                            where vran_entityhead.entity_id < excluded.entity_id;
+                    end if;
+                end if;
+                if tg_op in ('INSERT', 'UPDATE') then
+                    insert into vran_entityhead (id_persistent, entity_id)
+                        values (new.id_persistent, new.id)
+                    on conflict (id_persistent) do update
+                        set entity_id = excluded.entity_id
+                        where vran_entityhead.entity_id < excluded.entity_id;
+                end if;
+                return null;
+            end;
+            $$ language plpgsql;
+
+            create trigger vran_entityhead_insert_delete
+                after insert or delete on vran_entity
+                for each row execute function vran_entityhead_maintain();
+
+            create trigger vran_entityhead_update
+                after update of id_persistent on vran_entity
+                for each row
+                when (old.id_persistent is distinct from new.id_persistent)
+                execute function vran_entityhead_maintain();
+
+            insert into vran_entityhead (id_persistent, entity_id)
+                select id_persistent, max(id)
+                from vran_entity
+                group by id_persistent;
+            """
+
+    drop_trigger_query = """
+            drop trigger vran_entityhead_update on vran_entity;
+            drop trigger vran_entityhead_insert_delete on vran_entity;
+            drop function vran_entityhead_maintain;
+            """
+
+    operations = [
+        migrations.CreateModel(
+            name="EntityHead",
+            fields=[
+                ("id_persistent", models.TextField(primary_key=True, serialize=False)),
+                (
+                    "entity",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="head",
+                        to="vran.entity",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunSQL(create_trigger_query, reverse_sql=drop_trigger_query),
+    ]
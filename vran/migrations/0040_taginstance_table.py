@@ -0,0 +1,180 @@
+# Generated by Django 4.2.8 on 2026-10-18 09:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Migration replacing the most recent tag instance view by a table.
+    The table is maintained by triggers on the tag instance history."""
+
+    dependencies = [
+        ("vran", "0039_entityhead"),
+    ]
+
+    create_view_query = """
+            create view "vran_taginstance" as (
+                select id
+                    , id_persistent
+                    , id_entity_persistent
+                    , id_tag_definition_persistent
+                    , value
+                    , time_edit
+                    , previous_version_id
+                from (
+                        select max("id") max_id
+                        from vran_taginstancehistory vt
+                        group by id_persistent
+                    ) with_version
+                    left join  (
+                        select *
+                        from vran_taginstancehistory vt1
+                    ) without_version
+                    on "with_version"."max_id"="without_version"."id"
+            )"""
+
+    drop_view_query = "drop view vran_taginstance"
+
+    create_trigger_query = """
+            create function vran_taginstance_maintain() returns trigger as $$
+            begin
+                if tg_op in ('DELETE', 'UPDATE') then
+                    delete from vran_taginstance where id = old.id;
+                    if found then
+                        insert into vran_taginstance (
+                            id
+                            , id_persistent
+                            , id_entity_persistent
+                            , id_tag_definition_persistent
+                            , value
+                            , time_edit
+                            , previous_version_id
+                        )
+                            select id
+                                , id_persistent
+                                , id_entity_persistent
+                                , id_tag_definition_persistent
+                                , value
+                                , time_edit
+                                , previous_version_id
+                            from vran_taginstancehistory
+                            where id_persistent = old.id_persistent
+                            order by id desc
+                            limit 1
+                        on conflict (id_persistent) do nothing;
+                    end if;
+                end if;
+                if tg_op in ('INSERT', 'UPDATE') then
+                    insert into vran_taginstance (
+                        id
+                        , id_persistent
+                        , id_entity_persistent
+                        , id_tag_definition_persistent
+                        , value
+                        , time_edit
+                        , previous_version_id
+                    )
+                        values (
+                            new.id
+                            , new.id_persistent
+                            , new.id_entity_persistent
+                            , new.id_tag_definition_persistent
+                            , new.value
+                            , new.time_edit
+                            , new.previous_version_id
+                        )
+                    on conflict (id_persistent) do update
+                        set id = excluded.id
+                            , id_entity_persistent = excluded.id_entity_persistent
+                            , id_tag_definition_persistent = excluded.id_tag_definition_persistent
+                            , value = excluded.value
+                            , time_edit = excluded.time_edit
+                            , previous_version_id = excluded.previous_version_id
+                        where vran_taginstance.id < excluded.id;
+                end if;
+                return null;
+            end;
+            $$ language plpgsql;
+
+            create trigger vran_taginstance_maintain
+                after insert or update or delete on vran_taginstancehistory
+                for each row execute function vran_taginstance_maintain();
+
+            insert into vran_taginstance (
+                id
+                , id_persistent
+                , id_entity_persistent
+                , id_tag_definition_persistent
+                , value
+                , time_edit
+                , previous_version_id
+            )
+                select distinct on (id_persistent) id
+                    , id_persistent
+                    , id_entity_persistent
+                    , id_tag_definition_persistent
+                    , value
+                    , time_edit
+                    , previous_version_id
+                from vran_taginstancehistory
+                order by id_persistent, id desc;
+            """
+
+    drop_trigger_query = """
+            drop trigger vran_taginstance_maintain on vran_taginstancehistory;
+            drop function vran_taginstance_maintain;
+            """
+
+    operations = [
+        migrations.RunSQL(drop_view_query, reverse_sql=create_view_query),
+        migrations.DeleteModel(name="TagInstance"),
+        migrations.CreateModel(
+            name="TagInstance",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("id_persistent", models.TextField()),
+                ("id_entity_persistent", models.CharField(max_length=36)),
+                ("id_tag_definition_persistent", models.TextField()),
+                ("value", models.TextField(blank=True, null=True)),
+                ("time_edit", models.DateTimeField()),
+                (
+                    "previous_version",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        to="vran.taginstance",
+                        unique=True,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["id_tag_definition_persistent", "id_entity_persistent"],
+                        name="vran_tagins_id_tag__5590bc_idx",
+                    ),
+                    models.Index(
+                        fields=["id_entity_persistent"],
+                        name="vran_tagins_id_enti_5dfc96_idx",
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("id_persistent",),
+                        name="vran_taginstance_id_persistent_unique",
+                    )
+                ],
+            },
+        ),
+        migrations.RunSQL(create_trigger_query, reverse_sql=drop_trigger_query),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.8 on 2026-10-18 09:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vran", "0040_taginstance_table"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="taginstance",
+            index=models.Index(
+                fields=["id_tag_definition_persistent", "id"],
+                name="vran_tagins_id_tag__881320_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.8 on 2026-10-18 10:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vran", "0041_taginstance_chunk_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="contributioncandidate",
+            name="file_hash",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="contributioncandidate",
+            index=models.Index(
+                fields=["created_by", "file_hash"],
+                name="vran_contri_created_07c910_idx",
+            ),
+        ),
+    ]
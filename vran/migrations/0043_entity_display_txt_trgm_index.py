@@ -0,0 +1,28 @@
+# Generated by Django 4.2.8 on 2026-10-18 10:22
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vran", "0042_contributioncandidate_file_hash"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="entity",
+            name="vran_entity_display_a10986_gist",
+        ),
+        migrations.AddIndex(
+            model_name="entity",
+            index=django.contrib.postgres.indexes.GistIndex(
+                condition=models.Q(
+                    ("contribution_candidate", None), ("disabled", False)
+                ),
+                fields=["display_txt"],
+                name="vran_entity_display_trgm_gist",
+                opclasses=["gist_trgm_ops"],
+            ),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.8 on 2026-10-18 10:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vran", "0043_entity_display_txt_trgm_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EntityMatch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("id_entity_persistent", models.TextField()),
+                ("entity_version", models.BigIntegerField()),
+                ("tag_instance_version", models.BigIntegerField(blank=True, null=True)),
+                ("matches", models.JSONField(default=list)),
+                (
+                    "contribution_candidate",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="vran.contributioncandidate",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="entitymatch",
+            constraint=models.UniqueConstraint(
+                fields=("contribution_candidate", "id_entity_persistent"),
+                name="vran_entitymatch_contribution_entity_unique",
+            ),
+        ),
+    ]
@@ -0,0 +1,257 @@
+# Generated by Django 4.2.8 on 2026-10-18 11:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Migration for a trigger maintained table of tag merge request conflicts.
+    Conflicts are kept for all merge requests that are neither closed nor merged."""
+
+    dependencies = [
+        ("vran", "0044_entitymatch"),
+    ]
+
+    create_trigger_query = """
+            create function vran_tagmergerequestconflict_refresh(
+                merge_request_ids uuid[], entity_ids text[]
+            ) returns void as $$
+                delete from vran_tagmergerequestconflict conflict
+                using unnest(merge_request_ids, entity_ids)
+                    changed(merge_request_id, id_entity_persistent)
+                where conflict.merge_request_id = changed.merge_request_id
+                    and conflict.id_entity_persistent = changed.id_entity_persistent;
+                insert into vran_tagmergerequestconflict (
+                    merge_request_id
+                    , id_entity_persistent
+                    , tag_instance_origin_id
+                    , tag_instance_destination_id
+                )
+                    select merge_request.id_persistent
+                        , origin.id_entity_persistent
+                        , origin.id
+                        , destination.id
+                    from (
+                            select distinct merge_request_id, id_entity_persistent
+                            from unnest(merge_request_ids, entity_ids)
+                                changed(merge_request_id, id_entity_persistent)
+                        ) changed
+                        join vran_tagmergerequest merge_request
+                            on merge_request.id_persistent = changed.merge_request_id
+                        join vran_taginstance origin
+                            on origin.id_tag_definition_persistent
+                                = merge_request.id_origin_persistent
+                            and origin.id_entity_persistent
+                                = changed.id_entity_persistent
+                        left join lateral (
+                            select id, value
+                            from vran_taginstance
+                            where id_tag_definition_persistent
+                                    = merge_request.id_destination_persistent
+                                and id_entity_persistent = origin.id_entity_persistent
+                            limit 1
+                        ) destination on true
+                    where merge_request.state not in ('CLS', 'MRG')
+                        and not coalesce(destination.value = origin.value, false);
+            $$ language sql;
+
+            create function vran_tagmergerequestconflict_instances_changed()
+            returns trigger as $$
+            begin
+                if tg_op in ('INSERT', 'UPDATE') then
+                    perform vran_tagmergerequestconflict_refresh(
+                        array_agg(merge_request.id_persistent),
+                        array_agg(changed.id_entity_persistent)
+                    )
+                    from (
+                            select id_entity_persistent, id_tag_definition_persistent
+                            from new_rows
+                            union
+                            select previous.id_entity_persistent
+                                , previous.id_tag_definition_persistent
+                            from new_rows
+                                join vran_taginstancehistory previous
+                                    on previous.id = new_rows.previous_version_id
+                        ) changed
+                        join vran_tagmergerequest merge_request
+                            on changed.id_tag_definition_persistent in (
+                                merge_request.id_origin_persistent,
+                                merge_request.id_destination_persistent
+                            )
+                    where merge_request.state not in ('CLS', 'MRG');
+                end if;
+                if tg_op in ('DELETE', 'UPDATE') then
+                    perform vran_tagmergerequestconflict_refresh(
+                        array_agg(merge_request.id_persistent),
+                        array_agg(changed.id_entity_persistent)
+                    )
+                    from (
+                            select distinct id_entity_persistent
+                                , id_tag_definition_persistent
+                            from old_rows
+                        ) changed
+                        join vran_tagmergerequest merge_request
+                            on changed.id_tag_definition_persistent in (
+                                merge_request.id_origin_persistent,
+                                merge_request.id_destination_persistent
+                            )
+                    where merge_request.state not in ('CLS', 'MRG');
+                end if;
+                return null;
+            end;
+            $$ language plpgsql;
+
+            create trigger vran_tagmergerequestconflict_insert
+                after insert on vran_taginstancehistory
+                referencing new table as new_rows
+                for each statement
+                execute function vran_tagmergerequestconflict_instances_changed();
+
+            create trigger vran_tagmergerequestconflict_update
+                after update on vran_taginstancehistory
+                referencing old table as old_rows new table as new_rows
+                for each statement
+                execute function vran_tagmergerequestconflict_instances_changed();
+
+            create trigger vran_tagmergerequestconflict_delete
+                after delete on vran_taginstancehistory
+                referencing old table as old_rows
+                for each statement
+                execute function vran_tagmergerequestconflict_instances_changed();
+
+            create function vran_tagmergerequestconflict_merge_request_changed()
+            returns trigger as $$
+            begin
+                if tg_op = 'UPDATE' then
+                    delete from vran_tagmergerequestconflict
+                    where merge_request_id = old.id_persistent;
+                end if;
+                perform vran_tagmergerequestconflict_refresh(
+                    array_agg(new.id_persistent), array_agg(origin.id_entity_persistent)
+                )
+                from (
+                        select distinct id_entity_persistent
+                        from vran_taginstance
+                        where id_tag_definition_persistent = new.id_origin_persistent
+                    ) origin;
+                return null;
+            end;
+            $$ language plpgsql;
+
+            create trigger vran_tagmergerequestconflict_merge_request_insert
+                after insert on vran_tagmergerequest
+                for each row
+                execute function vran_tagmergerequestconflict_merge_request_changed();
+
+            create trigger vran_tagmergerequestconflict_merge_request_update
+                after update of state, id_origin_persistent, id_destination_persistent
+                on vran_tagmergerequest
+                for each row
+                when (
+                    (old.state in ('CLS', 'MRG')) is distinct from (new.state in ('CLS', 'MRG'))
+                    or old.id_origin_persistent is distinct from new.id_origin_persistent
+                    or old.id_destination_persistent
+                        is distinct from new.id_destination_persistent
+                )
+                execute function vran_tagmergerequestconflict_merge_request_changed();
+
+            insert into vran_tagmergerequestconflict (
+                merge_request_id
+                , id_entity_persistent
+                , tag_instance_origin_id
+                , tag_instance_destination_id
+            )
+                select merge_request.id_persistent
+                    , origin.id_entity_persistent
+                    , origin.id
+                    , destination.id
+                from vran_tagmergerequest merge_request
+                    join vran_taginstance origin
+                        on origin.id_tag_definition_persistent
+                            = merge_request.id_origin_persistent
+                    left join lateral (
+                        select id, value
+                        from vran_taginstance
+                        where id_tag_definition_persistent
+                                = merge_request.id_destination_persistent
+                            and id_entity_persistent = origin.id_entity_persistent
+                        limit 1
+                    ) destination on true
+                where merge_request.state not in ('CLS', 'MRG')
+                    and not coalesce(destination.value = origin.value, false);
+            """
+
+    drop_trigger_query = """
+            drop trigger vran_tagmergerequestconflict_merge_request_update
+                on vran_tagmergerequest;
+            drop trigger vran_tagmergerequestconflict_merge_request_insert
+                on vran_tagmergerequest;
+            drop function vran_tagmergerequestconflict_merge_request_changed;
+            drop trigger vran_tagmergerequestconflict_delete on vran_taginstancehistory;
+            drop trigger vran_tagmergerequestconflict_update on vran_taginstancehistory;
+            drop trigger vran_tagmergerequestconflict_insert on vran_taginstancehistory;
+            drop function vran_tagmergerequestconflict_instances_changed;
+            drop function vran_tagmergerequestconflict_refresh;
+            """
+
+    operations = [
+        migrations.CreateModel(
+            name="TagMergeRequestConflict",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("id_entity_persistent", models.TextField()),
+                (
+                    "merge_request",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="conflicts",
+                        to="vran.tagmergerequest",
+                    ),
+                ),
+                (
+                    "tag_instance_destination",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="vran.taginstancehistory",
+                    ),
+                ),
+                (
+                    "tag_instance_origin",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="vran.taginstancehistory",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["merge_request", "id_entity_persistent"],
+                        name="vran_tagmer_merge_r_2c86ac_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="tagmergerequestconflict",
+            constraint=models.UniqueConstraint(
+                fields=("merge_request", "tag_instance_origin"),
+                name="vran_tagmergerequestconflict_origin_unique",
+            ),
+        ),
+        migrations.RunSQL(create_trigger_query, reverse_sql=drop_trigger_query),
+    ]
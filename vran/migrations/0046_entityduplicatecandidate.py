@@ -0,0 +1,46 @@
+# Generated by Django 4.2.8 on 2026-10-18 11:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vran", "0045_tagmergerequestconflict"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EntityDuplicateCandidate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("id_origin_persistent", models.TextField()),
+                ("id_destination_persistent", models.TextField()),
+                ("entity_origin_version", models.BigIntegerField()),
+                ("entity_destination_version", models.BigIntegerField()),
+                ("levenshtein_similarity", models.FloatField()),
+                ("equal_instance_count", models.IntegerField()),
+                ("total_instance_count", models.IntegerField()),
+                ("score", models.FloatField()),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["-score"], name="vran_entdupcand_score_idx")
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="entityduplicatecandidate",
+            constraint=models.UniqueConstraint(
+                fields=("id_origin_persistent", "id_destination_persistent"),
+                name="vran_entityduplicatecandidate_pair_unique",
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.8 on 2026-10-18 11:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vran", "0046_entityduplicatecandidate"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="contributioncandidate",
+            name="match_engine",
+            field=models.CharField(
+                choices=[("PG", "postgres"), ("TFI", "tfidf")],
+                default="PG",
+                max_length=3,
+            ),
+        ),
+    ]
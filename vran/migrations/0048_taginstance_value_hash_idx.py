@@ -0,0 +1,25 @@
+# Generated by Django 4.2.8 on 2026-10-18 11:50
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("vran", "0047_contributioncandidate_match_engine"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="taginstance",
+            index=models.Index(
+                models.F("id_tag_definition_persistent"),
+                django.db.models.functions.text.MD5(
+                    django.db.models.functions.text.Lower(
+                        django.db.models.functions.text.Trim("value")
+                    )
+                ),
+                name="vran_tagins_value_hash_idx",
+            ),
+        ),
+    ]
@@ -6,10 +6,11 @@ from vran.contribution.tag_definition.models_django import (
     TagDefinitionContribution,
     TagInstanceContribution,
 )
-from vran.entity.models_django import Entity
+from vran.entity.models_django import Entity, EntityHead
 from vran.management.models_django import ConfigValue
 from vran.merge_request.entity.models_django import (
     EntityConflictResolution,
+    EntityDuplicateCandidate,
     EntityMergeRequest,
 )
 from vran.merge_request.models_django import TagConflictResolution, TagMergeRequest
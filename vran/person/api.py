@@ -22,7 +22,7 @@ from vran.tag.api.definitions import (
 )
 from vran.util import VranUser
 from vran.util.auth import check_user
-from vran.util.django import save_many_atomic
+from vran.util.django import bulk_create_changed
 
 router = Router()
 
@@ -93,25 +93,40 @@ def persons_post(
     if user.permission_group in {VranUser.APPLICANT, VranUser.READER}:
         return 403, ApiError(msg="Insufficient Permissions")
     now = datetime.utcnow()
-    try:
-        person_dbs = [person_api_to_db(person, now) for person in persons.persons]
-    except ValidationException as valid_x:
-        return 400, ApiError(msg=str(valid_x))
-    except DbObjectExistsException as exists_x:
-        return 500, ApiError(
-            msg=(
-                "Could not generate an id for person "
-                f"with display_txt {exists_x.display_txt}."
-            )
-        )
-    except EntityUpdatedException as updated_x:
-        return 400, ApiError(
-            msg="There has been a concurrent modification "
-            f"to the person with id_persistent {updated_x.new_value.id_persistent}."
+    changes = []
+    for person in persons.persons:
+        try:
+            changes.append(person_api_to_change(person))
+        except ValidationException as valid_x:
+            changes.append(valid_x)
+    results = iter(
+        EntityDb.change_or_create_bulk(
+            [change for change in changes if not isinstance(change, Exception)], now
         )
+    )
+    person_dbs = [
+        change if isinstance(change, Exception) else next(results) for change in changes
+    ]
+    for person_db in person_dbs:
+        if isinstance(person_db, ValidationException):
+            return 400, ApiError(msg=str(person_db))
+        if isinstance(person_db, DbObjectExistsException):
+            return 500, ApiError(
+                msg=(
+                    "Could not generate an id for person "
+                    f"with display_txt {person_db.display_txt}."
+                )
+            )
+        if isinstance(person_db, EntityUpdatedException):
+            return 400, ApiError(
+                msg="There has been a concurrent modification "
+                f"to the person with id_persistent {person_db.new_value.id_persistent}."
+            )
+        if isinstance(person_db, Exception):
+            raise person_db
 
     try:
-        save_many_atomic(person for person, do_write in person_dbs if do_write)
+        bulk_create_changed(EntityDb, person_dbs)
     except IntegrityError:
         return 500, ApiError(msg="Provided data not consistent with database.")
     return 200, PersonNaturalList(
@@ -165,6 +180,18 @@ def merge_entities(
 
 def person_api_to_db(person: PersonNatural, time_edit: datetime) -> EntityDb:
     """Transform an natural person from API to DB model."""
+    persistent_id, version, kwargs = person_api_to_change(person)
+    return EntityDb.change_or_create(
+        time_edit=time_edit,
+        id_persistent=persistent_id,
+        version=version,
+        **kwargs,
+    )
+
+
+def person_api_to_change(person: PersonNatural):
+    """Transform a natural person from API representation
+    to the id_persistent, version and changed fields of the new version."""
     if person.id_persistent:
         persistent_id = person.id_persistent
         if person.version is None:
@@ -179,12 +206,10 @@ def person_api_to_db(person: PersonNatural, time_edit: datetime) -> EntityDb:
                 "has version but no persistent_id."
             )
         persistent_id = str(uuid4())
-    return EntityDb.change_or_create(
-        display_txt=person.display_txt,
-        time_edit=time_edit,
-        id_persistent=persistent_id,
-        version=person.version,
-        disabled=person.disabled or False,
+    return (
+        persistent_id,
+        person.version,
+        {"display_txt": person.display_txt, "disabled": person.disabled or False},
     )
 
 
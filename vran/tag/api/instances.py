@@ -4,7 +4,6 @@ from typing import List, Optional
 from uuid import uuid4
 
 from django.db import IntegrityError
-from django.db.models import Value
 from django.http import HttpRequest
 from ninja import Router, Schema
 
@@ -26,7 +25,7 @@ from vran.tag.models_django import TagInstanceAbstract as TagInstanceAbstractDb
 from vran.tag.models_django import TagInstanceHistory as TagInstanceHistoryDb
 from vran.util import VranUser
 from vran.util.auth import check_user
-from vran.util.django import save_many_atomic
+from vran.util.django import bulk_create_changed
 
 router = Router()
 
@@ -55,9 +54,17 @@ class TagInstancePostChunkRequest(Schema):
     "Request body for getting instances of a tag."
     id_tag_definition_persistent: str
     offset: int
+    "Smallest version of the instances in the chunk."
     limit: int
 
 
+class TagInstanceChunkResponse(TagInstancePostList):
+    # pylint: disable=too-few-public-methods
+    "Response body for a chunk of tag instances."
+    next_offset: Optional[int]
+    "Offset for the next chunk. Null if there are no more instances."
+
+
 class TagInstanceForEntitiesPostRequest(Schema):
     "Request body for getting tag instances for a set of entities"
     # pylint: disable=too-few-public-methods
@@ -142,7 +149,10 @@ def post_tag_instance(request: HttpRequest, tag_list: TagInstancePostList):
     tag_apis = tag_list.tag_instances
     now = datetime.utcnow()
     try:
-        tag_dbs = [tag_instance_api_to_db(tag, user, now) for tag in tag_apis]
+        tag_dbs = tag_instances_api_to_db(tag_apis, user, now)
+        for tag_db in tag_dbs:
+            if isinstance(tag_db, Exception):
+                raise tag_db
     except ValidationException as exc:
         return 400, ApiError(msg=str(exc))
     except TagInstanceExistsException as exc:
@@ -180,16 +190,17 @@ def post_tag_instance(request: HttpRequest, tag_list: TagInstancePostList):
             f"to the tag instance with id_persistent {exc.new_value.id_persistent}.",
             tag_instances=[tag_instance_db_to_api(exc.new_value)],
         )
-    tag_db_saves = [tag for tag, do_write in tag_dbs if do_write]
     try:
-        save_many_atomic(tag_db_saves)
+        bulk_create_changed(TagInstanceHistoryDb, tag_dbs)
     except IntegrityError as exc:
         return 500, ApiError(msg="Provided data not consistent with database.")
     response_tag_instances = [tag_instance_db_to_api(tag) for tag, _ in tag_dbs]
     return 200, TagInstancePostList(tag_instances=response_tag_instances)
 
 
-@router.post("chunk", response={200: TagInstancePostList, 400: ApiError, 500: ApiError})
+@router.post(
+    "chunk", response={200: TagInstanceChunkResponse, 400: ApiError, 500: ApiError}
+)
 def post_tag_instance_chunks(_, chunk_req: TagInstancePostChunkRequest):
     "API method for retrieving a chunk of tag instances."
     if chunk_req.limit > MAX_TAG_INSTANCE_CHUNK_LIMIT:
@@ -201,7 +212,13 @@ def post_tag_instance_chunks(_, chunk_req: TagInstancePostChunkRequest):
             chunk_req.id_tag_definition_persistent, chunk_req.offset, chunk_req.limit
         )
         instance_apis = [tag_instance_db_to_api(tag) for tag in instance_dbs]
-        return 200, TagInstancePostList(tag_instances=instance_apis)
+        if not instance_dbs or len(instance_dbs) < chunk_req.limit:
+            next_offset = None
+        else:
+            next_offset = instance_dbs[-1].id + 1
+        return 200, TagInstanceChunkResponse(
+            tag_instances=instance_apis, next_offset=next_offset
+        )
     except TagDefinitionMissingException as exc:
         return 400, ApiError(
             msg=f"Tag definition with id_persistent {exc.id_persistent} does not exist."
@@ -226,20 +243,26 @@ def post_tag_instance_values(_, values_req: TagInstanceValueRequestList):
             msg=f"Please specify limit smaller than {MAX_TAG_INSTANCE_VALUE_LIMIT}."
         )
     try:
-        ret = []
-        for req in values_req.value_requests:
-            id_entity_persistent = req.id_entity_persistent
-            id_tag_definition_persistent = req.id_tag_definition_persistent
-            vals = TagInstanceDb.most_recent_by_entity_and_definition_id_query_set(
-                id_entity_persistent, id_tag_definition_persistent
-            )
-            ret.append(
-                TagInstanceValueResponse(
-                    id_entity_persistent=id_entity_persistent,
-                    id_tag_definition_persistent=id_tag_definition_persistent,
-                    values=[tag_instance_db_to_api(val) for val in vals],
-                )
+        id_pairs = [
+            (req.id_entity_persistent, req.id_tag_definition_persistent)
+            for req in values_req.value_requests
+        ]
+        vals_by_pair = TagInstanceDb.most_recent_by_entity_and_definition_id_pairs(
+            id_pairs
+        )
+        ret = [
+            TagInstanceValueResponse(
+                id_entity_persistent=id_entity_persistent,
+                id_tag_definition_persistent=id_tag_definition_persistent,
+                values=[
+                    tag_instance_db_to_api(val)
+                    for val in vals_by_pair[
+                        (id_entity_persistent, id_tag_definition_persistent)
+                    ]
+                ],
             )
+            for id_entity_persistent, id_tag_definition_persistent in id_pairs
+        ]
         return 200, TagInstanceValueResponseList(value_responses=ret)
     except Exception:  # pylint: disable=broad-except
         return 500, ApiError(msg="Could not get requested values.")
@@ -271,32 +294,46 @@ def post_tag_instances_for_entities(
     ):
         return 200, TagInstanceForEntitiesPostResponse(value_responses=[])
     try:
-        instances_all = TagInstanceDb.objects.none()  # pylint: disable=no-member
-        for (
-            id_tag_definition_persistent
-        ) in request_data.id_tag_definition_persistent_list:
-            tag_definitions = TagMergeRequest.get_tag_definitions_for_entities_request(
-                id_tag_definition_persistent,
+        tag_definition_mapping = (
+            TagMergeRequest.get_tag_definitions_for_entities_request(
+                request_data.id_tag_definition_persistent_list,
                 request_data.id_contribution_persistent,
                 request_data.id_merge_request_persistent,
                 user,
             )
+        )
+        requested_by_id = {}
+        for idx, (id_tag_definition_requested_persistent, tag_definitions) in enumerate(
+            tag_definition_mapping.items()
+        ):
             for id_tag_def, is_existing in tag_definitions:
-                instances_for_tag = TagInstanceDb.for_entities(
-                    id_tag_def,
-                    request_data.id_entity_persistent_list,
-                ).annotate(
-                    is_existing=Value(is_existing),
-                    id_tag_definition_requested_persistent=Value(
-                        id_tag_definition_persistent
-                    ),
+                requested_by_id.setdefault(id_tag_def, []).append(
+                    (idx, id_tag_definition_requested_persistent, is_existing)
                 )
-                instances_all = instances_all.union(instances_for_tag)
+        instances_all = TagInstanceDb.objects.filter(  # pylint: disable=no-member
+            id_entity_persistent__in=request_data.id_entity_persistent_list,
+            id_tag_definition_persistent__in=requested_by_id,
+        ).order_by("id")
+        value_responses = []
+        for tag_instance in instances_all:
+            for (
+                idx,
+                id_tag_definition_requested_persistent,
+                is_existing,
+            ) in requested_by_id[tag_instance.id_tag_definition_persistent]:
+                value_responses.append(
+                    (
+                        idx,
+                        tag_instance_with_existing_db_to_api(
+                            tag_instance,
+                            id_tag_definition_requested_persistent,
+                            is_existing,
+                        ),
+                    )
+                )
+        value_responses.sort(key=lambda tpl: tpl[0])
         return 200, TagInstanceForEntitiesPostResponse(
-            value_responses=[
-                tag_instance_with_existing_db_to_api(tag_instance)
-                for tag_instance in instances_all
-            ]
+            value_responses=[value_response for _, value_response in value_responses]
         )
 
     except Exception:  # pylint: disable=broad-except
@@ -305,8 +342,34 @@ def post_tag_instances_for_entities(
         )
 
 
-def tag_instance_api_to_db(tag_api: TagInstancePost, user: VranUser, time: datetime):
-    "Convert a tag instance from API to database representation."
+def tag_instances_api_to_db(
+    tag_apis: List[TagInstancePost], user: VranUser, time: datetime
+):
+    """Convert multiple tag instances from API to database representation.
+    Returns:
+        For each tag instance either the database representation and a write flag
+        or the exception that prevents the conversion."""
+    changes = []
+    for tag_api in tag_apis:
+        try:
+            changes.append(tag_instance_api_to_change(tag_api))
+        except ValidationException as exc:
+            changes.append(exc)
+    results = iter(
+        TagInstanceHistoryDb.change_or_create_bulk(
+            [change for change in changes if not isinstance(change, Exception)],
+            user,
+            time,
+        )
+    )
+    return [
+        change if isinstance(change, Exception) else next(results) for change in changes
+    ]
+
+
+def tag_instance_api_to_change(tag_api: TagInstancePost):
+    """Get id_persistent, version, id_entity_persistent, id_tag_definition_persistent
+    and value for the new version of a tag instance from its API representation."""
     if tag_api.id_persistent:
         persistent_id = tag_api.id_persistent
         if tag_api.version is None:
@@ -322,14 +385,12 @@ def tag_instance_api_to_db(tag_api: TagInstancePost, user: VranUser, time: datet
                 f"value {tag_api.value} has version but no id_persistent."
             )
         persistent_id = str(uuid4())
-    return TagInstanceHistoryDb.change_or_create(
-        id_persistent=persistent_id,
-        id_entity_persistent=tag_api.id_entity_persistent,
-        id_tag_definition_persistent=tag_api.id_tag_definition_persistent,
-        user=user,
-        value=tag_api.value,
-        time_edit=time,
-        version=tag_api.version,
+    return (
+        persistent_id,
+        tag_api.version,
+        tag_api.id_entity_persistent,
+        tag_api.id_tag_definition_persistent,
+        tag_api.value,
     )
 
 
@@ -346,6 +407,8 @@ def tag_instance_db_to_api(tag_db: TagInstanceAbstractDb) -> TagInstancePost:
 
 def tag_instance_with_existing_db_to_api(
     tag_db: TagInstanceAbstractDb,
+    id_tag_definition_requested_persistent: str,
+    is_existing: bool,
 ) -> TagInstancePost:
     "Convert tag instances from database to API representation."
     return TagInstanceValueWithExistingFlagResponse(
@@ -354,6 +417,6 @@ def tag_instance_with_existing_db_to_api(
         id_tag_definition_persistent=tag_db.id_tag_definition_persistent,
         value=tag_db.value,
         version=tag_db.id,
-        is_existing=tag_db.is_existing,
-        id_tag_definition_requested_persistent=tag_db.id_tag_definition_requested_persistent,
+        is_existing=is_existing,
+        id_tag_definition_requested_persistent=id_tag_definition_requested_persistent,
     )
@@ -2,10 +2,11 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Tuple, Union
 
-from django.db import models
+from django.db import connection, models
 from django.db.models.aggregates import Max
+from django.db.models.functions import MD5, Lower, Trim
 
 from vran.entity.models_django import Entity
 from vran.exception import (
@@ -21,7 +22,10 @@ from vran.exception import (
     TagInstanceExistsException,
 )
 from vran.util import VranUser
-from vran.util.django import change_or_create_versioned
+from vran.util.django import (
+    change_or_create_versioned,
+    change_or_create_versioned_bulk,
+)
 
 
 class TagDefinitionAbstract(models.Model):
@@ -399,6 +403,174 @@ class TagInstanceHistory(TagInstanceAbstract):
                 id_entity_persistent, id_tag_definition_persistent, value
             ) from exc
 
+    @classmethod
+    def change_or_create_bulk(
+        cls,
+        changes: List[Tuple[str, Optional[int], str, str, Optional[str]]],
+        user: VranUser,
+        time_edit: datetime,
+    ):
+        """Changes multiple tag assignments by adding new versions.
+        Referenced entities and tag definitions are fetched once for all changes.
+        Args:
+            changes: Tuples of id_persistent, version, id_entity_persistent,
+                id_tag_definition_persistent and value.
+        Note:
+            The resulting objects are not saved.
+        Returns:
+            For each change in order either the new object and a write flag
+            or the exception `change_or_create` would have raised.
+        """
+        id_entity_persistent_set = set(
+            Entity.most_recent(include_disabled=True)
+            .filter(
+                id_persistent__in={change[2] for change in changes},
+            )
+            .values_list("id_persistent", flat=True)
+        )
+        tag_definitions = {
+            tag_def.id_persistent: tag_def
+            for tag_def in TagDefinition.objects.filter(  # pylint: disable=no-member
+                id_persistent__in={change[3] for change in changes}
+            ).select_related("owner")
+        }
+        ret = [
+            cls._check_bulk_change(
+                change, id_entity_persistent_set, tag_definitions, user, time_edit
+            )
+            for change in changes
+        ]
+        results = iter(
+            change_or_create_versioned_bulk(
+                cls, [change for change in ret if not isinstance(change, Exception)]
+            )
+        )
+        for idx, change in enumerate(ret):
+            if isinstance(change, Exception):
+                continue
+            result = next(results)
+            if isinstance(result, DbObjectExistsException):
+                kwargs = change[2]
+                result = TagInstanceExistsException(
+                    kwargs["id_entity_persistent"],
+                    kwargs["id_tag_definition_persistent"],
+                    kwargs["value"],
+                )
+            ret[idx] = result
+        return ret
+
+    @staticmethod
+    def _check_bulk_change(
+        change, id_entity_persistent_set, tag_definitions, user, time_edit
+    ):
+        """Check a single change of `change_or_create_bulk`.
+        Returns:
+            Either the id_persistent, version and keyword arguments for
+            `change_or_create_versioned_bulk` or the exception
+            `change_or_create` would have raised."""
+        (
+            id_persistent,
+            version,
+            id_entity_persistent,
+            id_tag_definition_persistent,
+            value,
+        ) = change
+        if id_entity_persistent not in id_entity_persistent_set:
+            return EntityMissingException(id_entity_persistent)
+        tag_def = tag_definitions.get(id_tag_definition_persistent)
+        if tag_def is None:
+            return TagDefinitionMissingException(id_tag_definition_persistent)
+        if not tag_def.has_write_access(user):
+            return TagDefinitionPermissionException(tag_def.id_persistent)
+        if tag_def.disabled:
+            return TagDefinitionDisabledException(tag_def.id_persistent)
+        try:
+            value = tag_def.check_value(value)
+        except InvalidTagValueException as exc:
+            return exc
+        return (
+            id_persistent,
+            version,
+            {
+                "id_entity_persistent": id_entity_persistent,
+                "id_tag_definition_persistent": id_tag_definition_persistent,
+                "value": value,
+                "time_edit": time_edit,
+            },
+        )
+
+    @classmethod
+    def copy_to_tag_definition(
+        cls,
+        id_tag_definition_origin_persistent: str,
+        id_tag_definition_destination_persistent: str,
+        time_edit: datetime,
+    ) -> int:
+        """Copy all most recent tag instances of a tag definition to another one.
+        The copies get new id_persistent values and share the same time_edit.
+        Instances of entities that do not exist anymore are skipped.
+        Note:
+            Neither permissions nor values are checked.
+            Neither `save` nor signals are called for the new objects.
+        Returns:
+            The number of copied tag instances."""
+        return cls.copy_to_tag_definitions(
+            [
+                (
+                    id_tag_definition_origin_persistent,
+                    id_tag_definition_destination_persistent,
+                )
+            ],
+            time_edit,
+        )
+
+    @classmethod
+    def copy_to_tag_definitions(
+        cls,
+        id_tag_definition_persistent_pairs: List[Tuple[str, str]],
+        time_edit: datetime,
+    ) -> int:
+        """Copy all most recent tag instances for pairs of origin and destination
+        tag definitions in a single statement.
+        See `copy_to_tag_definition` for details.
+        Returns:
+            The number of copied tag instances."""
+        if not id_tag_definition_persistent_pairs:
+            return 0
+        origins, destinations = zip(*id_tag_definition_persistent_pairs)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """insert into vran_taginstancehistory (
+                    id_persistent
+                    , id_entity_persistent
+                    , id_tag_definition_persistent
+                    , value
+                    , time_edit
+                )
+                select gen_random_uuid()::text
+                    , "vran_taginstance"."id_entity_persistent"
+                    , "pairs"."id_destination_persistent"
+                    , "vran_taginstance"."value"
+                    , %(time_edit)s
+                from unnest(
+                    %(id_origin_persistent_list)s::text[],
+                    %(id_destination_persistent_list)s::text[]
+                ) pairs(id_origin_persistent, id_destination_persistent)
+                inner join vran_taginstance
+                on "vran_taginstance"."id_tag_definition_persistent"
+                    = "pairs"."id_origin_persistent"
+                inner join vran_entityhead
+                on "vran_taginstance"."id_entity_persistent"
+                    = "vran_entityhead"."id_persistent"
+                """,
+                {
+                    "id_origin_persistent_list": list(origins),
+                    "id_destination_persistent_list": list(destinations),
+                    "time_edit": time_edit,
+                },
+            )
+            return cursor.rowcount
+
     def check_different_before_save(self, other):
         """Checks structural equality for two tag definitions.
         Note:
@@ -415,12 +587,43 @@ class TagInstanceHistory(TagInstanceAbstract):
 
 
 class TagInstance(TagInstanceAbstract):
-    "Django ORM class for view representing the most recent tag instances."
+    """Django ORM class for the most recent tag instances.
+    Note:
+        The table is maintained by database triggers on the tag instance history.
+        Do not write to it from Django."""
+
+    previous_version = models.ForeignKey(
+        "self",
+        blank=True,
+        null=True,
+        on_delete=models.DO_NOTHING,
+        unique=True,
+        # The previous version is only contained in the history.
+        db_constraint=False,
+    )
 
     class Meta:
-        "Meta class for TagInstance view to ensure django does not create a table."
+        "Meta class for TagInstance table."
         # pylint: disable=too-few-public-methods
-        managed = False
+        indexes = [
+            models.Index(
+                fields=["id_tag_definition_persistent", "id_entity_persistent"]
+            ),
+            models.Index(fields=["id_entity_persistent"]),
+            # Keyset pagination for chunks of a tag definition.
+            models.Index(fields=["id_tag_definition_persistent", "id"]),
+            # Lookup of entities with equal normalized values for matching.
+            models.Index(
+                models.F("id_tag_definition_persistent"),
+                MD5(Lower(Trim("value"))),
+                name="vran_tagins_value_hash_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["id_persistent"], name="vran_taginstance_id_persistent_unique"
+            )
+        ]
 
     @classmethod
     def for_entities(
@@ -441,7 +644,10 @@ class TagInstance(TagInstanceAbstract):
 
     @classmethod
     def by_tag_chunked(cls, id_tag_definition_persistent, offset, limit, manager=None):
-        "Get tag instances for a tag_id in chunks."
+        """Get tag instances for a tag_id in chunks.
+        Note:
+            The offset is the smallest id of the chunk.
+            Use the id of the last instance incremented by one for the next chunk."""
         try:
             tag = TagDefinition.most_recent_by_id(id_tag_definition_persistent)
         except TagDefinition.DoesNotExist as exc:  # pylint: disable=no-member
@@ -451,8 +657,8 @@ class TagInstance(TagInstanceAbstract):
         return list(
             manager.filter(
                 id_tag_definition_persistent=tag.id_persistent, id__gte=offset
-            ).order_by("id")
-        )[:limit]
+            ).order_by("id")[:limit]
+        )
 
     @classmethod
     def most_recent_by_entity_and_definition_id_query_set(
@@ -465,14 +671,47 @@ class TagInstance(TagInstanceAbstract):
             id_tag_definition_persistent=id_tag_definition_persistent,
         ).order_by("id")
 
+    @classmethod
+    def most_recent_by_entity_and_definition_id_pairs(
+        cls, id_pairs: List[Tuple[str, str]]
+    ) -> Dict[Tuple[str, str], List[TagInstance]]:
+        """Get all most recent values for multiple pairs of
+        id_entity_persistent and id_tag_definition_persistent in a single query.
+        Returns:
+            The values grouped by pair. Values of a pair are ordered by id."""
+        ret = {id_pair: [] for id_pair in id_pairs}
+        if not ret:
+            return ret
+        id_entity_persistent_list, id_tag_definition_persistent_list = zip(*ret)
+        instances = cls.objects.raw(  # pylint: disable=no-member
+            """select "vran_taginstance".*
+            from vran_taginstance
+            inner join (
+                select *
+                from unnest(%s::text[], %s::text[])
+                    as req(id_entity_persistent, id_tag_definition_persistent)
+            ) req
+            on "vran_taginstance"."id_entity_persistent"="req"."id_entity_persistent"
+            and "vran_taginstance"."id_tag_definition_persistent"
+                ="req"."id_tag_definition_persistent"
+            order by "vran_taginstance"."id"
+            """,
+            [list(id_entity_persistent_list), list(id_tag_definition_persistent_list)],
+        )
+        for instance in instances:
+            ret[
+                (instance.id_entity_persistent, instance.id_tag_definition_persistent)
+            ].append(instance)
+        return ret
+
     @classmethod
     def annotate_entity(cls, manager: Optional[models.BaseManager[TagInstance]]):
         "Annotate tag instances with the most recent entity and tag instance"
         if manager is None:
             manager = TagInstance.objects  # pylint: disable=no-member
         entity_sub_query = Entity.objects.filter(  # pylint: disable=no-member
-            id_persistent=models.OuterRef("id_entity_persistent")
-        ).order_by(models.F("previous_version").desc(nulls_last=True))[:1]
+            head__id_persistent=models.OuterRef("id_entity_persistent")
+        )
         return manager.annotate(
             entity=models.Subquery(
                 # pylint: disable=duplicate-code
@@ -1,9 +1,10 @@
 """Utils for Django"""
 from functools import lru_cache
-from typing import Iterable, Optional, Type
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type, Union
 
 from django.conf import settings
 from django.contrib.postgres.aggregates import JSONBAgg
+from django.db import connection
 from django.db.models import Aggregate, JSONField, Model
 from django.db.transaction import atomic
 
@@ -62,6 +63,100 @@ def change_or_create_versioned(
     return most_recent, do_write
 
 
+def change_or_create_versioned_bulk(
+    cls,
+    changes: Iterable[Tuple[str, Optional[int], Dict[str, Any]]],
+) -> List[Union[Tuple[Any, bool], Exception]]:
+    """Changes multiple versioned model instances by adding new versions.
+    The most recent versions are fetched in a single query.
+    Note:
+        The resulting objects are not saved.
+        Use `bulk_create_changed` for writing them.
+    Returns:
+        For each change in order either the same tuple as `change_or_create_versioned`
+        or the exception that `change_or_create_versioned` would have raised.
+    """
+    changes = list(changes)
+    field_names = [
+        field.attname
+        for field in cls._meta.get_fields()  # pylint: disable=protected-access
+        if hasattr(field, "attname")
+    ]
+    heads = {
+        most_recent.id_persistent: most_recent
+        for most_recent in cls.objects.filter(
+            id_persistent__in={id_persistent for id_persistent, _, _ in changes}
+        )
+        .order_by("id_persistent", "-id")
+        .distinct("id_persistent")
+    }
+    ret = []
+    for id_persistent, version, kwargs in changes:
+        most_recent = heads.get(id_persistent)
+        if version is not None:
+            if most_recent is None:
+                ret.append(IndexError(id_persistent))
+                continue
+            if most_recent.id != version:
+                ret.append(EntityUpdatedException(most_recent))
+                continue
+        elif most_recent is not None:
+            ret.append(DbObjectExistsException("UNKNOWN"))
+            continue
+        if most_recent is None:
+            new_values = {}
+        else:
+            new_values = {
+                field_name: getattr(most_recent, field_name)
+                for field_name in field_names
+            }
+            new_values.pop("id")
+            new_values["previous_version_id"] = most_recent.id
+        new_values.update(kwargs)
+        new_values["id_persistent"] = id_persistent
+        new = cls(**new_values)
+        do_write = (not most_recent) or most_recent.check_different_before_save(new)
+        if do_write:
+            # Later changes in the same batch have to refer to this version.
+            heads[id_persistent] = new
+            ret.append((new, do_write))
+        else:
+            ret.append((most_recent, do_write))
+    return ret
+
+
+def bulk_create_changed(cls, results: Iterable[Union[Tuple[Any, bool], Exception]]):
+    """Write the changed objects returned by `change_or_create_versioned_bulk`
+    with a single query."""
+    return cls.objects.bulk_create(
+        [
+            result[0]
+            for result in results
+            if not isinstance(result, Exception) and result[1]
+        ]
+    )
+
+
+def copy_rows(cls, field_names: List[str], rows: Iterable[Tuple]):
+    """Write rows to the table of a model.
+    For PostgreSQL the rows are written with COPY.
+    Note:
+        Neither `save` nor signals are called for the written rows."""
+    if get_db_default_connection_type() != "postgresql":
+        cls.objects.bulk_create(cls(**dict(zip(field_names, row))) for row in rows)
+        return
+    # pylint: disable=protected-access
+    quote_name = connection.ops.quote_name
+    columns = ", ".join(
+        quote_name(cls._meta.get_field(field_name).column) for field_name in field_names
+    )
+    table = quote_name(cls._meta.db_table)
+    with connection.cursor() as cursor:
+        with cursor.cursor.copy(f"COPY {table} ({columns}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row(row)
+
+
 def patch_from_dict(object_db, **kwargs):
     """Updates a model object from a dict and tracks the updated fields.
     This is required for (pre)|(post)_save signals to get a list of updated fields."""